@@ -6,9 +6,32 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-from audit_system import create_audit_table
+# Fork the bcrypt workers before any background thread exists
+from password_hashing import get_password_hasher
+get_password_hasher().start()
+
+from audit_system import create_audit_table, shutdown_audit_writer
 create_audit_table()
 
+from db import engine
+from routes.pagination import create_pagination_indexes
+create_pagination_indexes(engine)
+
+from routes.dashboard_routes import create_dashboard_indexes
+create_dashboard_indexes(engine)
+
+from routes.products_routes import create_product_search_indexes
+create_product_search_indexes(engine)
+
+from rollups import start_rollup_job, stop_rollup_job
+start_rollup_job()
+
+from report_views import start_report_view_refresher, stop_report_view_refresher
+start_report_view_refresher()
+
+from product_index import start_product_index
+start_product_index()
+
 from routes import (
     auth_router,
     products_router,
@@ -23,6 +46,7 @@ from routes import (
     reports_router,
     exports_router,
     audit_logs_router,
+    metrics_router,
 )
 
 app = FastAPI(title="SuperMarket Management API")
@@ -56,6 +80,27 @@ app.include_router(notifications_router)
 app.include_router(reports_router)
 app.include_router(exports_router)
 app.include_router(audit_logs_router)
+app.include_router(metrics_router)
+
+
+# Shutdown hooks run in this order: background jobs stop before the audit
+# writer writes out what is still queued
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    stop_rollup_job()
+    stop_report_view_refresher()
+
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    get_password_hasher().shutdown()
+
+
+@app.on_event("shutdown")
+def flush_audit_log():
+    # Write any audit rows still queued by the background writer
+    shutdown_audit_writer()
 
 
 @app.get("/")
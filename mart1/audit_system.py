@@ -2,10 +2,14 @@
 Database Activity Monitoring System
 Tracks all database operations for security and compliance
 """
-from sqlalchemy import text
-from db import engine
-from datetime import datetime
+from sqlalchemy import text, table, column, insert
+from db import background_engine, engine
+from datetime import datetime, timezone
+import atexit
 import json
+import os
+import queue
+import threading
 
 def create_audit_table():
     """Creates the audit_logs table if it doesn't exist"""
@@ -80,35 +84,203 @@ def log_activity(
         error_message: Error details if action failed
     """
     
+    get_audit_writer().submit({
+        "user_id": user_id,
+        "username": username,
+        "role": role,
+        "action": action,
+        "table_name": table_name,
+        "record_id": record_id,
+        "old_values": json.dumps(old_values) if old_values else None,
+        "new_values": json.dumps(new_values) if new_values else None,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        # Stamp the event time now; a queued row may be inserted a moment later
+        "timestamp": datetime.now(timezone.utc),
+        "status": status,
+        "error_message": error_message
+    })
+
+
+audit_logs_table = table(
+    "audit_logs",
+    column("user_id"), column("username"), column("role"), column("action"),
+    column("table_name"), column("record_id"), column("old_values"), column("new_values"),
+    column("ip_address"), column("user_agent"), column("timestamp"), column("status"),
+    column("error_message"),
+)
+
+
+def _env_int(name: str, default: int) -> int:
     try:
-        with engine.begin() as conn:
-            conn.execute(text("""
-                INSERT INTO audit_logs (
-                    user_id, username, role, action, table_name, 
-                    record_id, old_values, new_values, ip_address, 
-                    user_agent, status, error_message
-                )
-                VALUES (
-                    :user_id, :username, :role, :action, :table_name,
-                    :record_id, :old_values, :new_values, :ip_address,
-                    :user_agent, :status, :error_message
-                )
-            """), {
-                "user_id": user_id,
-                "username": username,
-                "role": role,
-                "action": action,
-                "table_name": table_name,
-                "record_id": record_id,
-                "old_values": json.dumps(old_values) if old_values else None,
-                "new_values": json.dumps(new_values) if new_values else None,
-                "ip_address": ip_address,
-                "user_agent": user_agent,
-                "status": status,
-                "error_message": error_message
-            })
-    except Exception as e:
-        print(f"Failed to log activity: {e}")
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _insert_audit_rows(rows: list, bind=None):
+    """Insert audit rows with a single multi-row INSERT (on bind, default the route engine)"""
+    with (bind or engine).begin() as conn:
+        conn.execute(insert(audit_logs_table).values(rows))
+
+
+class AuditWriter:
+    """
+    Writes audit rows off the request thread.
+
+    In "async" mode (default) rows go into a bounded in-memory queue and a
+    background thread inserts them in batches, one transaction per batch.
+    When the queue is full the row is written synchronously instead, so
+    memory stays bounded and nothing is dropped. "sync" mode keeps the old
+    behaviour of one INSERT per call for deployments that need every row
+    committed before the response is sent.
+
+    Configured with AUDIT_MODE, AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE and
+    AUDIT_FLUSH_INTERVAL (seconds).
+    """
+
+    def __init__(self, mode: str = None, queue_size: int = None, batch_size: int = None,
+                 flush_interval: float = None):
+        self.mode = (mode or os.getenv("AUDIT_MODE", "async")).lower()
+        self.batch_size = max(1, batch_size or _env_int("AUDIT_BATCH_SIZE", 500))
+        if flush_interval is None:
+            try:
+                flush_interval = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+            except ValueError:
+                flush_interval = 1.0
+        self.flush_interval = max(0.05, flush_interval)
+        self._queue = queue.Queue(maxsize=max(1, queue_size or _env_int("AUDIT_QUEUE_SIZE", 10000)))
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily, and again in each forked worker process
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, row: dict):
+        """Queue one audit row (or write it now in sync mode / when the queue is full)"""
+        if self.mode != "async" or self._stop.is_set():
+            self._write([row])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._write([row])
+
+    def _write(self, rows: list, bind=None):
+        # bind is the background engine for the writer thread's batches;
+        # rows written on a request thread use the route pool
+        try:
+            _insert_audit_rows(rows, bind)
+        except Exception as e:
+            if len(rows) == 1:
+                print(f"Failed to log activity: {e}")
+                return
+            # Retry one by one so a single bad row does not lose the whole batch
+            print(f"Failed to write audit batch of {len(rows)} rows, retrying individually: {e}")
+            for row in rows:
+                self._write([row], bind)
+
+    def _drain(self, first=None) -> list:
+        rows = [] if first is None else [first]
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            rows = self._drain(first)
+            try:
+                self._write(rows, background_engine)
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+        # Stopping: write whatever is left
+        while True:
+            rows = self._drain()
+            if not rows:
+                break
+            try:
+                self._write(rows, background_engine)
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Block until every queued row has been written, or timeout seconds pass;
+        returns whether the queue is empty. Once shutdown() has run, a writer
+        thread still draining is not waited on unless a timeout is given.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            if self._stop.is_set() and timeout is None:
+                timeout = 0
+            with self._queue.all_tasks_done:
+                return self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+        rows = self._drain()
+        if rows:
+            self._write(rows)
+            for _ in rows:
+                self._queue.task_done()
+        return True
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop the background thread after writing all queued rows"""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Still writing (e.g. a slow database); it keeps draining on its own
+                print(f"Audit writer did not finish within {timeout}s; {self._queue.unfinished_tasks} rows not yet written")
+                return
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "queued": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "batch_size": self.batch_size,
+        }
+
+
+# Global instance
+_audit_writer = None
+_audit_writer_lock = threading.Lock()
+
+def get_audit_writer() -> AuditWriter:
+    global _audit_writer
+    if _audit_writer is None:
+        with _audit_writer_lock:
+            if _audit_writer is None:
+                _audit_writer = AuditWriter()
+                atexit.register(_audit_writer.shutdown)
+    return _audit_writer
+
+
+def shutdown_audit_writer():
+    """Flush pending audit rows; called on application shutdown"""
+    if _audit_writer is not None:
+        _audit_writer.shutdown()
 
 def get_recent_logs(limit: int = 50):
     """Get recent audit logs"""
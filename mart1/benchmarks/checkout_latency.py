@@ -0,0 +1,93 @@
+"""
+Checkout latency benchmark
+
+Posts sales of several cart sizes to a running mart1 API and prints p50/p99
+latency per cart size. Run it against the server before and after a change
+to compare. It records real sales and decrements stock, so point it at a
+development database.
+
+    python benchmarks/checkout_latency.py --base-url http://127.0.0.1:8000 --employee-id 1
+"""
+import argparse
+import json
+import math
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _request(method: str, url: str, body: dict = None, token: str = None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method)
+    req.add_header("Content-Type", "application/json")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(req, timeout=60) as response:
+        return json.loads(response.read() or b"null")
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def pick_products(base_url: str, cart_size: int, needed_units: int, token: str = None) -> list:
+    products = _request("GET", f"{base_url}/api/products?page_size=500", token=token)["products"]
+    stocked = [p for p in products if (p.get("stock_quantity") or 0) >= needed_units]
+    stocked.sort(key=lambda p: p["stock_quantity"], reverse=True)
+    if len(stocked) < cart_size:
+        raise SystemExit(
+            f"Need {cart_size} products with at least {needed_units} units in stock, found {len(stocked)}"
+        )
+    return [p["product_id"] for p in stocked[:cart_size]]
+
+
+def run_cart_size(args, cart_size: int) -> dict:
+    product_ids = pick_products(args.base_url, cart_size, args.iterations + args.warmup, args.token)
+    sale = {
+        "items": [{"product_id": pid, "quantity": 1} for pid in product_ids],
+        "payment_method": "CASH",
+        "employee_id": args.employee_id,
+    }
+
+    def checkout(_):
+        started = time.perf_counter()
+        _request("POST", f"{args.base_url}/api/sales", sale, args.token)
+        return (time.perf_counter() - started) * 1000
+
+    for _ in range(args.warmup):
+        checkout(None)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        samples = list(pool.map(checkout, range(args.iterations)))
+
+    return {
+        "cart_size": cart_size,
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure create_sale latency per cart size")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--employee-id", type=int, required=True)
+    parser.add_argument("--token", default=None, help="Optional bearer token")
+    parser.add_argument("--cart-sizes", default="1,5,20,50")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+    args.base_url = args.base_url.rstrip("/")
+
+    print(f"{'cart size':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for cart_size in [int(size) for size in args.cart_sizes.split(",") if size.strip()]:
+        result = run_cart_size(args, cart_size)
+        print(f"{result['cart_size']:>10} {result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f} {result['max_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
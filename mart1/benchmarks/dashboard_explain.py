@@ -0,0 +1,80 @@
+"""
+Dashboard stats EXPLAIN benchmark
+
+Runs EXPLAIN (ANALYZE, BUFFERS) for the previous five-subquery dashboard stats
+query and for the queries _fetch_dashboard_stats runs now, then prints each
+plan's execution time, shared buffers touched and the scans it used. A
+"Seq Scan on sales" in the new plans means the sale_time index is not being
+used. Run it from the mart1 directory against a database with realistic data.
+
+    python benchmarks/dashboard_explain.py --days 7 --repeat 5
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from db import engine
+from rollups import SALES_SUMMARY_QUERY
+from routes.dashboard_routes import PRODUCT_COUNTS_QUERY
+
+# The stats query as it was before the rollup and the partial index
+LEGACY_STATS_QUERY = text("""
+    SELECT
+        (SELECT COUNT(*) FROM products) as total_products,
+        (SELECT COUNT(*) FROM sales WHERE sale_time >= CURRENT_DATE - INTERVAL '1 day' * :days) as total_sales,
+        (SELECT COALESCE(SUM(total_amount), 0) FROM sales WHERE sale_time >= CURRENT_DATE - INTERVAL '1 day' * :days) as total_revenue,
+        (SELECT COUNT(*) FROM products WHERE stock_quantity <= low_stock_threshold) as low_stock_count,
+        (SELECT COALESCE(SUM(total_amount), 0) FROM sales WHERE DATE(sale_time) = CURRENT_DATE) as today_sales
+""")
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def explain(conn, query, params: dict) -> dict:
+    plan = conn.execute(
+        text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.text), params
+    ).scalar()[0]
+    scans = []
+    for node in _walk(plan["Plan"]):
+        if "Scan" in node["Node Type"] and node.get("Relation Name"):
+            target = node.get("Index Name") or node["Relation Name"]
+            scans.append(f"{node['Node Type']} on {target}")
+    root = plan["Plan"]
+    return {
+        "ms": plan["Execution Time"],
+        "buffers": root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0),
+        "scans": scans,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the dashboard stats queries")
+    parser.add_argument("--days", type=int, default=7, help="Look-back window (0 for all time)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query; the fastest is reported")
+    args = parser.parse_args()
+
+    cases = [
+        ("legacy stats", LEGACY_STATS_QUERY, {"days": args.days}),
+        ("product counts", PRODUCT_COUNTS_QUERY, {}),
+        ("sales summary", SALES_SUMMARY_QUERY, {"days": args.days}),
+    ]
+    with engine.connect() as conn:
+        for label, query, params in cases:
+            runs = [explain(conn, query, params) for _ in range(max(1, args.repeat))]
+            best = min(runs, key=lambda run: run["ms"])
+            print(f"\n{label}: {best['ms']:.2f} ms, {best['buffers']} buffers")
+            for scan in best["scans"]:
+                flag = "  <-- full scan" if scan.startswith("Seq Scan on sales") else ""
+                print(f"    {scan}{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Read-route load test
+
+Drives the ported read routes (dashboard, product list and lookup, sales list)
+with a fixed number of concurrent clients for a fixed time and prints
+throughput and latency per server. To compare the asyncpg path with the
+threaded one, start one server with DB_ASYNC=1 and one with DB_ASYNC=0 and
+pass both URLs:
+
+    python benchmarks/load_test.py --clients 200 --duration 30 \
+        --base-url http://127.0.0.1:8000 --base-url http://127.0.0.1:8001
+
+The dashboard routes are cached, so add --no-dashboard to measure only routes
+that hit the database on every request.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _get(url: str, token: str = None):
+    req = urllib.request.Request(url, method="GET")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(req, timeout=60) as response:
+        return json.loads(response.read() or b"null")
+
+
+def build_paths(base_url: str, dashboard: bool, token: str = None) -> list:
+    products = _get(f"{base_url}/api/products?page_size=100&count=none", token)["products"]
+    product_ids = [p["product_id"] for p in products] or [1]
+    paths = [
+        "/api/products?page_size=50&count=cached",
+        "/api/sales?page_size=50&count=cached",
+    ]
+    paths += [f"/api/products/{pid}" for pid in random.sample(product_ids, min(10, len(product_ids)))]
+    if dashboard:
+        paths += ["/api/dashboard/overview", "/api/dashboard/stats?days=7"]
+    return paths
+
+
+def run(base_url: str, args) -> dict:
+    paths = build_paths(base_url, not args.no_dashboard, args.token)
+    deadline = time.perf_counter() + args.duration
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(seed: int):
+        rng = random.Random(seed)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                _get(base_url + rng.choice(paths), args.token)
+                local.append((time.perf_counter() - started) * 1000)
+            except (urllib.error.URLError, OSError, ValueError):
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        list(pool.map(client, range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "base_url": base_url,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) if latencies else 0.0,
+        "p99_ms": percentile(latencies, 99) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure read-route throughput under concurrent clients")
+    parser.add_argument("--base-url", action="append", help="Server to test; repeat to compare servers")
+    parser.add_argument("--token", default=None, help="Optional bearer token")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per server")
+    parser.add_argument("--no-dashboard", action="store_true", help="Skip the cached dashboard routes")
+    args = parser.parse_args()
+    base_urls = [url.rstrip("/") for url in (args.base_url or ["http://127.0.0.1:8000"])]
+
+    print(f"{'server':<32} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for base_url in base_urls:
+        result = run(base_url, args)
+        print(
+            f"{result['base_url']:<32} {result['requests']:>9} {result['errors']:>7} "
+            f"{result['rps']:>9.1f} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
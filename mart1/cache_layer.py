@@ -1,83 +1,730 @@
 """
-Simple In-Memory Caching Layer for Dashboard Statistics
+Caching Layer for Dashboard Statistics
 Reduces database load by caching frequently accessed data
+
+Two backends share one interface:
+- memory (default): per-process LRU dict
+- sqlite: a local SQLite file shared by every worker process on the host, so
+  uvicorn --workers N computes each dashboard result once instead of N times
+
+Pick one with CACHE_BACKEND=memory|sqlite (CACHE_SQLITE_PATH sets the file).
+
+Entries can declare the tables they were computed from (depends_on). Writers
+call publish_change(table, ...) after committing, which bumps that table's
+generation counter; entries recorded under an older generation are treated as
+misses from then on. Generations live in the backend, so with the sqlite
+backend a write in one worker invalidates the entry for all of them.
 """
-from datetime import datetime, timedelta
-from typing import Any, Optional, Callable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Optional, Callable, Dict, Iterable
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
 import threading
+import time
+
+_MISSING = object()
+
+
+def _env_number(name: str, default, cast=int):
+    try:
+        return cast(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# Runs a blocking backend's storage calls for get_or_fetch_async, apart from
+# the route executor so cache I/O never queues behind database work
+_io_executor = ThreadPoolExecutor(
+    max_workers=max(1, _env_number("CACHE_IO_THREADS", 4)), thread_name_prefix="cache-io"
+)
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "stale_until", "deps")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float, deps: Dict[str, int] = None):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        # Generation of each table the value was computed from
+        self.deps = deps or {}
+
+
+class _Flight:
+    """One in-progress fetch that concurrent callers for the same key wait on"""
+    __slots__ = ("event", "value", "error")
 
-class SimpleCache:
-    """Thread-safe in-memory cache with TTL support"""
-    
     def __init__(self):
-        self._cache = {}
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CacheBackend:
+    """
+    Size-bounded cache with per-entry TTL; subclasses provide the storage.
+
+    - At most max_entries keys; the least recently used key is evicted first.
+    - A background thread sweeps out expired entries every sweep_interval seconds.
+    - get_or_fetch runs a given key's fetch function once at a time; concurrent
+      misses wait for that result instead of all querying the database.
+    - With stale_seconds, an expired value is still served for that long while
+      one background refresh replaces it (stale-while-revalidate).
+
+    Sizes come from CACHE_MAX_ENTRIES and CACHE_SWEEP_INTERVAL by default.
+    Subclasses implement _read, _write, _generations, _bump_generations,
+    delete, delete_matching, clear, sweep and _storage_stats, and may override _acquire_lease/_release_lease to
+    extend single-flight across processes.
+    """
+    name = "base"
+    # How long a leader may hold a fetch lease before others stop waiting on it
+    lease_seconds = 30.0
+    # True when storage calls do file or network I/O, which the async path must
+    # keep off the event loop
+    blocking_io = False
+
+    def __init__(self, max_entries: int = None, sweep_interval: float = None):
+        if max_entries is None:
+            max_entries = _env_number("CACHE_MAX_ENTRIES", 1024)
+        if sweep_interval is None:
+            sweep_interval = _env_number("CACHE_SWEEP_INTERVAL", 30.0, float)
+        self.max_entries = max(1, max_entries)
+        self.sweep_interval = max(1.0, sweep_interval)
         self._lock = threading.Lock()
-    
+        self._inflight: Dict[str, _Flight] = {}
+        # Keys with a background stale refresh running; misses never wait on these
+        self._refreshing = set()
+        # Coroutine fetches in flight, and background stale refresh keys and tasks (event loop only)
+        self._async_inflight: Dict[str, asyncio.Future] = {}
+        self._async_refreshing = set()
+        self._async_refreshes = set()
+        self._sweeper = None
+        self._sweeper_pid = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.refresh_errors = 0
+
+    # Storage primitives
+
+    def _read(self, key: str, now: float) -> Optional[_Entry]:
+        """Return the entry for key (marking it recently used), dropping it if fully expired"""
+        raise NotImplementedError
+
+    def _write(self, key: str, entry: _Entry):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Remove key from cache"""
+        raise NotImplementedError
+
+    def delete_matching(self, pattern: str) -> int:
+        """Remove every key containing pattern; returns how many were removed"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Clear entire cache"""
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Drop entries whose TTL and stale window have both passed"""
+        raise NotImplementedError
+
+    def _storage_stats(self, now: float) -> dict:
+        raise NotImplementedError
+
+    def _generations(self, tables: Iterable[str]) -> Dict[str, int]:
+        """Current generation of each table (0 if it never changed)"""
+        raise NotImplementedError
+
+    def _bump_generations(self, tables: Iterable[str]):
+        raise NotImplementedError
+
+    def _acquire_lease(self, key: str) -> bool:
+        """Claim the right to fetch key across processes; in-process locking is enough by default"""
+        return True
+
+    def _release_lease(self, key: str):
+        pass
+
+    # Shared behaviour
+
+    def publish_change(self, *tables: str):
+        """Invalidate every entry computed from any of these tables"""
+        if tables:
+            self._bump_generations(sorted(set(tables)))
+
+    def table_generations(self, *tables: str) -> Dict[str, int]:
+        """Current change generation of each table, for callers keeping their own copies"""
+        return self._generations(tables)
+
+    def _lookup(self, key: str, ttl_seconds: float = 0, settle_seconds: float = 0) -> Optional[_Entry]:
+        """
+        Read key, treating an entry whose source tables changed since as absent.
+
+        An entry stored less than settle_seconds ago (by its ttl_seconds) is
+        returned without checking its source tables.
+        """
+        now = time.time()
+        entry = self._read(key, now)
+        if entry is not None and settle_seconds > 0 and now < entry.expires_at - ttl_seconds + settle_seconds:
+            return entry
+        if entry is not None and entry.deps:
+            current = self._generations(entry.deps)
+            if any(current.get(table, 0) != generation for table, generation in entry.deps.items()):
+                with self._lock:
+                    self.invalidated += 1
+                return None
+        return entry
+
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if not expired"""
+        entry = self._lookup(key)
+        with self._lock:
+            if entry is None or time.time() >= entry.expires_at:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.value
+    
+    def set(self, key: str, value: Any, ttl_seconds: int = 300, stale_seconds: int = 0,
+            depends_on: Iterable[str] = ()):
+        """Set value in cache with TTL (default 5 minutes), optional stale window and source tables"""
+        self._store(key, value, ttl_seconds, stale_seconds, self._generations(depends_on) if depends_on else None)
+
+    def _store(self, key: str, value: Any, ttl_seconds: int, stale_seconds: int, deps: Optional[Dict[str, int]]):
+        self._ensure_sweeper()
+        expires_at = time.time() + ttl_seconds
+        self._write(key, _Entry(value, expires_at, expires_at + max(0, stale_seconds), deps))
+
+    def get_or_fetch(self, key: str, fetch_func: Callable[[], Any], ttl_seconds: int = 300,
+                     stale_seconds: int = 0, depends_on: Iterable[str] = (), settle_seconds: float = 0) -> Any:
+        """Return the cached value or fetch it, running fetch_func once per key at a time"""
+        depends_on = tuple(depends_on)
+        entry = self._lookup(key, ttl_seconds, settle_seconds)
+        now = time.time()
+        with self._lock:
+            if entry is not None and now < entry.expires_at:
+                self.hits += 1
+                return entry.value
+            if entry is not None and stale_seconds > 0 and now < entry.stale_until:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(
+                        target=self._refresh,
+                        args=(key, fetch_func, ttl_seconds, stale_seconds, depends_on),
+                        name="cache-refresh",
+                        daemon=True,
+                    ).start()
+                return entry.value
+
+            self.misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value, leased = self._claim_fetch(key)
+            if value is _MISSING:
+                try:
+                    # Generations are read before fetching, so a write that lands
+                    # mid-fetch leaves the stored value already out of date
+                    deps = self._generations(depends_on) if depends_on else None
+                    value = fetch_func()
+                    self._store(key, value, ttl_seconds, stale_seconds, deps)
+                finally:
+                    if leased:
+                        self._release_lease(key)
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _claim_fetch(self, key: str):
+        """
+        Take the fetch lease for key, or, while another process holds it, poll
+        until that process publishes a value or the lease wait runs out.
+
+        Returns (value, False) when another process supplied the value, else
+        (_MISSING, leased) meaning the caller should fetch it.
+        """
+        deadline = time.time() + self.lease_seconds
+        while not self._acquire_lease(key):
+            entry = self._lookup(key)
+            if entry is not None and time.time() < entry.expires_at:
+                return entry.value, False
+            if time.time() >= deadline:
+                return _MISSING, False
+            time.sleep(0.05)
+        # The previous holder may have just published the value
+        entry = self._lookup(key)
+        if entry is not None and time.time() < entry.expires_at:
+            self._release_lease(key)
+            return entry.value, False
+        return _MISSING, True
+
+    def _refresh(self, key: str, fetch_func: Callable[[], Any], ttl_seconds: int, stale_seconds: int,
+                 depends_on: tuple):
+        leased = False
+        try:
+            # Another process is already refreshing this key; keep serving stale
+            leased = self._acquire_lease(key)
+            if leased:
+                deps = self._generations(depends_on) if depends_on else None
+                value = fetch_func()
+                self._store(key, value, ttl_seconds, stale_seconds, deps)
+        except Exception as e:
+            # Keep serving the stale value; the next caller after it lapses fetches again
+            with self._lock:
+                self.refresh_errors += 1
+            print(f"Cache refresh failed for {key}: {e}")
+        finally:
+            if leased:
+                self._release_lease(key)
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def get_or_fetch_async(self, key: str, fetch_func: Callable[[], Awaitable[Any]],
+                                 ttl_seconds: int = 300, stale_seconds: int = 0,
+                                 depends_on: Iterable[str] = (), settle_seconds: float = 0) -> Any:
+        """
+        get_or_fetch for async handlers: fetch_func returns an awaitable.
+
+        Concurrent misses in this process await one shared future rather than
+        blocking threads; the cross-process lease is polled with asyncio.sleep,
+        and a blocking backend's storage calls run on the cache I/O threads.
+        """
+        depends_on = tuple(depends_on)
+        entry = await self._io(self._lookup, key, ttl_seconds, settle_seconds)
+        now = time.time()
+        with self._lock:
+            if entry is not None and now < entry.expires_at:
+                self.hits += 1
+                return entry.value
+            if entry is not None and stale_seconds > 0 and now < entry.stale_until:
+                self.stale_hits += 1
+                if key not in self._async_refreshing:
+                    self._async_refreshing.add(key)
+                    task = asyncio.ensure_future(
+                        self._refresh_async(key, fetch_func, ttl_seconds, stale_seconds, depends_on)
+                    )
+                    self._async_refreshes.add(task)
+                    task.add_done_callback(self._async_refreshes.discard)
+                return entry.value
+
+            self.misses += 1
+            future = self._async_inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._async_inflight[key] = asyncio.get_running_loop().create_future()
+
+        if not leader:
+            return await asyncio.shield(future)
+
+        try:
+            value, leased = await self._claim_fetch_async(key)
+            if value is _MISSING:
+                try:
+                    deps = await self._io(self._generations, depends_on) if depends_on else None
+                    value = await fetch_func()
+                    await self._io(self._store, key, value, ttl_seconds, stale_seconds, deps)
+                finally:
+                    if leased:
+                        await self._io(self._release_lease, key)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark it retrieved in case there are none
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                self._async_inflight.pop(key, None)
+
+    async def _claim_fetch_async(self, key: str):
+        """_claim_fetch without blocking the event loop while another process holds the lease"""
+        deadline = time.time() + self.lease_seconds
+        while not await self._io(self._acquire_lease, key):
+            entry = await self._io(self._lookup, key)
+            if entry is not None and time.time() < entry.expires_at:
+                return entry.value, False
+            if time.time() >= deadline:
+                return _MISSING, False
+            await asyncio.sleep(0.05)
+        entry = await self._io(self._lookup, key)
+        if entry is not None and time.time() < entry.expires_at:
+            await self._io(self._release_lease, key)
+            return entry.value, False
+        return _MISSING, True
+
+    async def _refresh_async(self, key: str, fetch_func: Callable[[], Awaitable[Any]],
+                             ttl_seconds: int, stale_seconds: int, depends_on: tuple):
+        leased = False
+        try:
+            leased = await self._io(self._acquire_lease, key)
+            if leased:
+                deps = await self._io(self._generations, depends_on) if depends_on else None
+                value = await fetch_func()
+                await self._io(self._store, key, value, ttl_seconds, stale_seconds, deps)
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            print(f"Cache refresh failed for {key}: {e}")
+        finally:
+            if leased:
+                await self._io(self._release_lease, key)
+            with self._lock:
+                self._async_refreshing.discard(key)
+
+    async def _io(self, func: Callable, *args):
+        """Call a storage method, on the cache I/O threads when it blocks"""
+        if not self.blocking_io:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(_io_executor, func, *args)
+
+    def _ensure_sweeper(self):
+        # Started lazily, and again in each forked worker process
+        if self._sweeper is not None and self._sweeper_pid == os.getpid():
+            return
         with self._lock:
-            if key in self._cache:
-                value, expiry = self._cache[key]
-                if datetime.now() < expiry:
-                    return value
-                else:
-                    # Expired, remove it
-                    del self._cache[key]
-        return None
+            if self._sweeper is not None and self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="cache-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Cache sweep failed: {e}")
     
-    def set(self, key: str, value: Any, ttl_seconds: int = 300):
-        """Set value in cache with TTL (default 5 minutes)"""
+    def get_stats(self) -> dict:
+        """Get cache statistics; hit/miss counters are for this process"""
+        stats = {'backend': self.name}
+        stats.update(self._storage_stats(time.time()))
         with self._lock:
-            expiry = datetime.now() + timedelta(seconds=ttl_seconds)
-            self._cache[key] = (value, expiry)
+            lookups = self.hits + self.stale_hits + self.misses
+            stats.update({
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'invalidated': self.invalidated,
+                'hit_rate': round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+                'refresh_errors': self.refresh_errors,
+                'inflight_fetches': len(self._inflight) + len(self._async_inflight),
+                'refreshing': len(self._refreshing) + len(self._async_refreshing),
+            })
+        return stats
+    
+    def cached(self, key: str, ttl_seconds: int = 300, stale_seconds: int = 0, depends_on: Iterable[str] = ()):
+        """Decorator for caching function results"""
+        def decorator(func: Callable):
+            def wrapper(*args, **kwargs):
+                return self.get_or_fetch(key, lambda: func(*args, **kwargs), ttl_seconds, stale_seconds,
+                                         depends_on)
+            return wrapper
+        return decorator
+
+
+class LRUCache(CacheBackend):
+    """Per-process cache kept in an OrderedDict"""
+    name = "memory"
+
+    def __init__(self, max_entries: int = None, sweep_interval: float = None):
+        super().__init__(max_entries, sweep_interval)
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._table_generations: Dict[str, int] = {}
+        self.evictions = 0
+        self.expirations = 0
+
+    def _read(self, key: str, now: float) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if now >= entry.stale_until:
+                del self._cache[key]
+                self.expirations += 1
+                return None
+            if now < entry.expires_at:
+                self._cache.move_to_end(key)
+            return entry
+
+    def _write(self, key: str, entry: _Entry):
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
     
     def delete(self, key: str):
         """Remove key from cache"""
         with self._lock:
-            if key in self._cache:
+            self._cache.pop(key, None)
+
+    def delete_matching(self, pattern: str) -> int:
+        """Remove every key containing pattern; returns how many were removed"""
+        with self._lock:
+            keys = [key for key in self._cache if pattern in key]
+            for key in keys:
                 del self._cache[key]
+            return len(keys)
     
     def clear(self):
         """Clear entire cache"""
         with self._lock:
             self._cache.clear()
-    
-    def get_stats(self) -> dict:
-        """Get cache statistics"""
+
+    def sweep(self) -> int:
+        """Drop entries whose TTL and stale window have both passed"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._cache.items() if now >= entry.stale_until]
+            for key in expired:
+                del self._cache[key]
+            self.expirations += len(expired)
+            return len(expired)
+
+    def _generations(self, tables: Iterable[str]) -> Dict[str, int]:
+        with self._lock:
+            return {table: self._table_generations.get(table, 0) for table in tables}
+
+    def _bump_generations(self, tables: Iterable[str]):
+        with self._lock:
+            for table in tables:
+                self._table_generations[table] = self._table_generations.get(table, 0) + 1
+
+    def _storage_stats(self, now: float) -> dict:
         with self._lock:
             total_keys = len(self._cache)
-            expired_keys = sum(1 for _, (_, expiry) in self._cache.items() 
-                             if datetime.now() >= expiry)
+            expired_keys = sum(1 for entry in self._cache.values() if now >= entry.expires_at)
             return {
                 'total_keys': total_keys,
                 'active_keys': total_keys - expired_keys,
-                'expired_keys': expired_keys
+                'expired_keys': expired_keys,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
             }
-    
-    def cached(self, key: str, ttl_seconds: int = 300):
-        """Decorator for caching function results"""
-        def decorator(func: Callable):
-            def wrapper(*args, **kwargs):
-                # Try to get from cache
-                cached_value = self.get(key)
-                if cached_value is not None:
-                    return cached_value
-                
-                # Not in cache, execute function
-                result = func(*args, **kwargs)
-                
-                # Store in cache
-                self.set(key, result, ttl_seconds)
-                return result
-            return wrapper
-        return decorator
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a local SQLite file shared by all processes on the host.
+
+    Values are stored as JSON, so cached results must be JSON-serializable
+    (dashboard results are plain dicts/lists). A lease row per key extends
+    single-flight across processes: one worker computes a missing entry while
+    the others poll for it.
+    """
+    name = "sqlite"
+    blocking_io = True
+
+    def __init__(self, path: str = None, max_entries: int = None, sweep_interval: float = None):
+        super().__init__(max_entries, sweep_interval)
+        if path is None:
+            path = os.getenv("CACHE_SQLITE_PATH") or os.path.join(tempfile.gettempdir(), "mart1_cache.sqlite3")
+        self.path = path
+        self._owner = f"{os.getpid()}:{id(self)}"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    stale_until REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    deps TEXT
+                )
+            """)
+            try:
+                # Files created before entries tracked their source tables
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN deps TEXT")
+            except sqlite3.OperationalError:
+                pass
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries(last_access)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_leases (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_generations (
+                    table_name TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._owner = f"{os.getpid()}:{id(self)}"
+        return conn
+
+    def _read(self, key: str, now: float) -> Optional[_Entry]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at, stale_until, deps FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if now >= row[2]:
+            conn.execute("DELETE FROM cache_entries WHERE key = ? AND stale_until <= ?", (key, now))
+            return None
+        if now < row[1]:
+            conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+        return _Entry(json.loads(row[0]), row[1], row[2], json.loads(row[3]) if row[3] else None)
+
+    def _write(self, key: str, entry: _Entry):
+        conn = self._connect()
+        payload = json.dumps(entry.value, separators=(",", ":"), default=str)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, stale_until, last_access, deps) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, payload, entry.expires_at, entry.stale_until, time.time(),
+                 json.dumps(entry.deps) if entry.deps else None),
+            )
+            overflow = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE key IN "
+                    "(SELECT key FROM cache_entries ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key: str):
+        """Remove key from cache"""
+        self._connect().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def delete_matching(self, pattern: str) -> int:
+        """Remove every key containing pattern; returns how many were removed"""
+        cursor = self._connect().execute("DELETE FROM cache_entries WHERE instr(key, ?) > 0", (pattern,))
+        return cursor.rowcount
+
+    def clear(self):
+        """Clear entire cache"""
+        self._connect().execute("DELETE FROM cache_entries")
+
+    def sweep(self) -> int:
+        """Drop entries whose TTL and stale window have both passed"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("DELETE FROM cache_leases WHERE expires_at <= ?", (now,))
+        return conn.execute("DELETE FROM cache_entries WHERE stale_until <= ?", (now,)).rowcount
+
+    def _generations(self, tables: Iterable[str]) -> Dict[str, int]:
+        tables = list(tables)
+        placeholders = ", ".join("?" for _ in tables)
+        rows = self._connect().execute(
+            f"SELECT table_name, generation FROM cache_generations WHERE table_name IN ({placeholders})",
+            tables,
+        ).fetchall()
+        generations = dict.fromkeys(tables, 0)
+        generations.update(rows)
+        return generations
+
+    def _bump_generations(self, tables: Iterable[str]):
+        self._connect().executemany(
+            "INSERT INTO cache_generations (table_name, generation) VALUES (?, 1) "
+            "ON CONFLICT(table_name) DO UPDATE SET generation = generation + 1",
+            [(table,) for table in tables],
+        )
+
+    def _acquire_lease(self, key: str) -> bool:
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO cache_leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE cache_leases.expires_at <= ?",
+            (key, self._owner, now + self.lease_seconds, now),
+        )
+        return cursor.rowcount == 1
+
+    def _release_lease(self, key: str):
+        self._connect().execute("DELETE FROM cache_leases WHERE key = ? AND owner = ?", (key, self._owner))
+
+    def _storage_stats(self, now: float) -> dict:
+        total_keys, expired_keys = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(CASE WHEN expires_at <= ? THEN 1 ELSE 0 END), 0) FROM cache_entries",
+            (now,),
+        ).fetchone()
+        return {
+            'path': self.path,
+            'total_keys': total_keys,
+            'active_keys': total_keys - expired_keys,
+            'expired_keys': expired_keys,
+        }
+
+
+CACHE_BACKENDS = {
+    "memory": LRUCache,
+    "sqlite": SQLiteCache,
+}
+
+
+def create_cache_backend(name: str = None) -> CacheBackend:
+    """Build the backend named by CACHE_BACKEND, falling back to memory if it can't be opened"""
+    if name is None:
+        name = os.getenv("CACHE_BACKEND", "memory")
+    backend = CACHE_BACKENDS.get(name.strip().lower())
+    if backend is None:
+        print(f"Unknown CACHE_BACKEND '{name}', using memory")
+        return LRUCache()
+    try:
+        return backend()
+    except Exception as e:
+        print(f"Could not open {name} cache backend, using memory: {e}")
+        return LRUCache()
 
 
 # Global cache instance
-cache = SimpleCache()
+cache = create_cache_backend()
 
 
-def get_cached_or_fetch(cache_key: str, fetch_func: Callable, ttl_seconds: int = 300) -> Any:
+def get_cached_or_fetch(cache_key: str, fetch_func: Callable, ttl_seconds: int = 300,
+                        stale_seconds: int = 0, depends_on: Iterable[str] = (),
+                        settle_seconds: float = 0) -> Any:
     """
     Helper function to get cached value or fetch and cache it
     
@@ -85,22 +732,61 @@ def get_cached_or_fetch(cache_key: str, fetch_func: Callable, ttl_seconds: int =
         cache_key: Unique key for this cached data
         fetch_func: Function to call if cache miss (should return the data)
         ttl_seconds: Time to live in seconds (default 5 minutes)
+        stale_seconds: How long after expiry the old value may still be served
+            while one background refresh runs (default 0: never serve stale)
+        depends_on: Tables the data is computed from; publish_change on any of
+            them invalidates the entry
+        settle_seconds: How long after it is stored the entry ignores
+            publish_change (default 0). Bounds recomputation to once per
+            settle_seconds for data whose tables are written constantly
     
     Returns:
         The cached or freshly fetched data
     """
-    # Try cache first
-    cached_value = cache.get(cache_key)
-    if cached_value is not None:
-        return cached_value
-    
-    # Cache miss - fetch data
-    fresh_value = fetch_func()
-    
-    # Store in cache
-    cache.set(cache_key, fresh_value, ttl_seconds)
-    
-    return fresh_value
+    return cache.get_or_fetch(cache_key, fetch_func, ttl_seconds, stale_seconds, depends_on, settle_seconds)
+
+
+async def get_cached_or_fetch_async(cache_key: str, fetch_func: Callable[[], Awaitable[Any]],
+                                    ttl_seconds: int = 300, stale_seconds: int = 0,
+                                    depends_on: Iterable[str] = (), settle_seconds: float = 0) -> Any:
+    """
+    get_cached_or_fetch for async route handlers
+
+    fetch_func is called with no arguments and must return an awaitable;
+    the other arguments are as for get_cached_or_fetch.
+    """
+    return await cache.get_or_fetch_async(cache_key, fetch_func, ttl_seconds, stale_seconds, depends_on,
+                                          settle_seconds)
+
+
+def publish_change(*tables: str):
+    """
+    Invalidate cached data computed from the given tables
+
+    Call after the transaction that modified them has committed. A cache
+    failure is logged rather than raised so it never fails a committed write.
+
+    Args:
+        tables: Names of the tables that changed (e.g. "sales", "products")
+    """
+    try:
+        cache.publish_change(*tables)
+    except Exception as e:
+        print(f"Could not publish cache invalidation for {tables}: {e}")
+
+
+def table_generations(*tables: str) -> Dict[str, int]:
+    """
+    Current change generation of each table (bumped by publish_change)
+
+    A data copy tagged with these generations is current for as long as they
+    are unchanged. Returns an empty dict if the cache cannot be read.
+    """
+    try:
+        return cache.table_generations(*tables)
+    except Exception as e:
+        print(f"Could not read cache generations for {tables}: {e}")
+        return {}
 
 
 def invalidate_cache_pattern(pattern: str):
@@ -110,16 +796,7 @@ def invalidate_cache_pattern(pattern: str):
     Args:
         pattern: String pattern to match (simple substring match)
     """
-    keys_to_delete = []
-    
-    # Find matching keys
-    for key in cache._cache.keys():
-        if pattern in key:
-            keys_to_delete.append(key)
-    
-    # Delete them
-    for key in keys_to_delete:
-        cache.delete(key)
+    cache.delete_matching(pattern)
 
 
 # Cache keys constants for consistency
@@ -159,7 +836,14 @@ total_sales = get_cached_or_fetch(
     ttl_seconds=300
 )
 
-# Option 3: Manual cache usage
+# Option 3: Drop the entry as soon as a route calls publish_change("products")
+product_count = get_cached_or_fetch('dashboard:product_count', fetch_product_count,
+                                    ttl_seconds=600, depends_on=("products",))
+
+# Option 4: Serve the old value for up to a minute past expiry while it refreshes
+overview = get_cached_or_fetch('dashboard:overview', fetch_overview, ttl_seconds=60, stale_seconds=60)
+
+# Option 5: Manual cache usage
 cached_data = cache.get('my_key')
 if cached_data is None:
     cached_data = expensive_operation()
@@ -3,6 +3,7 @@ from sqlalchemy import text
 from db import engine
 from auth import has_permission
 from report import fetch_report
+from rollups import ensure_product_sales_stats
 
 # ----------------- Notification Center -----------------
 def notification_center():
@@ -151,19 +152,18 @@ def customer_analytics():
 
 def predictive_restocking():
     """Predict which products will need restocking soon"""
+    # Weekly sales come from the maintained per-product stats, not a scan of all sale items
+    ensure_product_sales_stats()
     query = """
         SELECT p.product_id, p.name, p.stock_quantity, 
                p.low_stock_threshold,
-               COALESCE(SUM(si.quantity), 0) as weekly_sales,
+               COALESCE(st.units_7d, 0) as weekly_sales,
                CASE 
-                   WHEN COALESCE(SUM(si.quantity), 0) = 0 THEN 999
-                   ELSE ROUND(p.stock_quantity / NULLIF(SUM(si.quantity), 0) * 7, 2)
+                   WHEN COALESCE(st.units_7d, 0) = 0 THEN 999
+                   ELSE ROUND(p.stock_quantity / NULLIF(st.units_7d, 0) * 7, 2)
                END as days_remaining
         FROM products p
-        LEFT JOIN sale_items si ON p.product_id = si.product_id
-        LEFT JOIN sales s ON si.sale_id = s.sale_id
-        WHERE s.sale_time >= CURRENT_DATE - INTERVAL '7 days' OR s.sale_time IS NULL
-        GROUP BY p.product_id, p.name, p.stock_quantity, p.low_stock_threshold
+        LEFT JOIN product_sales_stats st ON p.product_id = st.product_id
         ORDER BY days_remaining ASC
     """
     fetch_report(query, "Predictive Restocking Analysis", "predictive_restock")
@@ -3,6 +3,7 @@ from sqlalchemy import text
 from tabulate import tabulate
 from db import engine
 from auth import has_permission
+from rollups import ensure_product_sales_stats
 from datetime import datetime, timedelta
 import decimal
 
@@ -21,12 +22,20 @@ def safe_float_convert(value):
     except (TypeError, ValueError):
         return 0.0
 
+def sales_stats_note():
+    """Bring product_sales_stats up to date and describe how fresh it is"""
+    refreshed_at = ensure_product_sales_stats()
+    if refreshed_at is None:
+        return "Sales velocity not yet computed"
+    return f"Sales velocity as of {refreshed_at.strftime('%Y-%m-%d %H:%M')}"
+
 def dead_stock_identification():
     """Identify slow-moving and dead stock items"""
     if not has_permission(["MANAGER", "ADMIN"]):
         return
         
     try:
+        stats_note = sales_stats_note()
         with engine.connect() as conn:
             # Dead Stock Analysis (no sales in 90 days but have stock)
             dead_stock = conn.execute(text("""
@@ -37,22 +46,20 @@ def dead_stock_identification():
                     p.stock_quantity,
                     p.low_stock_threshold,
                     p.price,
-                    MAX(s.sale_time) as last_sale_date,
-                    COALESCE(SUM(si.quantity), 0) as total_sold,
+                    st.last_sale_time as last_sale_date,
+                    COALESCE(st.units_total, 0) as total_sold,
                     CASE 
-                        WHEN MAX(s.sale_time) IS NULL THEN 'Never Sold'
-                        WHEN MAX(s.sale_time) < CURRENT_DATE - INTERVAL '90 days' THEN '90+ Days'
-                        WHEN MAX(s.sale_time) < CURRENT_DATE - INTERVAL '60 days' THEN '60+ Days'
+                        WHEN st.last_sale_time IS NULL THEN 'Never Sold'
+                        WHEN st.last_sale_time < CURRENT_DATE - INTERVAL '90 days' THEN '90+ Days'
+                        WHEN st.last_sale_time < CURRENT_DATE - INTERVAL '60 days' THEN '60+ Days'
                         ELSE 'Active'
                     END as sales_status,
                     (p.stock_quantity * p.price) as inventory_value
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.category_id
-                LEFT JOIN sale_items si ON p.product_id = si.product_id
-                LEFT JOIN sales s ON si.sale_id = s.sale_id
+                LEFT JOIN product_sales_stats st ON p.product_id = st.product_id
                 WHERE p.stock_quantity > 0
-                GROUP BY p.product_id, p.name, c.name, p.stock_quantity, p.low_stock_threshold, p.price
-                HAVING MAX(s.sale_time) IS NULL OR MAX(s.sale_time) < CURRENT_DATE - INTERVAL '60 days'
+                  AND (st.last_sale_time IS NULL OR st.last_sale_time < CURRENT_DATE - INTERVAL '60 days')
                 ORDER BY last_sale_date NULLS FIRST, total_sold ASC
             """)).fetchall()
             
@@ -64,21 +71,17 @@ def dead_stock_identification():
                     c.name as category,
                     p.stock_quantity,
                     p.price,
-                    COALESCE(SUM(si.quantity), 0) as units_sold_90d,
-                    COALESCE(SUM(si.quantity * si.unit_price), 0) as revenue_90d,
+                    st.units_90d as units_sold_90d,
+                    st.revenue_90d as revenue_90d,
                     CASE 
                         WHEN p.stock_quantity = 0 THEN 0
-                        WHEN COALESCE(SUM(si.quantity), 0) = 0 THEN 999
-                        ELSE ROUND(p.stock_quantity / NULLIF(SUM(si.quantity), 0) * 90, 1)
+                        ELSE ROUND(p.stock_quantity / NULLIF(st.units_90d, 0) * 90, 1)
                     END as days_of_supply,
                     (p.stock_quantity * p.price) as inventory_value
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.category_id
-                LEFT JOIN sale_items si ON p.product_id = si.product_id
-                LEFT JOIN sales s ON si.sale_id = s.sale_id
-                WHERE s.sale_time >= CURRENT_DATE - INTERVAL '90 days' OR s.sale_time IS NULL
-                GROUP BY p.product_id, p.name, c.name, p.stock_quantity, p.price
-                HAVING COALESCE(SUM(si.quantity), 0) > 0  -- Has some sales
+                JOIN product_sales_stats st ON p.product_id = st.product_id
+                WHERE st.units_90d > 0  -- Has some sales
                 ORDER BY days_of_supply DESC NULLS LAST
                 LIMIT 20
             """)).fetchall()
@@ -91,24 +94,23 @@ def dead_stock_identification():
                     c.name as category,
                     p.stock_quantity,
                     p.price,
-                    MAX(s.sale_time) as last_sale_date,
-                    COALESCE(SUM(si.quantity), 0) as total_sold,
+                    st.last_sale_time as last_sale_date,
+                    COALESCE(st.units_total, 0) as total_sold,
                     CASE 
-                        WHEN MAX(s.sale_time) IS NULL THEN 999
-                        ELSE EXTRACT(DAY FROM CURRENT_DATE - MAX(s.sale_time))
+                        WHEN st.last_sale_time IS NULL THEN 999
+                        ELSE EXTRACT(DAY FROM CURRENT_DATE - st.last_sale_time)
                     END as days_since_last_sale,
                     (p.stock_quantity * p.price) as inventory_value
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.category_id
-                LEFT JOIN sale_items si ON p.product_id = si.product_id
-                LEFT JOIN sales s ON si.sale_id = s.sale_id
+                LEFT JOIN product_sales_stats st ON p.product_id = st.product_id
                 WHERE p.stock_quantity > 0
-                GROUP BY p.product_id, p.name, c.name, p.stock_quantity, p.price
                 ORDER BY days_since_last_sale DESC, inventory_value DESC
             """)).fetchall()
             
         print("\n" + "="*100)
         print("📦 DEAD STOCK IDENTIFICATION & INVENTORY OPTIMIZATION")
+        print(stats_note)
         print("="*100)
         
         # Display Dead Stock
@@ -240,6 +242,7 @@ def generate_clearance_recommendations():
         return
         
     try:
+        stats_note = sales_stats_note()
         with engine.connect() as conn:
             # Get candidates for clearance
             clearance_candidates = conn.execute(text("""
@@ -249,23 +252,22 @@ def generate_clearance_recommendations():
                     c.name as category,
                     p.stock_quantity,
                     p.price as current_price,
-                    MAX(s.sale_time) as last_sale,
-                    COALESCE(SUM(si.quantity), 0) as total_sold,
+                    st.last_sale_time as last_sale,
+                    COALESCE(st.units_total, 0) as total_sold,
                     CASE 
-                        WHEN MAX(s.sale_time) IS NULL THEN 999
-                        ELSE EXTRACT(DAY FROM CURRENT_DATE - MAX(s.sale_time))
+                        WHEN st.last_sale_time IS NULL THEN 999
+                        ELSE EXTRACT(DAY FROM CURRENT_DATE - st.last_sale_time)
                     END as days_unsold
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.category_id
-                LEFT JOIN sale_items si ON p.product_id = si.product_id
-                LEFT JOIN sales s ON si.sale_id = s.sale_id
+                LEFT JOIN product_sales_stats st ON p.product_id = st.product_id
                 WHERE p.stock_quantity > 0
-                GROUP BY p.product_id, p.name, c.name, p.stock_quantity, p.price
-                HAVING MAX(s.sale_time) IS NULL OR MAX(s.sale_time) < CURRENT_DATE - INTERVAL '60 days'
+                  AND (st.last_sale_time IS NULL OR st.last_sale_time < CURRENT_DATE - INTERVAL '60 days')
                 ORDER BY days_unsold DESC, p.stock_quantity DESC
             """)).fetchall()
             
         print("\n🎪 CLEARANCE PRICING RECOMMENDATIONS")
+        print(stats_note)
         print("=" * 80)
         
         if clearance_candidates:
@@ -329,6 +331,7 @@ def inventory_health_dashboard():
         return
         
     try:
+        stats_note = sales_stats_note()
         with engine.connect() as conn:
             # Overall Inventory Metrics
             overall_metrics = conn.execute(text("""
@@ -366,30 +369,28 @@ def inventory_health_dashboard():
                     p.name as product_name,
                     c.name as category,
                     p.stock_quantity,
-                    COALESCE(SUM(si.quantity), 0) as units_sold_30d,
+                    COALESCE(st.units_30d, 0) as units_sold_30d,
                     CASE 
                         WHEN p.stock_quantity = 0 THEN 0
-                        WHEN COALESCE(SUM(si.quantity), 0) = 0 THEN 999
-                        ELSE ROUND(p.stock_quantity / NULLIF(SUM(si.quantity), 0) * 30, 1)
+                        WHEN COALESCE(st.units_30d, 0) = 0 THEN 999
+                        ELSE ROUND(p.stock_quantity / NULLIF(st.units_30d, 0) * 30, 1)
                     END as days_of_supply,
                     CASE 
-                        WHEN COALESCE(SUM(si.quantity), 0) = 0 THEN 'No Sales'
-                        WHEN (p.stock_quantity / NULLIF(SUM(si.quantity), 0) * 30) > 90 THEN 'Slow'
-                        WHEN (p.stock_quantity / NULLIF(SUM(si.quantity), 0) * 30) > 30 THEN 'Moderate'
+                        WHEN COALESCE(st.units_30d, 0) = 0 THEN 'No Sales'
+                        WHEN (p.stock_quantity / NULLIF(st.units_30d, 0) * 30) > 90 THEN 'Slow'
+                        WHEN (p.stock_quantity / NULLIF(st.units_30d, 0) * 30) > 30 THEN 'Moderate'
                         ELSE 'Fast'
                     END as turnover_rate
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.category_id
-                LEFT JOIN sale_items si ON p.product_id = si.product_id
-                LEFT JOIN sales s ON si.sale_id = s.sale_id
-                WHERE s.sale_time >= CURRENT_DATE - INTERVAL '30 days' OR s.sale_time IS NULL
-                GROUP BY p.product_id, p.name, c.name, p.stock_quantity
+                LEFT JOIN product_sales_stats st ON p.product_id = st.product_id
                 ORDER BY days_of_supply DESC
                 LIMIT 15
             """)).fetchall()
             
         print("\n" + "="*100)
         print("🏥 INVENTORY HEALTH DASHBOARD")
+        print(stats_note)
         print("="*100)
         
         # Display Overall Metrics
@@ -3,6 +3,7 @@ import pandas as pd
 from sqlalchemy import text
 from tabulate import tabulate
 from db import engine
+from report_views import ensure_report_views
 import datetime
 
 # ------------------ Helper Function ------------------
@@ -46,20 +47,34 @@ def fetch_report(query, report_name, file_name, params=None):
     except Exception as e:
         print("❌ Error while fetching report:", e)
 
+def summary_note(view_name):
+    """Bring the report views up to date and describe how fresh view_name is"""
+    try:
+        status = ensure_report_views().get(view_name)
+    except Exception as e:
+        return f"Could not refresh report views: {e}"
+    if not status:
+        return "Summary not yet refreshed"
+    return f"Summary as of {status['refreshed_at'].strftime('%Y-%m-%d %H:%M')}"
+
 # ------------------ Report Functions ------------------
 def daily_sales_report(start_date=None, end_date=None):
+    print(summary_note("daily_sales_report"))
     query = "SELECT * FROM daily_sales_report"
     params = None
     if start_date and end_date:
         query += " WHERE date BETWEEN :start AND :end"
         params = {"start": start_date, "end": end_date}
+    query += " ORDER BY date DESC"
     fetch_report(query, "Daily Sales Report", "daily_sales_report", params)
 
 def best_selling_products(top_n=10):
-    query = "SELECT * FROM best_selling_products LIMIT :limit"
+    print(summary_note("best_selling_products"))
+    query = "SELECT * FROM best_selling_products ORDER BY units_sold DESC, product_id LIMIT :limit"
     fetch_report(query, f"Top {top_n} Best Selling Products", "best_selling_products", {"limit": top_n})
 
 def low_stock_report(threshold=10):
+    print(summary_note("low_stock_products"))
     query = """
         SELECT * FROM low_stock_products
         WHERE stock_quantity < :threshold
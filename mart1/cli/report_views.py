@@ -0,0 +1,12 @@
+"""Re-export the report summary view helpers from the main mart1 report_views module."""
+
+import importlib.util
+from pathlib import Path
+
+_parent_report_views = Path(__file__).resolve().parent.parent / "report_views.py"
+_spec = importlib.util.spec_from_file_location("mart1_report_views", _parent_report_views)
+_mart1_report_views = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_mart1_report_views)
+
+ensure_report_views = _mart1_report_views.ensure_report_views
+refresh_report_views = _mart1_report_views.refresh_report_views
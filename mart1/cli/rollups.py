@@ -0,0 +1,13 @@
+"""Re-export the sales rollup helpers from the main mart1 rollups module."""
+
+import importlib.util
+from pathlib import Path
+
+_parent_rollups = Path(__file__).resolve().parent.parent / "rollups.py"
+_spec = importlib.util.spec_from_file_location("mart1_rollups", _parent_rollups)
+_mart1_rollups = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_mart1_rollups)
+
+create_rollup_tables = _mart1_rollups.create_rollup_tables
+ensure_product_sales_stats = _mart1_rollups.ensure_product_sales_stats
+refresh_rollups = _mart1_rollups.refresh_rollups
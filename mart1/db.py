@@ -1,8 +1,19 @@
 import os
+import threading
+import time
 import psycopg2
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.engine import URL
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+try:
+    import asyncpg
+    from sqlalchemy.ext.asyncio import create_async_engine
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
 
 load_dotenv()
 
@@ -20,6 +31,157 @@ DB_USER = os.getenv(
 DB_PASS = os.getenv("PGPASSWORD", "")
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# The asyncpg engine serves the ported read routes without a thread per
+# request; DB_ASYNC=0 disables it and runs them on the sync engine
+DB_ASYNC = os.getenv("DB_ASYNC", "1") != "0"
+ASYNC_DB_ENABLED = ASYNCPG_AVAILABLE and DB_ASYNC
+
+# Per process, and every engine holds connections: with N uvicorn workers the
+# database sees N * (DB_POOL_SIZE + DB_MAX_OVERFLOW + ASYNC_DB_POOL_SIZE +
+# ASYNC_DB_MAX_OVERFLOW + DB_BACKGROUND_POOL_SIZE). The route pools come to
+# 10 per worker whether or not the async engine is on, by giving up the sync
+# overflow when it is; the background pool adds 3.
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 0 if ASYNC_DB_ENABLED else 5)
+ASYNC_DB_POOL_SIZE = _env_int("ASYNC_DB_POOL_SIZE", 5)
+ASYNC_DB_MAX_OVERFLOW = _env_int("ASYNC_DB_MAX_OVERFLOW", 0)
+# Background jobs (rollups, report view refreshes, the audit writer, the
+# barcode index load) get their own small pool so a slow refresh never holds
+# a connection the route threads were sized for. One per job by default
+DB_BACKGROUND_POOL_SIZE = _env_int("DB_BACKGROUND_POOL_SIZE", 3)
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+
+# SQLAlchemy's per-engine cache of compiled statements, and asyncpg's
+# per-connection cache of server-side prepared statements (0 disables it, as
+# PgBouncer in transaction mode requires). psycopg2 has no server-side
+# prepare, so on the sync engine only the compiled cache applies
+DB_QUERY_CACHE_SIZE = _env_int("DB_QUERY_CACHE_SIZE", 500)
+DB_PREPARED_STATEMENT_CACHE_SIZE = _env_int("DB_PREPARED_STATEMENT_CACHE_SIZE", 100)
+
+# Distinct statement texts remembered for the shape count
+STATEMENT_SHAPES_MAX = _env_int("STATEMENT_SHAPES_MAX", 2000)
+
+# Upper bounds (ms) of the checkout wait histogram buckets; the last bucket is open
+POOL_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    """Checkout counts, wait time histogram and timeouts of the connection pool"""
+
+    def __init__(self, buckets_ms=POOL_WAIT_BUCKETS_MS):
+        self._lock = threading.Lock()
+        self.buckets_ms = tuple(buckets_ms)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_ms_total = 0.0
+            self.wait_ms_max = 0.0
+            self.bucket_counts = [0] * (len(self.buckets_ms) + 1)
+
+    def record_wait(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            index = len(self.buckets_ms)
+            for i, bound in enumerate(self.buckets_ms):
+                if wait_ms <= bound:
+                    index = i
+                    break
+            self.bucket_counts[index] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            histogram = {f"le_{bound}": count for bound, count in zip(self.buckets_ms, self.bucket_counts)}
+            histogram["inf"] = self.bucket_counts[-1]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_ms_total / attempts, 3) if attempts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+                "wait_ms_histogram": histogram,
+            }
+
+
+class StatementMetrics:
+    """
+    Executions per distinct statement text sent to the driver.
+
+    Bound parameters are placeholders in that text, so a steady count means
+    statements are reused; a count that keeps growing points at SQL built
+    per request (values interpolated into the string).
+    """
+
+    def __init__(self, max_shapes: int = STATEMENT_SHAPES_MAX):
+        self._lock = threading.Lock()
+        self.max_shapes = max(1, max_shapes)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.executions = 0
+            self.untracked = 0
+            self.shapes = {}
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.executions += 1
+            if statement in self.shapes:
+                self.shapes[statement] += 1
+            elif len(self.shapes) < self.max_shapes:
+                self.shapes[statement] = 1
+            else:
+                self.untracked += 1
+
+    def snapshot(self, top: int = 10) -> dict:
+        with self._lock:
+            busiest = sorted(self.shapes.items(), key=lambda item: item[1], reverse=True)[:top]
+            return {
+                "distinct_shapes": len(self.shapes),
+                "shape_limit_reached": len(self.shapes) >= self.max_shapes,
+                "executions": self.executions,
+                "untracked_executions": self.untracked,
+                "top_shapes": [
+                    {"statement": " ".join(statement.split())[:200], "executions": count}
+                    for statement, count in busiest
+                ],
+            }
+
+
+statement_metrics = StatementMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_wait((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.metrics.record_wait((time.perf_counter() - started) * 1000)
+        return connection
+
+
 def get_connection():
     try:
         return psycopg2.connect(
@@ -47,6 +209,18 @@ def get_connection_string():
     )
 
 
+def get_async_connection_string():
+    return URL.create(
+        drivername="postgresql+asyncpg",
+        username=DB_USER,
+        password=DB_PASS,
+        host=DB_HOST,
+        port=DB_PORT,
+        database=DB_NAME,
+        query={"prepared_statement_cache_size": str(DB_PREPARED_STATEMENT_CACHE_SIZE)},
+    )
+
+
 def get_engine():
     try:
         print(
@@ -63,11 +237,13 @@ def get_engine():
         return create_engine(
             get_connection_string(),
             echo=False,
-            pool_size=5,
-            max_overflow=5,
-            pool_timeout=30,
-            pool_recycle=1800,
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
             pool_pre_ping=True,
+            query_cache_size=DB_QUERY_CACHE_SIZE,
             echo_pool=False
         )
 
@@ -77,3 +253,89 @@ def get_engine():
 
 
 engine = get_engine()
+
+
+def get_background_engine():
+    """Sync engine for background jobs, on its own DB_BACKGROUND_POOL_SIZE connections"""
+    try:
+        return create_engine(
+            get_connection_string(),
+            echo=False,
+            pool_size=max(1, DB_BACKGROUND_POOL_SIZE),
+            max_overflow=0,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+            query_cache_size=DB_QUERY_CACHE_SIZE,
+        )
+    except Exception as e:
+        print(f"Error creating background SQLAlchemy engine: {e}")
+        return None
+
+
+background_engine = get_background_engine()
+
+
+def get_async_engine():
+    """SQLAlchemy asyncio engine on asyncpg, or None when asyncpg is missing or DB_ASYNC=0"""
+    if not ASYNC_DB_ENABLED:
+        return None
+    try:
+        return create_async_engine(
+            get_async_connection_string(),
+            echo=False,
+            pool_size=ASYNC_DB_POOL_SIZE,
+            max_overflow=ASYNC_DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+            query_cache_size=DB_QUERY_CACHE_SIZE,
+            connect_args={"ssl": "require"},
+        )
+    except Exception as e:
+        print(f"Error creating async SQLAlchemy engine: {e}")
+        return None
+
+
+async_engine = get_async_engine()
+
+if engine is not None:
+    event.listen(engine, "before_cursor_execute", statement_metrics.record)
+if async_engine is not None:
+    event.listen(async_engine.sync_engine, "before_cursor_execute", statement_metrics.record)
+if background_engine is not None:
+    event.listen(background_engine, "before_cursor_execute", statement_metrics.record)
+
+
+def get_pool_stats() -> dict:
+    """Current pool occupancy plus the checkout wait metrics"""
+    stats = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    if engine is not None:
+        pool = engine.pool
+        stats.update({
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+        })
+    stats.update(InstrumentedQueuePool.metrics.snapshot())
+    if async_engine is not None:
+        async_pool = async_engine.pool
+        stats["async_pool"] = {
+            "pool_size": ASYNC_DB_POOL_SIZE,
+            "max_overflow": ASYNC_DB_MAX_OVERFLOW,
+            "checked_out": async_pool.checkedout(),
+            "checked_in": async_pool.checkedin(),
+            "overflow": max(0, async_pool.overflow()),
+        }
+    if background_engine is not None:
+        background_pool = background_engine.pool
+        stats["background_pool"] = {
+            "pool_size": max(1, DB_BACKGROUND_POOL_SIZE),
+            "checked_out": background_pool.checkedout(),
+            "checked_in": background_pool.checkedin(),
+        }
+    return stats
@@ -1,9 +1,14 @@
 import { ChevronLeft, ChevronRight, ChevronsLeft, ChevronsRight } from 'lucide-react';
 import '../styles/Pagination.css';
 
-function Pagination({ currentPage, totalPages, totalItems, pageSize, onPageChange, loading }) {
+// totalPages null means the total is unknown (count_mode "none"): only
+// previous/next are shown, and hasNext says whether there is a next page
+function Pagination({ currentPage, totalPages, totalItems, pageSize, onPageChange, loading, hasNext = false }) {
+  const countKnown = totalPages !== null && totalPages !== undefined;
+
   const handlePageChange = (newPage) => {
-    if (newPage >= 1 && newPage <= totalPages && !loading) {
+    const lastPage = countKnown ? totalPages : (hasNext ? currentPage + 1 : currentPage);
+    if (newPage >= 1 && newPage <= lastPage && !loading) {
       onPageChange(newPage);
     }
   };
@@ -40,6 +45,37 @@ function Pagination({ currentPage, totalPages, totalItems, pageSize, onPageChang
     return pages;
   };
 
+  if (!countKnown) {
+    if (currentPage === 1 && !hasNext) return null;
+    return (
+      <div className="pagination-container">
+        <div className="pagination-info">
+          Page {currentPage}
+        </div>
+
+        <div className="pagination-controls">
+          <button
+            className="pagination-btn"
+            onClick={() => handlePageChange(currentPage - 1)}
+            disabled={currentPage === 1 || loading}
+            title="Previous page"
+          >
+            <ChevronLeft size={18} />
+          </button>
+
+          <button
+            className="pagination-btn"
+            onClick={() => handlePageChange(currentPage + 1)}
+            disabled={!hasNext || loading}
+            title="Next page"
+          >
+            <ChevronRight size={18} />
+          </button>
+        </div>
+      </div>
+    );
+  }
+
   if (totalPages <= 1) return null;
 
   return (
@@ -39,12 +39,42 @@ function Products() {
   const [restockQuantity, setRestockQuantity] = useState('');
   const [filteredSuppliers, setFilteredSuppliers] = useState([]);
   const [searchTerm, setSearchTerm] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
+  const [searchPage, setSearchPage] = useState(1);
+  const [searchHasNext, setSearchHasNext] = useState(false);
+  // Bumped after a write so the open search is run again
+  const [searchVersion, setSearchVersion] = useState(0);
   const [deleteConfirm, setDeleteConfirm] = useState({ isOpen: false, productId: null, productName: '' });
 
   useEffect(() => {
     loadData();
   }, [currentPage]);
 
+  useEffect(() => {
+    // Search the whole catalog on the server once typing pauses
+    const term = searchTerm.trim();
+    if (!term) {
+      setSearchResults(null);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await products.search(term, searchPage, 50);
+        if (!cancelled) {
+          setSearchResults(res.data.products);
+          setSearchHasNext(res.data.pagination.has_next);
+        }
+      } catch (error) {
+        console.error('Product search failed:', error);
+      }
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm, searchPage, searchVersion]);
+
   useEffect(() => {
     // Filter suppliers based on selected category
     if (newProduct.category_id) {
@@ -89,11 +119,30 @@ function Products() {
     }
   };
 
+  // Reload the page and any open search after a write
+  const refreshProducts = () => {
+    loadData();
+    setSearchVersion((version) => version + 1);
+  };
+
   const handlePageChange = (newPage) => {
     setCurrentPage(newPage);
     window.scrollTo({ top: 0, behavior: 'smooth' });
   };
 
+  const handleSearchChange = (e) => {
+    // Results of the previous term must not stay on screen under the new one
+    setSearchTerm(e.target.value);
+    setSearchResults(null);
+    setSearchHasNext(false);
+    setSearchPage(1);
+  };
+
+  const handleSearchPageChange = (newPage) => {
+    setSearchPage(newPage);
+    window.scrollTo({ top: 0, behavior: 'smooth' });
+  };
+
   const handleAddProduct = async (e) => {
     e.preventDefault();
     const loadingToast = toast.loading('Adding product...');
@@ -117,7 +166,7 @@ function Products() {
         supplier_id: '',
         low_stock_threshold: 10,
       });
-      loadData();
+      refreshProducts();
     } catch (error) {
       toast.error('Failed to add product: ' + (error.response?.data?.detail || error.message), { id: loadingToast });
     }
@@ -132,7 +181,7 @@ function Products() {
       setShowRestockForm(false);
       setSelectedProduct(null);
       setRestockQuantity('');
-      loadData();
+      refreshProducts();
     } catch (error) {
       toast.error('Failed to update stock: ' + (error.response?.data?.detail || error.message), { id: loadingToast });
     }
@@ -152,15 +201,16 @@ function Products() {
       await products.delete(deleteConfirm.productId);
       toast.success(`Product "${deleteConfirm.productName}" deleted successfully!`, { id: loadingToast });
       setDeleteConfirm({ isOpen: false, productId: null, productName: '' });
-      loadData();
+      refreshProducts();
     } catch (error) {
       toast.error('Failed to delete product: ' + (error.response?.data?.detail || error.message), { id: loadingToast });
     }
   };
 
-  const filteredProducts = productList.filter(product =>
+  // Server results once they arrive; until then narrow the current page
+  const filteredProducts = searchResults ?? productList.filter(product =>
     product.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    product.barcode.toLowerCase().includes(searchTerm.toLowerCase())
+    (product.barcode || '').toLowerCase().includes(searchTerm.toLowerCase())
   );
 
   if (loading) {
@@ -199,9 +249,9 @@ function Products() {
             <Search size={20} />
             <input
               type="text"
-              placeholder="Search products by name or barcode..."
+              placeholder="Search by name, barcode, category or supplier..."
               value={searchTerm}
-              onChange={(e) => setSearchTerm(e.target.value)}
+              onChange={handleSearchChange}
             />
           </div>
           {user?.role === 'ADMIN' && (
@@ -268,14 +318,25 @@ function Products() {
         </table>
       </div>
 
-      <Pagination
-        currentPage={pagination.page}
-        totalPages={pagination.total_pages}
-        totalItems={pagination.total_items}
-        pageSize={pagination.page_size}
-        onPageChange={handlePageChange}
-        loading={loading}
-      />
+      {searchResults === null ? (
+        <Pagination
+          currentPage={pagination.page}
+          totalPages={pagination.total_pages}
+          totalItems={pagination.total_items}
+          pageSize={pagination.page_size}
+          onPageChange={handlePageChange}
+          loading={loading}
+        />
+      ) : (
+        <Pagination
+          currentPage={searchPage}
+          totalPages={null}
+          pageSize={50}
+          hasNext={searchHasNext}
+          onPageChange={handleSearchPageChange}
+          loading={loading}
+        />
+      )}
 
       {showAddForm && (
         <div className="modal" onClick={() => setShowAddForm(false)}>
@@ -27,6 +27,8 @@ export const auth = {
 
 export const products = {
   getAll: (page = 1, pageSize = 50) => api.get(`/products?page=${page}&page_size=${pageSize}`),
+  search: (q, page = 1, pageSize = 50) =>
+    api.get('/products/search', { params: { q, page, page_size: pageSize } }),
   add: (product) => api.post('/products', product),
   updateStock: (productId, quantity) => 
     api.put(`/products/${productId}/stock`, { product_id: productId, quantity }),
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
 
@@ -47,6 +48,19 @@ class Sale(BaseModel):
     feedback: Optional[str] = None
 
 
+class BatchSale(Sale):
+    client_ref: Optional[str] = None  # Till's own id for the sale, echoed back in results
+    sale_time: Optional[datetime] = None  # When the sale happened offline; defaults to upload time
+
+
+class SaleBatch(BaseModel):
+    sales: List[BatchSale] = Field(..., min_length=1, max_length=5000)
+
+
+class BarcodeLookup(BaseModel):
+    barcodes: List[str] = Field(..., min_length=1, max_length=500)
+
+
 class Customer(BaseModel):
     name: str
     phone: Optional[str] = None
@@ -0,0 +1,217 @@
+"""
+Password Hashing Pool
+Runs bcrypt in a small process pool so login bursts cannot take CPU from other requests
+
+bcrypt is deliberately slow CPU work. Verification and hashing run in
+PASSWORD_HASH_WORKERS worker processes; at most PASSWORD_HASH_QUEUE_SIZE
+requests may be running or waiting, and callers past that get
+PasswordPoolBusy immediately instead of queueing. LoginRateLimiter turns
+away a username's attempts beyond LOGIN_RATE_LIMIT per
+LOGIN_RATE_WINDOW_SECONDS before any query or hashing happens.
+
+The workers are forked. api_server calls start() before anything else in
+the process starts a thread, so they are forked from a single-threaded parent.
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+import time
+
+import bcrypt
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+PASSWORD_HASH_WORKERS = max(1, _env_int("PASSWORD_HASH_WORKERS", min(2, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_SIZE = max(1, _env_int("PASSWORD_HASH_QUEUE_SIZE", 32))
+LOGIN_RATE_LIMIT = _env_int("LOGIN_RATE_LIMIT", 5)
+LOGIN_RATE_WINDOW_SECONDS = _env_int("LOGIN_RATE_WINDOW_SECONDS", 60)
+
+# Upper bounds (ms) of the hash latency histogram buckets; the last bucket is open
+HASH_LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when PASSWORD_HASH_QUEUE_SIZE hash requests are already pending"""
+
+
+# Worker-side functions (run in the pool processes)
+
+def _check_password(password: str, stored_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), stored_password.encode("utf-8"))
+    except ValueError:
+        # Stored value is not a bcrypt hash (legacy plain-text password)
+        return password == stored_password
+
+
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+
+class PasswordHasher:
+    """Bounded process pool for bcrypt with latency and rejection counters"""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_size: int = PASSWORD_HASH_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latency_ms_total = 0.0
+        self.latency_ms_max = 0.0
+        self.bucket_counts = [0] * (len(HASH_LATENCY_BUCKETS_MS) + 1)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created on first use, and again in each forked server worker process
+        if self._executor is None or self._executor_pid != os.getpid():
+            context = None
+            if "fork" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("fork")
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def start(self):
+        """Fork the worker processes now (a fork pool starts every worker on its first task)"""
+        with self._lock:
+            executor = self._get_executor()
+        executor.submit(os.getpid).result()
+
+    def _submit(self, func, *args) -> Future:
+        with self._lock:
+            if self.pending >= self.queue_size:
+                self.rejected += 1
+                raise PasswordPoolBusy("Too many password checks in progress")
+            self.pending += 1
+            executor = self._get_executor()
+        started = time.perf_counter()
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(lambda _: self._record((time.perf_counter() - started) * 1000))
+        return future
+
+    def _record(self, latency_ms: float):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            self.latency_ms_total += latency_ms
+            self.latency_ms_max = max(self.latency_ms_max, latency_ms)
+            index = len(HASH_LATENCY_BUCKETS_MS)
+            for i, bound in enumerate(HASH_LATENCY_BUCKETS_MS):
+                if latency_ms <= bound:
+                    index = i
+                    break
+            self.bucket_counts[index] += 1
+
+    def check_password(self, password: str, stored_password: str) -> Future:
+        """Future resolving to whether password matches stored_password; may raise PasswordPoolBusy"""
+        return self._submit(_check_password, password, stored_password)
+
+    def hash_password(self, password: str) -> Future:
+        """Future resolving to the bcrypt hash of password; may raise PasswordPoolBusy"""
+        return self._submit(_hash_password, password)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            histogram = {f"le_{bound}": count for bound, count in zip(HASH_LATENCY_BUCKETS_MS, self.bucket_counts)}
+            histogram["inf"] = self.bucket_counts[-1]
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected_busy": self.rejected,
+                "latency_ms_avg": round(self.latency_ms_total / self.completed, 3) if self.completed else 0.0,
+                "latency_ms_max": round(self.latency_ms_max, 3),
+                "latency_ms_histogram": histogram,
+            }
+
+    def shutdown(self):
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class LoginRateLimiter:
+    """
+    Sliding-window limit on login attempts per username, per process.
+
+    Remembers at most max_usernames usernames, dropping the least recently
+    attempted first.
+    """
+
+    def __init__(self, limit: int = LOGIN_RATE_LIMIT, window_seconds: int = LOGIN_RATE_WINDOW_SECONDS,
+                 max_usernames: int = 10000):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_usernames = max_usernames
+        self._lock = threading.Lock()
+        self._attempts = OrderedDict()
+        self.limited = 0
+
+    def allow(self, username: str) -> bool:
+        """Record an attempt for username; False when it is over the limit (limit <= 0 disables)"""
+        if self.limit <= 0:
+            return True
+        key = (username or "").lower()
+        now = time.time()
+        with self._lock:
+            attempts = self._attempts.pop(key, None) or deque()
+            while attempts and attempts[0] <= now - self.window_seconds:
+                attempts.popleft()
+            allowed = len(attempts) < self.limit
+            if allowed:
+                attempts.append(now)
+            else:
+                self.limited += 1
+            self._attempts[key] = attempts
+            while len(self._attempts) > self.max_usernames:
+                self._attempts.popitem(last=False)
+            return allowed
+
+    def reset(self, username: str):
+        """Forget username's attempts, e.g. after a successful login"""
+        with self._lock:
+            self._attempts.pop((username or "").lower(), None)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "window_seconds": self.window_seconds,
+                "tracked_usernames": len(self._attempts),
+                "rate_limited": self.limited,
+            }
+
+
+# Global instances
+_password_hasher = None
+_login_rate_limiter = None
+
+def get_password_hasher() -> PasswordHasher:
+    global _password_hasher
+    if _password_hasher is None:
+        _password_hasher = PasswordHasher()
+    return _password_hasher
+
+
+def get_login_rate_limiter() -> LoginRateLimiter:
+    global _login_rate_limiter
+    if _login_rate_limiter is None:
+        _login_rate_limiter = LoginRateLimiter()
+    return _login_rate_limiter
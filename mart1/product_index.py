@@ -0,0 +1,300 @@
+"""
+Product Barcode Index
+In-memory barcode -> product map so a till scan resolves without a query
+
+The index is loaded once at startup and kept coherent through the change
+generations that publish_change bumps:
+
+- Writes that only move stock (checkout, restock, receiving a purchase order)
+  publish the products' change keys through publish_product_changes, which also
+  drops those products from this process's index. Products share one of
+  BARCODE_INDEX_CHANGE_BUCKETS keys, so the cache holds a bounded number of
+  generations; a write revalidates the other products in its bucket too, but
+  every other entry stays current, so a busy till does not turn every scan
+  into a query.
+- Catalog writes (new products, bulk imports) publish CATALOG_CHANGE through
+  publish_catalog_change; category and supplier writes publish their tables.
+  Either revalidates every entry.
+
+An entry checked less than BARCODE_INDEX_TTL_SECONDS ago is served straight
+from memory; after that it is served if none of its generations moved since
+it was read, and never once it is BARCODE_INDEX_MAX_AGE_SECONDS old, which
+bounds how long a write made outside the API (CLI, SQL) goes unseen. Anything
+else is re-read by its unique barcode index before being served. Barcodes that
+are not found are remembered the same way, so unknown codes do not query the
+database on every scan.
+"""
+from sqlalchemy import text
+from db import background_engine
+from cache_layer import publish_change, table_generations
+from typing import Optional
+import os
+import threading
+import time
+
+def _env_number(name: str, default, cast=int):
+    try:
+        return cast(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+BARCODE_INDEX_TTL_SECONDS = _env_number("BARCODE_INDEX_TTL_SECONDS", 2.0, float)
+BARCODE_INDEX_MAX_AGE_SECONDS = _env_number("BARCODE_INDEX_MAX_AGE_SECONDS", 300.0, float)
+BARCODE_INDEX_MAX_MISSING = _env_number("BARCODE_INDEX_MAX_MISSING", 10000)
+# Generation keys stock writes are published under (product_id modulo this);
+# the cache backends never evict generations, so one key per product would grow without bound
+BARCODE_INDEX_CHANGE_BUCKETS = max(1, _env_number("BARCODE_INDEX_CHANGE_BUCKETS", 1024))
+
+# Published with "products" by writes that add products or change more than stock
+CATALOG_CHANGE = "products:catalog"
+
+# Generations every entry depends on; a publish_change on any of them revalidates it
+INDEX_TABLES = (CATALOG_CHANGE, "categories", "suppliers")
+
+_PRODUCT_COLUMNS = """
+    SELECT p.product_id, p.name, p.barcode, p.price, p.stock_quantity,
+           p.low_stock_threshold, p.category_id, c.name as category,
+           p.supplier_id, s.name as supplier, p.cost_price
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.category_id
+    LEFT JOIN suppliers s ON p.supplier_id = s.supplier_id
+"""
+
+ALL_BARCODES_QUERY = text(_PRODUCT_COLUMNS + " WHERE p.barcode IS NOT NULL")
+
+BARCODES_QUERY = text(_PRODUCT_COLUMNS + " WHERE p.barcode = ANY(CAST(:codes AS varchar[]))")
+
+
+def product_row_to_dict(row) -> dict:
+    return {
+        "product_id": row[0],
+        "name": row[1],
+        "barcode": row[2],
+        "price": float(row[3]) if row[3] else 0,
+        "stock_quantity": row[4],
+        "low_stock_threshold": row[5],
+        "category_id": row[6],
+        "category": row[7],
+        "supplier_id": row[8],
+        "supplier": row[9],
+        "cost_price": float(row[10]) if row[10] else 0,
+    }
+
+
+def product_change_key(product_id: int) -> str:
+    """Generation key for a product's stock writes, shared by its bucket"""
+    return f"product:{product_id % BARCODE_INDEX_CHANGE_BUCKETS}"
+
+
+class _IndexEntry:
+    __slots__ = ("product", "generation", "read_at", "checked_at")
+
+    def __init__(self, product, generation: Optional[tuple], read_at: float):
+        self.product = product  # None records a barcode that matched no product
+        # INDEX_TABLES generations plus, for a product, its change key's;
+        # None when they were not read before the row, so the entry is re-read once
+        self.generation = generation
+        self.read_at = read_at
+        self.checked_at = read_at
+
+
+class ProductIndex:
+    """Barcode -> product dict, revalidated per entry against its change generations"""
+
+    def __init__(self, ttl_seconds: float = BARCODE_INDEX_TTL_SECONDS,
+                 max_age_seconds: float = BARCODE_INDEX_MAX_AGE_SECONDS,
+                 max_missing: int = BARCODE_INDEX_MAX_MISSING):
+        self.ttl_seconds = ttl_seconds
+        self.max_age_seconds = max_age_seconds
+        self.max_missing = max_missing
+        self._lock = threading.Lock()
+        self._entries = {}
+        # product_id <-> barcode of every product seen, kept when its entry is
+        # forgotten so the re-read can fetch its generation up front
+        self._barcodes = {}
+        self._product_ids = {}
+        self._missing = 0
+        self.loaded_at = None
+        self.hits = 0
+        self.revalidations = 0
+
+    @staticmethod
+    def read_generations(product_ids) -> Optional[dict]:
+        """Current INDEX_TABLES and product change key generations, or None if they cannot be read"""
+        keys = list(INDEX_TABLES) + sorted({product_change_key(pid) for pid in product_ids})
+        current = table_generations(*keys)
+        if not current:
+            return None
+        return {key: current.get(key, 0) for key in keys}
+
+    @staticmethod
+    def _entry_generation(generations: Optional[dict], product_id: Optional[int]) -> Optional[tuple]:
+        if generations is None:
+            return None
+        tables = tuple(generations[table] for table in INDEX_TABLES)
+        if product_id is None:
+            return tables
+        key = product_change_key(product_id)
+        if key not in generations:
+            return None
+        return tables + (generations[key],)
+
+    def _put(self, code: str, entry: _IndexEntry):
+        previous = self._entries.get(code)
+        if entry.product is None and (previous is None or previous.product is not None):
+            if self._missing >= self.max_missing:
+                self._drop_missing()
+            self._missing += 1
+        elif entry.product is not None and previous is not None and previous.product is None:
+            self._missing -= 1
+        self._entries[code] = entry
+        if entry.product is not None:
+            product_id = entry.product["product_id"]
+            old_code = self._barcodes.get(product_id)
+            if old_code is not None and old_code != code:
+                self._product_ids.pop(old_code, None)
+            self._barcodes[product_id] = code
+            self._product_ids[code] = product_id
+
+    def load(self):
+        """Replace the index with every product that has a barcode"""
+        # Product change key generations are not read up front, so each entry is
+        # revalidated once on its first lookup after the TTL
+        generations = self.read_generations(())
+        with background_engine.connect() as conn:
+            rows = conn.execute(ALL_BARCODES_QUERY).fetchall()
+        now = time.monotonic()
+        entries, barcodes = {}, {}
+        for row in rows:
+            entries[row[2]] = _IndexEntry(product_row_to_dict(row), self._entry_generation(generations, row[0]), now)
+            barcodes[row[0]] = row[2]
+        with self._lock:
+            self._entries = entries
+            self._barcodes = barcodes
+            self._product_ids = {code: product_id for product_id, code in barcodes.items()}
+            self._missing = 0
+            self.loaded_at = time.time()
+        return len(entries)
+
+    def peek(self, codes: list):
+        """
+        Split codes into (found, stale): found maps each code served from memory
+        to its product (None if it is known not to exist); stale lists the codes
+        that must be re-read with fetch() and store() first.
+        """
+        found, stale, check = {}, [], []
+        now = time.monotonic()
+        with self._lock:
+            for code in codes:
+                entry = self._entries.get(code)
+                if entry is not None and now - entry.checked_at < self.ttl_seconds:
+                    found[code] = entry.product
+                elif (entry is not None and entry.generation is not None
+                        and now - entry.read_at < self.max_age_seconds):
+                    check.append((code, entry))
+                else:
+                    stale.append(code)
+
+        if check:
+            # One generations read for every entry past its TTL, outside the lock
+            product_ids = [entry.product["product_id"] for _, entry in check if entry.product is not None]
+            generations = self.read_generations(product_ids)
+            for code, entry in check:
+                product_id = entry.product["product_id"] if entry.product is not None else None
+                # No relevant write published since it was read: still current
+                if entry.generation == self._entry_generation(generations, product_id):
+                    entry.checked_at = now
+                    found[code] = entry.product
+                else:
+                    stale.append(code)
+
+        with self._lock:
+            self.hits += len(found)
+            self.revalidations += len(stale)
+        return found, stale
+
+    def generations_for(self, codes: list) -> Optional[dict]:
+        """Generations to read before fetch(codes) and pass to store()"""
+        with self._lock:
+            product_ids = [self._product_ids[code] for code in codes if code in self._product_ids]
+        return self.read_generations(product_ids)
+
+    @staticmethod
+    def fetch(conn, codes: list) -> list:
+        """Current rows for codes (run with run_db or an engine connection)"""
+        return conn.execute(BARCODES_QUERY, {"codes": list(codes)}).fetchall()
+
+    def store(self, codes: list, rows: list, generations: Optional[dict]) -> dict:
+        """Record fetch() results for codes, read at generations_for(codes); returns {code: product or None}"""
+        now = time.monotonic()
+        products = {row[2]: product_row_to_dict(row) for row in rows}
+        result = {}
+        with self._lock:
+            for code in codes:
+                product = products.get(code)
+                product_id = product["product_id"] if product is not None else None
+                self._put(code, _IndexEntry(product, self._entry_generation(generations, product_id), now))
+                result[code] = product
+        return result
+
+    def forget_products(self, product_ids):
+        """Drop these products' entries so their next lookup re-reads them"""
+        with self._lock:
+            for product_id in product_ids:
+                code = self._barcodes.get(product_id)
+                entry = self._entries.get(code) if code is not None else None
+                if entry is not None and entry.product is not None:
+                    del self._entries[code]
+
+    def _drop_missing(self):
+        self._entries = {code: entry for code, entry in self._entries.items() if entry.product is not None}
+        self._missing = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "products": len(self._entries) - self._missing,
+                "missing_barcodes": self._missing,
+                "ttl_seconds": self.ttl_seconds,
+                "max_age_seconds": self.max_age_seconds,
+                "loaded_at": self.loaded_at,
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+            }
+
+
+# Global instance
+_product_index = None
+
+def get_product_index() -> ProductIndex:
+    global _product_index
+    if _product_index is None:
+        _product_index = ProductIndex()
+    return _product_index
+
+
+def publish_product_changes(product_ids, *tables: str):
+    """
+    Publish a write that changed only these products' stock (after commit).
+
+    tables are published as usual (e.g. "products" for the dashboard caches);
+    the barcode index revalidates just these products.
+    """
+    product_ids = sorted(set(product_ids))
+    publish_change(*tables, *[product_change_key(pid) for pid in product_ids])
+    get_product_index().forget_products(product_ids)
+
+
+def publish_catalog_change(*tables: str):
+    """Publish a write that added products or changed more than their stock (after commit)"""
+    publish_change(*tables, CATALOG_CHANGE)
+
+
+def start_product_index():
+    """Load the barcode index at startup"""
+    try:
+        count = get_product_index().load()
+        print(f"Product barcode index ready ({count} products)")
+    except Exception as e:
+        print(f"Could not load product barcode index: {e}")
@@ -0,0 +1,264 @@
+"""
+Report Summary Views
+Materialized summaries behind the CLI reports and /api/reports/summaries
+
+daily_sales_report, best_selling_products and low_stock_products are
+materialized views refreshed CONCURRENTLY (readers are never blocked) every
+REPORT_VIEW_REFRESH_INTERVAL seconds and on demand. Each refresh is logged in
+report_view_refreshes so readers can show how old the summary is.
+"""
+from sqlalchemy import text
+from db import background_engine, engine
+from rollups import ensure_product_sales_stats
+import os
+import threading
+import time
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+REPORT_VIEW_REFRESH_INTERVAL = _env_int("REPORT_VIEW_REFRESH_INTERVAL", 600)
+
+# name -> (definition, unique index columns, extra indexes, default ORDER BY)
+REPORT_VIEWS = {
+    "daily_sales_report": (
+        """
+        SELECT r.sale_date AS date,
+               r.sale_count AS transactions,
+               r.revenue,
+               r.discount,
+               r.items AS items_sold,
+               ROUND(r.revenue / NULLIF(r.sale_count, 0), 2) AS avg_sale
+        FROM daily_sales_rollup r
+        WHERE r.sale_date < COALESCE(
+            (SELECT rolled_through FROM rollup_watermarks WHERE name = 'daily_sales'), '-infinity'::date)
+        UNION ALL
+        SELECT DATE(s.sale_time),
+               COUNT(*),
+               COALESCE(SUM(s.total_amount), 0),
+               COALESCE(SUM(COALESCE(i.gross, s.total_amount) - s.total_amount), 0),
+               COALESCE(SUM(i.items), 0),
+               ROUND(AVG(s.total_amount), 2)
+        FROM sales s
+        LEFT JOIN LATERAL (
+            SELECT SUM(si.quantity) AS items, SUM(si.subtotal) AS gross
+            FROM sale_items si
+            WHERE si.sale_id = s.sale_id
+        ) i ON TRUE
+        WHERE s.sale_time >= COALESCE(
+            (SELECT rolled_through FROM rollup_watermarks WHERE name = 'daily_sales'), '-infinity'::date)
+        GROUP BY DATE(s.sale_time)
+        """,
+        "date",
+        [],
+        "date DESC",
+    ),
+    "best_selling_products": (
+        """
+        SELECT p.product_id,
+               p.name AS product_name,
+               c.name AS category,
+               st.units_total AS units_sold,
+               st.revenue_total AS revenue,
+               st.last_sale_time
+        FROM product_sales_stats st
+        JOIN products p ON p.product_id = st.product_id
+        LEFT JOIN categories c ON c.category_id = p.category_id
+        WHERE st.units_total > 0
+        """,
+        "product_id",
+        ["units_sold DESC"],
+        "units_sold DESC, product_id",
+    ),
+    "low_stock_products": (
+        """
+        SELECT p.product_id,
+               p.name AS product_name,
+               c.name AS category,
+               s.name AS supplier,
+               p.stock_quantity,
+               p.low_stock_threshold,
+               COALESCE(st.units_7d, 0) AS units_sold_7d
+        FROM products p
+        LEFT JOIN categories c ON c.category_id = p.category_id
+        LEFT JOIN suppliers s ON s.supplier_id = p.supplier_id
+        LEFT JOIN product_sales_stats st ON st.product_id = p.product_id
+        WHERE p.stock_quantity <= p.low_stock_threshold
+        """,
+        "product_id",
+        ["stock_quantity"],
+        "stock_quantity ASC, product_id",
+    ),
+}
+
+
+def create_report_views():
+    """Creates the report materialized views (replacing plain views of the same name) and their indexes"""
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS report_view_refreshes (
+                view_name VARCHAR(50) PRIMARY KEY,
+                refreshed_at TIMESTAMP NOT NULL,
+                duration_ms INT
+            )
+        """))
+        for name, (definition, unique_column, indexes, _) in REPORT_VIEWS.items():
+            relkind = conn.execute(
+                text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+            ).scalar()
+            if relkind == "v":
+                conn.execute(text(f"DROP VIEW {name}"))
+            if relkind != "m":
+                started = time.perf_counter()
+                conn.execute(text(f"CREATE MATERIALIZED VIEW {name} AS {definition}"))
+                _log_refresh(conn, name, started)
+            # A unique index is what allows REFRESH ... CONCURRENTLY
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{name}_key ON {name}({unique_column})"))
+            for position, columns in enumerate(indexes, start=1):
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_{name}_{position} ON {name}({columns})"))
+
+
+def _log_refresh(conn, name: str, started: float):
+    conn.execute(text("""
+        INSERT INTO report_view_refreshes (view_name, refreshed_at, duration_ms)
+        VALUES (:name, NOW(), :ms)
+        ON CONFLICT (view_name) DO UPDATE SET
+            refreshed_at = EXCLUDED.refreshed_at, duration_ms = EXCLUDED.duration_ms
+    """), {"name": name, "ms": int((time.perf_counter() - started) * 1000)})
+
+
+def refresh_report_views(names: list = None) -> dict:
+    """
+    REFRESH MATERIALIZED VIEW CONCURRENTLY for the given views (default all).
+
+    A view another process is already refreshing is skipped. Returns
+    {name: 'refreshed' | 'skipped'}.
+    """
+    results = {}
+    for name in names or list(REPORT_VIEWS):
+        if name not in REPORT_VIEWS:
+            raise ValueError(f"Unknown report view: {name}")
+        with background_engine.begin() as conn:
+            locked = conn.execute(
+                text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"), {"key": f"report_view:{name}"}
+            ).scalar()
+            if not locked:
+                results[name] = "skipped"
+                continue
+            started = time.perf_counter()
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+            _log_refresh(conn, name, started)
+            results[name] = "refreshed"
+    return results
+
+
+def get_report_view_status(conn, name: str = None) -> dict:
+    """{name: {'refreshed_at', 'age_seconds', 'duration_ms'}} for one or all views"""
+    rows = conn.execute(text("""
+        SELECT view_name, refreshed_at, EXTRACT(EPOCH FROM NOW() - refreshed_at), duration_ms
+        FROM report_view_refreshes
+        WHERE CAST(:name AS VARCHAR) IS NULL OR view_name = :name
+    """), {"name": name}).fetchall()
+    return {
+        r[0]: {
+            "refreshed_at": r[1],
+            "age_seconds": int(r[2]) if r[2] is not None else None,
+            "duration_ms": r[3],
+        }
+        for r in rows
+    }
+
+
+def ensure_report_views(max_age_seconds: int = REPORT_VIEW_REFRESH_INTERVAL) -> dict:
+    """
+    Create the report views if needed and refresh any older than max_age_seconds.
+
+    For processes that don't run the refresher (the CLI). Returns
+    get_report_view_status for all views.
+    """
+    ensure_product_sales_stats()
+    create_report_views()
+    with engine.connect() as conn:
+        status = get_report_view_status(conn)
+    stale = [
+        name for name in REPORT_VIEWS
+        if name not in status or status[name]["age_seconds"] > max_age_seconds
+    ]
+    if stale:
+        refresh_report_views(stale)
+        with engine.connect() as conn:
+            status = get_report_view_status(conn)
+    return status
+
+
+def read_report_view(conn, name: str, limit: int = 100, offset: int = 0) -> list:
+    """Rows of one summary view in its default order"""
+    if name not in REPORT_VIEWS:
+        raise ValueError(f"Unknown report view: {name}")
+    order_by = REPORT_VIEWS[name][3]
+    result = conn.execute(
+        text(f"SELECT * FROM {name} ORDER BY {order_by} LIMIT :limit OFFSET :offset"),
+        {"limit": limit, "offset": offset},
+    )
+    return [dict(row._mapping) for row in result]
+
+
+class ReportViewRefresher:
+    """Daemon thread that refreshes the report views every REPORT_VIEW_REFRESH_INTERVAL seconds"""
+
+    def __init__(self, interval: int = REPORT_VIEW_REFRESH_INTERVAL):
+        self.interval = max(1, interval)
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_result = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="report-view-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # create_report_views populated the views, so the first refresh waits an interval
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = refresh_report_views()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Report view refresh failed: {e}")
+
+
+# Global instance
+_report_view_refresher = None
+
+def get_report_view_refresher() -> ReportViewRefresher:
+    global _report_view_refresher
+    if _report_view_refresher is None:
+        _report_view_refresher = ReportViewRefresher()
+    return _report_view_refresher
+
+
+def start_report_view_refresher():
+    """Create the report views and start the scheduled refresh"""
+    try:
+        create_report_views()
+        print("Report views ready")
+        get_report_view_refresher().start()
+    except Exception as e:
+        print(f"Could not start report view refresher: {e}")
+
+
+def stop_report_view_refresher():
+    if _report_view_refresher is not None:
+        _report_view_refresher.stop()
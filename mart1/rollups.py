@@ -0,0 +1,499 @@
+"""
+Sales Rollups
+Pre-aggregated daily sales so dashboards and reports read O(days) rows instead of O(sales)
+
+daily_sales_rollup holds one row per closed day. A background job closes days
+once they are ROLLUP_SAFETY_LAG_MINUTES past midnight (so transactions that
+started before midnight have committed) and re-aggregates the last
+ROLLUP_RECOMPUTE_DAYS closed days on every run to pick up stragglers. Reads
+combine the rollup with a live aggregate of the open days, so they are always
+exact. Sales uploaded with a sale_time inside an already closed day are added
+to the rollups by apply_backdated_sales in the same transaction.
+
+product_daily_sales is the same rollup per product and day. It feeds
+product_sales_stats, one row per product with last sale time, all-time totals
+and 7/30/90-day units and revenue for the restocking and dead-stock reports:
+the closed_* totals are adjusted incrementally as days are (re)aggregated, and
+every refresh recomputes the windows from the last 90 days of the rollup plus
+the open days.
+"""
+from sqlalchemy import text
+from db import background_engine, engine
+from datetime import timedelta
+import os
+import threading
+
+DAILY_SALES = "daily_sales"
+PRODUCT_DAILY_SALES = "product_daily_sales"
+PRODUCT_SALES_STATS = "product_sales_stats"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+ROLLUP_REFRESH_INTERVAL = _env_int("ROLLUP_REFRESH_INTERVAL", 300)
+ROLLUP_SAFETY_LAG_MINUTES = _env_int("ROLLUP_SAFETY_LAG_MINUTES", 15)
+ROLLUP_RECOMPUTE_DAYS = _env_int("ROLLUP_RECOMPUTE_DAYS", 1)
+
+
+def create_rollup_tables():
+    """Creates the rollup tables if they don't exist"""
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS rollup_watermarks (
+                name VARCHAR(50) PRIMARY KEY,
+                rolled_through DATE,
+                refreshed_at TIMESTAMP
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS daily_sales_rollup (
+                sale_date DATE PRIMARY KEY,
+                sale_count INT NOT NULL DEFAULT 0,
+                revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+                discount DECIMAL(14,2) NOT NULL DEFAULT 0,
+                items BIGINT NOT NULL DEFAULT 0
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS product_daily_sales (
+                product_id INT NOT NULL,
+                sale_date DATE NOT NULL,
+                quantity BIGINT NOT NULL DEFAULT 0,
+                revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+                last_sale_time TIMESTAMP,
+                PRIMARY KEY (product_id, sale_date)
+            )
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_product_daily_sales_date ON product_daily_sales(sale_date)"
+        ))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS product_sales_stats (
+                product_id INT PRIMARY KEY,
+                closed_units BIGINT NOT NULL DEFAULT 0,
+                closed_revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+                closed_last_sale_time TIMESTAMP,
+                last_sale_time TIMESTAMP,
+                units_total BIGINT NOT NULL DEFAULT 0,
+                revenue_total DECIMAL(14,2) NOT NULL DEFAULT 0,
+                units_7d BIGINT NOT NULL DEFAULT 0,
+                units_30d BIGINT NOT NULL DEFAULT 0,
+                units_90d BIGINT NOT NULL DEFAULT 0,
+                revenue_7d DECIMAL(14,2) NOT NULL DEFAULT 0,
+                revenue_30d DECIMAL(14,2) NOT NULL DEFAULT 0,
+                revenue_90d DECIMAL(14,2) NOT NULL DEFAULT 0,
+                refreshed_at TIMESTAMP
+            )
+        """))
+
+
+# Per-sale item count and pre-discount value, joined laterally so a date range
+# on sales only touches the matching sale_items rows
+_SALE_ITEMS_LATERAL = """
+    LEFT JOIN LATERAL (
+        SELECT SUM(si.quantity) AS items, SUM(si.subtotal) AS gross
+        FROM sale_items si
+        WHERE si.sale_id = s.sale_id
+    ) i ON TRUE
+"""
+
+_DAILY_SALES_AGGREGATE = """
+    SELECT DATE(s.sale_time) AS sale_date,
+           COUNT(*) AS sale_count,
+           COALESCE(SUM(s.total_amount), 0) AS revenue,
+           COALESCE(SUM(COALESCE(i.gross, s.total_amount) - s.total_amount), 0) AS discount,
+           COALESCE(SUM(i.items), 0) AS items
+    FROM sales s
+""" + _SALE_ITEMS_LATERAL
+
+# Closed days come from the rollup, the rest from sales; :days = 0 means all history
+_DAILY_SALES_SQL = """
+    WITH bounds AS (
+        SELECT COALESCE(
+                   (SELECT rolled_through FROM rollup_watermarks WHERE name = 'daily_sales'),
+                   '-infinity'::date
+               ) AS rolled_through,
+               CASE WHEN CAST(:days AS int) = 0 THEN '-infinity'::date
+                    ELSE CURRENT_DATE - CAST(:days AS int) END AS since
+    )
+    SELECT r.sale_date, r.sale_count, r.revenue, r.discount, r.items
+    FROM daily_sales_rollup r, bounds b
+    WHERE r.sale_date < b.rolled_through AND r.sale_date >= b.since
+    UNION ALL
+    SELECT * FROM (
+        """ + _DAILY_SALES_AGGREGATE + """
+        CROSS JOIN bounds b
+        WHERE s.sale_time >= b.rolled_through AND s.sale_time >= b.since
+        GROUP BY DATE(s.sale_time)
+    ) live
+"""
+
+DAILY_SALES_QUERY = text(_DAILY_SALES_SQL + " ORDER BY sale_date")
+
+# Closed days are summed from the rollup; the open tail is a single range scan
+# of idx_sales_sale_time with FILTER aggregates (no per-day grouping or items join)
+SALES_SUMMARY_QUERY = text("""
+    WITH bounds AS (
+        SELECT COALESCE(
+                   (SELECT rolled_through FROM rollup_watermarks WHERE name = 'daily_sales'),
+                   '-infinity'::date
+               ) AS rolled_through,
+               CASE WHEN CAST(:days AS int) = 0 THEN '-infinity'::date
+                    ELSE CURRENT_DATE - CAST(:days AS int) END AS since
+    ), closed AS (
+        SELECT COALESCE(SUM(r.sale_count), 0) AS sale_count, COALESCE(SUM(r.revenue), 0) AS revenue
+        FROM daily_sales_rollup r, bounds b
+        WHERE r.sale_date < b.rolled_through AND r.sale_date >= b.since
+    ), live AS (
+        SELECT COUNT(*) AS sale_count,
+               COALESCE(SUM(s.total_amount), 0) AS revenue,
+               COALESCE(SUM(s.total_amount) FILTER (WHERE s.sale_time >= CURRENT_DATE), 0) AS today_revenue
+        FROM sales s
+        WHERE s.sale_time >= (SELECT GREATEST(rolled_through, since) FROM bounds)
+    )
+    SELECT closed.sale_count + live.sale_count, closed.revenue + live.revenue, live.today_revenue
+    FROM closed, live
+""")
+
+MONTHLY_REVENUE_QUERY = text("""
+    SELECT TO_CHAR(d.sale_date, 'YYYY-MM') AS month, SUM(d.revenue) AS revenue
+    FROM (""" + _DAILY_SALES_SQL + """) d
+    GROUP BY 1
+    ORDER BY month DESC
+    LIMIT :months
+""")
+
+CLAIM_WATERMARK_QUERY = text("""
+    SELECT rolled_through, DATE(LOCALTIMESTAMP - make_interval(mins => :lag)) AS close_until
+    FROM rollup_watermarks
+    WHERE name = :name
+    FOR UPDATE
+""")
+
+DELETE_DAILY_SALES_QUERY = text("""
+    DELETE FROM daily_sales_rollup
+    WHERE sale_date >= COALESCE(CAST(:start AS date), '-infinity'::date) AND sale_date < :until
+""")
+
+INSERT_DAILY_SALES_QUERY = text("""
+    INSERT INTO daily_sales_rollup (sale_date, sale_count, revenue, discount, items)
+""" + _DAILY_SALES_AGGREGATE + """
+    WHERE s.sale_time >= COALESCE(CAST(:start AS date), '-infinity'::date) AND s.sale_time < :until
+    GROUP BY DATE(s.sale_time)
+""")
+
+# FOR SHARE on the watermark serializes this with a running refresh, so the
+# delta lands either after the refresh rewrote the day or is seen by it
+BACKDATED_SALES_QUERY = text("""
+    WITH mark AS (
+        SELECT rolled_through FROM rollup_watermarks WHERE name = 'daily_sales' FOR SHARE
+    )
+    INSERT INTO daily_sales_rollup AS r (sale_date, sale_count, revenue, discount, items)
+""" + _DAILY_SALES_AGGREGATE + """
+    JOIN mark ON DATE(s.sale_time) < mark.rolled_through
+    WHERE s.sale_id = ANY(CAST(:sale_ids AS int[]))
+    GROUP BY DATE(s.sale_time)
+    ON CONFLICT (sale_date) DO UPDATE SET
+        sale_count = r.sale_count + EXCLUDED.sale_count,
+        revenue = r.revenue + EXCLUDED.revenue,
+        discount = r.discount + EXCLUDED.discount,
+        items = r.items + EXCLUDED.items
+""")
+
+
+# Per product and day: units, pre-discount revenue and the latest sale time
+_PRODUCT_DAILY_AGGREGATE = """
+    SELECT si.product_id, DATE(s.sale_time) AS sale_date, SUM(si.quantity) AS quantity,
+           SUM(si.subtotal) AS revenue, MAX(s.sale_time) AS last_sale_time
+    FROM sales s
+    JOIN sale_items si ON si.sale_id = s.sale_id
+"""
+
+# Adds the aggregated delta both to the per-day rows and to the closed_* totals
+_APPLY_PRODUCT_DELTA = """
+    , added AS (
+        INSERT INTO product_daily_sales AS d (product_id, sale_date, quantity, revenue, last_sale_time)
+        SELECT product_id, sale_date, quantity, revenue, last_sale_time FROM delta
+        ON CONFLICT (product_id, sale_date) DO UPDATE SET
+            quantity = d.quantity + EXCLUDED.quantity,
+            revenue = d.revenue + EXCLUDED.revenue,
+            last_sale_time = GREATEST(d.last_sale_time, EXCLUDED.last_sale_time)
+    )
+    INSERT INTO product_sales_stats AS st (product_id, closed_units, closed_revenue, closed_last_sale_time)
+    SELECT product_id, SUM(quantity), SUM(revenue), MAX(last_sale_time)
+    FROM delta
+    GROUP BY product_id
+    ORDER BY product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        closed_units = st.closed_units + EXCLUDED.closed_units,
+        closed_revenue = st.closed_revenue + EXCLUDED.closed_revenue,
+        closed_last_sale_time = GREATEST(st.closed_last_sale_time, EXCLUDED.closed_last_sale_time)
+"""
+
+DELETE_PRODUCT_DAILY_SALES_QUERY = text("""
+    WITH removed AS (
+        DELETE FROM product_daily_sales
+        WHERE sale_date >= COALESCE(CAST(:start AS date), '-infinity'::date) AND sale_date < :until
+        RETURNING product_id, quantity, revenue
+    ), totals AS (
+        SELECT product_id, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+        FROM removed
+        GROUP BY product_id
+    )
+    UPDATE product_sales_stats st
+    SET closed_units = st.closed_units - t.quantity,
+        closed_revenue = st.closed_revenue - t.revenue
+    FROM totals t
+    WHERE st.product_id = t.product_id
+""")
+
+INSERT_PRODUCT_DAILY_SALES_QUERY = text("""
+    WITH delta AS (
+""" + _PRODUCT_DAILY_AGGREGATE + """
+        WHERE s.sale_time >= COALESCE(CAST(:start AS date), '-infinity'::date) AND s.sale_time < :until
+        GROUP BY si.product_id, DATE(s.sale_time)
+    )
+""" + _APPLY_PRODUCT_DELTA)
+
+BACKDATED_PRODUCT_SALES_QUERY = text("""
+    WITH mark AS (
+        SELECT rolled_through FROM rollup_watermarks WHERE name = 'product_daily_sales' FOR SHARE
+    ), delta AS (
+""" + _PRODUCT_DAILY_AGGREGATE + """
+        JOIN mark ON DATE(s.sale_time) < mark.rolled_through
+        WHERE s.sale_id = ANY(CAST(:sale_ids AS int[]))
+        GROUP BY si.product_id, DATE(s.sale_time)
+    )
+""" + _APPLY_PRODUCT_DELTA)
+
+# Recomputes the 7/30/90-day windows and folds the open days into the totals
+# for every product; the closed_* columns are left as maintained
+REFRESH_PRODUCT_SALES_STATS_QUERY = text("""
+    WITH bounds AS (
+        SELECT COALESCE(
+                   (SELECT rolled_through FROM rollup_watermarks WHERE name = 'product_daily_sales'),
+                   '-infinity'::date
+               ) AS rolled_through
+    ), tail AS (
+        SELECT si.product_id, DATE(s.sale_time) AS sale_date, si.quantity, si.subtotal AS revenue,
+               s.sale_time
+        FROM sales s
+        JOIN sale_items si ON si.sale_id = s.sale_id
+        CROSS JOIN bounds b
+        WHERE s.sale_time >= b.rolled_through
+    ), recent AS (
+        SELECT d.product_id, d.sale_date, d.quantity, d.revenue
+        FROM product_daily_sales d, bounds b
+        WHERE d.sale_date >= CURRENT_DATE - 90 AND d.sale_date < b.rolled_through
+        UNION ALL
+        SELECT product_id, sale_date, quantity, revenue FROM tail
+        WHERE sale_date >= CURRENT_DATE - 90
+    ), windows AS (
+        SELECT product_id,
+               SUM(quantity) FILTER (WHERE sale_date >= CURRENT_DATE - 7) AS units_7d,
+               SUM(quantity) FILTER (WHERE sale_date >= CURRENT_DATE - 30) AS units_30d,
+               SUM(quantity) AS units_90d,
+               SUM(revenue) FILTER (WHERE sale_date >= CURRENT_DATE - 7) AS revenue_7d,
+               SUM(revenue) FILTER (WHERE sale_date >= CURRENT_DATE - 30) AS revenue_30d,
+               SUM(revenue) AS revenue_90d
+        FROM recent
+        GROUP BY product_id
+    ), open_totals AS (
+        SELECT product_id, SUM(quantity) AS units, SUM(revenue) AS revenue, MAX(sale_time) AS last_sale_time
+        FROM tail
+        GROUP BY product_id
+    )
+    INSERT INTO product_sales_stats AS st (
+        product_id, last_sale_time, units_total, revenue_total,
+        units_7d, units_30d, units_90d, revenue_7d, revenue_30d, revenue_90d, refreshed_at
+    )
+    SELECT p.product_id,
+           GREATEST(cur.closed_last_sale_time, o.last_sale_time),
+           COALESCE(cur.closed_units, 0) + COALESCE(o.units, 0),
+           COALESCE(cur.closed_revenue, 0) + COALESCE(o.revenue, 0),
+           COALESCE(w.units_7d, 0), COALESCE(w.units_30d, 0), COALESCE(w.units_90d, 0),
+           COALESCE(w.revenue_7d, 0), COALESCE(w.revenue_30d, 0), COALESCE(w.revenue_90d, 0),
+           NOW()
+    FROM products p
+    LEFT JOIN product_sales_stats cur ON cur.product_id = p.product_id
+    LEFT JOIN windows w ON w.product_id = p.product_id
+    LEFT JOIN open_totals o ON o.product_id = p.product_id
+    ORDER BY p.product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        last_sale_time = EXCLUDED.last_sale_time,
+        units_total = EXCLUDED.units_total,
+        revenue_total = EXCLUDED.revenue_total,
+        units_7d = EXCLUDED.units_7d,
+        units_30d = EXCLUDED.units_30d,
+        units_90d = EXCLUDED.units_90d,
+        revenue_7d = EXCLUDED.revenue_7d,
+        revenue_30d = EXCLUDED.revenue_30d,
+        revenue_90d = EXCLUDED.revenue_90d,
+        refreshed_at = EXCLUDED.refreshed_at
+""")
+
+
+def get_daily_sales(conn, days: int = 0) -> list:
+    """Rows of (sale_date, sale_count, revenue, discount, items) for the last N days (0 for all time)"""
+    return conn.execute(DAILY_SALES_QUERY, {"days": days}).fetchall()
+
+
+def get_sales_summary(conn, days: int = 0) -> dict:
+    """Sale count and revenue for the last N days (0 for all time), plus today's revenue"""
+    row = conn.execute(SALES_SUMMARY_QUERY, {"days": days}).fetchone()
+    return {
+        "sale_count": int(row[0]),
+        "revenue": float(row[1]),
+        "today_revenue": float(row[2]),
+    }
+
+
+def get_monthly_revenue(conn, months: int = 12) -> list:
+    """Rows of (month 'YYYY-MM', revenue), most recent month first"""
+    return conn.execute(MONTHLY_REVENUE_QUERY, {"days": 0, "months": months}).fetchall()
+
+
+def apply_backdated_sales(conn, sale_ids: list):
+    """Add just-inserted sales dated inside already closed days to the rollup (same transaction)"""
+    if sale_ids:
+        conn.execute(BACKDATED_SALES_QUERY, {"sale_ids": list(sale_ids)})
+        conn.execute(BACKDATED_PRODUCT_SALES_QUERY, {"sale_ids": list(sale_ids)})
+
+
+def _refresh_rollup(conn, name: str, delete_query, insert_query) -> int:
+    """
+    Close the days that are now past the safety lag for one rollup.
+
+    Re-aggregates from ROLLUP_RECOMPUTE_DAYS before the current watermark (or
+    from the beginning on the first run) up to the newest closed day, then
+    advances the watermark. Returns the number of days re-aggregated.
+    """
+    conn.execute(
+        text("INSERT INTO rollup_watermarks (name) VALUES (:name) ON CONFLICT (name) DO NOTHING"),
+        {"name": name},
+    )
+    rolled_through, close_until = conn.execute(
+        CLAIM_WATERMARK_QUERY, {"name": name, "lag": ROLLUP_SAFETY_LAG_MINUTES}
+    ).fetchone()
+
+    start = None
+    if rolled_through is not None:
+        close_until = max(close_until, rolled_through)
+        start = rolled_through - timedelta(days=max(0, ROLLUP_RECOMPUTE_DAYS))
+        if start >= close_until:
+            return 0
+
+    params = {"start": start, "until": close_until}
+    conn.execute(delete_query, params)
+    conn.execute(insert_query, params)
+    conn.execute(
+        text("UPDATE rollup_watermarks SET rolled_through = :until, refreshed_at = NOW() WHERE name = :name"),
+        {"until": close_until, "name": name},
+    )
+    return (close_until - start).days if start is not None else -1
+
+
+def refresh_rollups() -> dict:
+    """Bring every rollup up to date; returns days re-aggregated per rollup (-1 for a full build)"""
+    refreshed = {}
+    with background_engine.begin() as conn:
+        refreshed[DAILY_SALES] = _refresh_rollup(
+            conn, DAILY_SALES, DELETE_DAILY_SALES_QUERY, INSERT_DAILY_SALES_QUERY
+        )
+    with background_engine.begin() as conn:
+        refreshed[PRODUCT_DAILY_SALES] = _refresh_rollup(
+            conn, PRODUCT_DAILY_SALES, DELETE_PRODUCT_DAILY_SALES_QUERY, INSERT_PRODUCT_DAILY_SALES_QUERY
+        )
+        # Still under the product_daily_sales watermark lock taken above
+        conn.execute(REFRESH_PRODUCT_SALES_STATS_QUERY)
+        conn.execute(
+            text("""
+                INSERT INTO rollup_watermarks (name, refreshed_at) VALUES (:name, NOW())
+                ON CONFLICT (name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+            """),
+            {"name": PRODUCT_SALES_STATS},
+        )
+    return refreshed
+
+
+def ensure_product_sales_stats(max_age_seconds: int = ROLLUP_REFRESH_INTERVAL):
+    """
+    Refresh the rollups if product_sales_stats is older than max_age_seconds.
+
+    For processes that don't run the background job (the CLI). Returns the
+    time the stats were last refreshed.
+    """
+    create_rollup_tables()
+    with engine.connect() as conn:
+        age = conn.execute(text("""
+            SELECT EXTRACT(EPOCH FROM NOW() - refreshed_at)
+            FROM rollup_watermarks WHERE name = :name
+        """), {"name": PRODUCT_SALES_STATS}).scalar()
+    if age is None or age > max_age_seconds:
+        refresh_rollups()
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT refreshed_at FROM rollup_watermarks WHERE name = :name"),
+            {"name": PRODUCT_SALES_STATS},
+        ).scalar()
+
+
+class RollupJob:
+    """Daemon thread that calls refresh_rollups every ROLLUP_REFRESH_INTERVAL seconds"""
+
+    def __init__(self, interval: int = ROLLUP_REFRESH_INTERVAL):
+        self.interval = max(1, interval)
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_result = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="rollup-job", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.last_result = refresh_rollups()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Rollup refresh failed: {e}")
+            self._stop.wait(self.interval)
+
+
+# Global instance
+_rollup_job = None
+
+def get_rollup_job() -> RollupJob:
+    global _rollup_job
+    if _rollup_job is None:
+        _rollup_job = RollupJob()
+    return _rollup_job
+
+
+def start_rollup_job():
+    """Create the rollup tables and start the background refresh"""
+    try:
+        create_rollup_tables()
+        print("Rollup tables ready")
+        get_rollup_job().start()
+    except Exception as e:
+        print(f"Could not start rollup job: {e}")
+
+
+def stop_rollup_job():
+    if _rollup_job is not None:
+        _rollup_job.stop()
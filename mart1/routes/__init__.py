@@ -14,6 +14,7 @@ from .notifications_routes import router as notifications_router
 from .reports_routes import router as reports_router
 from .exports_routes import router as exports_router
 from .audit_logs_routes import router as audit_logs_router
+from .metrics_routes import router as metrics_router
 
 __all__ = [
     "auth_router",
@@ -29,4 +30,5 @@ __all__ = [
     "reports_router",
     "exports_router",
     "audit_logs_router",
+    "metrics_router",
 ]
\ No newline at end of file
@@ -1,14 +1,89 @@
 """Helpers for running sync route logic without blocking the event loop."""
 
 import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 
+from db import DB_MAX_OVERFLOW, DB_POOL_SIZE, async_engine, engine
+
+# Sized to the connection pool so surplus requests wait in the executor queue
+# instead of holding a thread blocked in the pool's checkout timeout
+try:
+    ROUTE_WORKER_THREADS = int(os.getenv("ROUTE_WORKER_THREADS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+except ValueError:
+    ROUTE_WORKER_THREADS = DB_POOL_SIZE + DB_MAX_OVERFLOW
+ROUTE_WORKER_THREADS = max(1, ROUTE_WORKER_THREADS)
+
+_executor = ThreadPoolExecutor(max_workers=ROUTE_WORKER_THREADS, thread_name_prefix="route")
+_counter_lock = threading.Lock()
+_submitted = 0
+_running = 0
+
+
+def _run_counted(func, *args, **kwargs):
+    global _running
+    with _counter_lock:
+        _running += 1
+    try:
+        return func(*args, **kwargs)
+    finally:
+        with _counter_lock:
+            _running -= 1
+
+
+def get_executor_stats() -> dict:
+    """Worker threads busy and handlers waiting for one"""
+    with _counter_lock:
+        return {
+            "max_workers": ROUTE_WORKER_THREADS,
+            "running": _running,
+            "queued": max(0, _submitted - _running),
+        }
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run func on the route executor, carrying the caller's context like asyncio.to_thread"""
+    global _submitted
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, _run_counted, func, *args, **kwargs)
+    with _counter_lock:
+        _submitted += 1
+    try:
+        return await loop.run_in_executor(_executor, call)
+    finally:
+        with _counter_lock:
+            _submitted -= 1
+
 
 def async_route(func):
-    """Run a synchronous route handler in a worker thread."""
+    """Run a synchronous route handler on the bounded route worker pool."""
 
     @wraps(func)
     async def wrapper(*args, **kwargs):
-        return await asyncio.to_thread(func, *args, **kwargs)
+        return await run_blocking(func, *args, **kwargs)
+
+    return wrapper
+
+
+def _run_on_sync_engine(fn, args):
+    with engine.connect() as conn:
+        return fn(conn, *args)
+
+
+async def run_db(fn, *args):
+    """
+    Await fn(conn, *args), where fn is ordinary sync SQLAlchemy query code.
 
-    return wrapper
\ No newline at end of file
+    With the asyncpg engine fn runs on the event loop through
+    AsyncConnection.run_sync, so a request waiting on the database holds no
+    thread. Without it, fn runs on the route executor against the sync engine.
+    fn must only wait on the database: no locks, sleeps or sync cache lookups.
+    """
+    if async_engine is not None:
+        async with async_engine.connect() as conn:
+            return await conn.run_sync(fn, *args)
+    return await run_blocking(_run_on_sync_engine, fn, args)
@@ -3,38 +3,21 @@
 from typing import Any, Optional
 
 from fastapi import Request
-from jose import JWTError, jwt
-from sqlalchemy import text
+from jose import JWTError
 
 from audit_system import log_activity
-from db import engine
-
-import os
-
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-12345678")
-ALGORITHM = "HS256"
+from routes.identity import decode_token, get_employee_identity
 
 
 def _lookup_employee(employee_id: int) -> Optional[dict]:
-    with engine.connect() as conn:
-        row = conn.execute(
-            text(
-                """
-                SELECT employee_id, username, role
-                FROM employees
-                WHERE employee_id = :employee_id
-                """
-            ),
-            {"employee_id": employee_id},
-        ).fetchone()
-
-    if not row:
+    employee = get_employee_identity(employee_id)
+    if not employee:
         return None
 
     return {
-        "user_id": row[0],
-        "username": row[1],
-        "role": row[2],
+        "user_id": employee["employee_id"],
+        "username": employee["username"],
+        "role": employee["role"],
     }
 
 
@@ -55,7 +38,7 @@ def resolve_actor(
         scheme, _, token = authorization.partition(" ")
         if scheme.lower() == "bearer" and token:
             try:
-                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+                payload = decode_token(token)
                 actor["user_id"] = int(payload["sub"]) if payload.get("sub") else actor["user_id"]
                 actor["role"] = payload.get("role") or actor["role"]
             except (JWTError, TypeError, ValueError):
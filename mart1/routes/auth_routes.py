@@ -1,22 +1,20 @@
 """
 Authentication routes for login and token verification
 """
+import asyncio
 from fastapi import APIRouter, HTTPException, Header, Request
 from sqlalchemy import text
 from datetime import datetime as dt, timedelta
 from typing import Optional
-import bcrypt
 from jose import JWTError, jwt
-import os
 
-from db import engine
 from models import LoginRequest, LoginResponse, TokenData
-from routes.async_utils import async_route
+from password_hashing import LOGIN_RATE_WINDOW_SECONDS, PasswordPoolBusy, get_login_rate_limiter, get_password_hasher
+from routes.async_utils import async_route, run_blocking, run_db
 from routes.audit_helper import write_audit
+from routes.identity import ALGORITHM, SECRET_KEY, decode_token, get_employee_identity
 
 # JWT Configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-12345678")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
@@ -41,89 +39,83 @@ def auth_health():
     return {"status": "ok", "message": "Auth routes loaded successfully"}
 
 
+LOGIN_LOOKUP_QUERY = text("""
+    SELECT employee_id, name, role, password
+    FROM employees
+    WHERE LOWER(username) = LOWER(:uname)
+""")
+
+
 @router.post("/login", response_model=LoginResponse)
-@async_route
-def login(credentials: LoginRequest, request: Request):
+async def login(credentials: LoginRequest, request: Request):
     """
     Authenticate user with username and password.
     Returns JWT access token and user information.
+
+    Attempts over the per-username rate limit get 429 before any query, and
+    bcrypt runs in the password hashing pool (503 when it is saturated), so a
+    login burst holds neither route threads nor request CPU.
     """
     try:
-        print(f"Login attempt for username: {credentials.username}")
-        with engine.connect() as conn:
-            # First check if user exists
-            res = conn.execute(text("""
-                SELECT COUNT(*) FROM employees
-            """))
-            total = res.fetchone()[0]
-            print(f"Total employees in database: {total}")
-            
-            # Try to find the user
-            res = conn.execute(text("""
-                SELECT employee_id, name, role, password
-                FROM employees
-                WHERE LOWER(username) = LOWER(:uname)
-            """), {"uname": credentials.username})
-            row = res.fetchone()
+        if not get_login_rate_limiter().allow(credentials.username):
+            raise HTTPException(
+                status_code=429,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(LOGIN_RATE_WINDOW_SECONDS)},
+            )
+
+        row = await run_db(
+            lambda conn: conn.execute(LOGIN_LOOKUP_QUERY, {"uname": credentials.username}).fetchone()
+        )
             
-            if not row:
-                write_audit(
-                    action="LOGIN",
-                    username=credentials.username,
-                    status="FAILED",
-                    error_message="Invalid username",
-                    request=request,
-                )
-                print(f"Login attempt failed for username: {credentials.username}")
-                res = conn.execute(text("""
-                    SELECT username FROM employees
-                """))
-                existing = [r[0] for r in res]
-                print(f"Existing usernames: {existing}")
-                raise HTTPException(status_code=401, detail="Invalid username")
+        if not row:
+            await run_blocking(
+                write_audit,
+                action="LOGIN",
+                username=credentials.username,
+                status="FAILED",
+                error_message="Invalid username",
+                request=request,
+            )
+            print(f"Login attempt failed for username: {credentials.username}")
+            raise HTTPException(status_code=401, detail="Invalid username")
         
         emp_id, name, role, stored_password = row
         
-        # Verify password using bcrypt
+        # Verify password using bcrypt (plain-text stored passwords are compared directly)
         try:
-            if not bcrypt.checkpw(credentials.password.encode('utf-8'), stored_password.encode('utf-8')):
-                write_audit(
-                    action="LOGIN",
-                    table_name="employees",
-                    record_id=emp_id,
-                    username=credentials.username,
-                    role=role,
-                    status="FAILED",
-                    error_message="Invalid password",
-                    actor={"user_id": emp_id, "username": credentials.username, "role": role},
-                    request=request,
-                )
-                print(f"Password verification failed for {credentials.username}")
-                raise HTTPException(status_code=401, detail="Invalid password")
-        except Exception as e:
-            # If bcrypt fails (e.g., plain text password in DB), try plain text comparison as fallback
-            print(f"Bcrypt verification failed, trying plain text: {e}")
-            if credentials.password != stored_password:
-                write_audit(
-                    action="LOGIN",
-                    table_name="employees",
-                    record_id=emp_id,
-                    username=credentials.username,
-                    role=role,
-                    status="FAILED",
-                    error_message="Invalid password",
-                    actor={"user_id": emp_id, "username": credentials.username, "role": role},
-                    request=request,
-                )
-                print(f"Plain text password verification also failed for {credentials.username}")
-                raise HTTPException(status_code=401, detail="Invalid password")
+            future = get_password_hasher().check_password(credentials.password, stored_password)
+        except PasswordPoolBusy:
+            raise HTTPException(
+                status_code=503,
+                detail="Login service busy, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        if not await asyncio.wrap_future(future):
+            await run_blocking(
+                write_audit,
+                action="LOGIN",
+                table_name="employees",
+                record_id=emp_id,
+                username=credentials.username,
+                role=role,
+                status="FAILED",
+                error_message="Invalid password",
+                actor={"user_id": emp_id, "username": credentials.username, "role": role},
+                request=request,
+            )
+            print(f"Password verification failed for {credentials.username}")
+            raise HTTPException(status_code=401, detail="Invalid password")
+
+        get_login_rate_limiter().reset(credentials.username)
         
         # Create JWT token
         access_token = create_access_token(
             data={"sub": str(emp_id), "role": role}
         )
 
-        write_audit(
+        await run_blocking(
+            write_audit,
             action="LOGIN",
             table_name="employees",
             record_id=emp_id,
@@ -159,28 +151,23 @@ def verify_token(authorization: Optional[str] = Header(None)):
         if scheme.lower() != "bearer" or not token:
             raise HTTPException(status_code=401, detail="Invalid token format")
         
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # Verified tokens and employee identities are cached, so a repeat
+        # verification normally does no signature check and no query
+        payload = decode_token(token)
         employee_id: int = int(payload.get("sub")) if payload.get("sub") else None
-        role: str = payload.get("role")
         
         if employee_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        with engine.connect() as conn:
-            res = conn.execute(text("""
-                SELECT employee_id, name, role
-                FROM employees
-                WHERE employee_id = :emp_id
-            """), {"emp_id": employee_id})
-            row = res.fetchone()
+        employee = get_employee_identity(employee_id)
         
-        if not row:
+        if not employee:
             raise HTTPException(status_code=401, detail="User not found")
         
         return {
-            "employee_id": row[0],
-            "name": row[1],
-            "role": row[2],
+            "employee_id": employee["employee_id"],
+            "name": employee["name"],
+            "role": employee["role"],
             "valid": True
         }
     except JWTError:
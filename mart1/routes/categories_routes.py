@@ -7,6 +7,7 @@ import math
 from typing import Optional
 
 from db import engine
+from cache_layer import publish_change
 from models import Category
 from routes.async_utils import async_route
 from routes.audit_helper import model_to_dict, resolve_actor, write_audit
@@ -77,6 +78,7 @@ def add_category(
                 "description": category.description
             })
             category_id = result.fetchone()[0]
+        publish_change("categories")
         write_audit(
             action="INSERT",
             table_name="categories",
@@ -113,6 +115,7 @@ def update_category(
             })
             if not result.fetchone():
                 raise HTTPException(status_code=404, detail="Category not found")
+        publish_change("categories")
         write_audit(
             action="UPDATE",
             table_name="categories",
@@ -141,6 +144,7 @@ def delete_category(
             result = conn.execute(text("DELETE FROM categories WHERE category_id = :cid RETURNING category_id"), {"cid": category_id})
             if not result.fetchone():
                 raise HTTPException(status_code=404, detail="Category not found")
+        publish_change("categories")
         write_audit(
             action="DELETE",
             table_name="categories",
@@ -3,13 +3,14 @@ Customer management routes
 """
 from fastapi import APIRouter, HTTPException, Query, Request, Header
 from sqlalchemy import text
-import math
 from typing import Optional
 
 from db import engine
+from cache_layer import publish_change
 from models import Customer
 from routes.async_utils import async_route
 from routes.audit_helper import model_to_dict, resolve_actor, write_audit
+from routes.pagination import build_pagination, count_rows, decode_cursor, keyset_condition, resolve_count_mode
 
 router = APIRouter(prefix="/api/customers", tags=["customers"])
 
@@ -18,27 +19,43 @@ router = APIRouter(prefix="/api/customers", tags=["customers"])
 @async_route
 def get_customers(
     page: int = Query(1, ge=1, description="Page number (starts at 1)"),
-    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)")
+    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)"),
+    after: Optional[str] = Query(None, description="Cursor from pagination.next_cursor; replaces page"),
+    count: Optional[str] = Query(None, description="Total count: exact, estimate, cached or none")
 ):
-    """Get all customers with pagination"""
+    """Get all customers by page number or keyset cursor"""
     try:
+        count_mode = resolve_count_mode(count, after is not None)
+        params = {"limit": page_size + 1}
+        where_clause = ""
+        offset_clause = ""
+        if after is not None:
+            cursor = decode_cursor(after, (str, int))
+            condition, cursor_params = keyset_condition("name", "customer_id", cursor, descending=False, nullable=False)
+            where_clause = f"WHERE {condition}"
+            params.update(cursor_params)
+            page = None
+        else:
+            offset_clause = "OFFSET :offset"
+            params["offset"] = (page - 1) * page_size
+
         with engine.connect() as conn:
-            # Get total count
-            count_result = conn.execute(text("SELECT COUNT(*) FROM customers"))
-            total_items = count_result.fetchone()[0]
-            
-            # Calculate pagination
-            offset = (page - 1) * page_size
-            total_pages = math.ceil(total_items / page_size)
-            
-            result = conn.execute(text("""
+            total_items = count_rows(conn, "customers", count_mode)
+
+            result = conn.execute(text(f"""
                 SELECT customer_id, name, phone, email, gender, 
                        loyalty_points, total_spent, address, created_at 
-                FROM customers 
-                ORDER BY name
-                LIMIT :limit OFFSET :offset
-            """), {"limit": page_size, "offset": offset})
+                FROM customers
+                {where_clause}
+                ORDER BY name, customer_id
+                LIMIT :limit {offset_clause}
+            """), params)
             rows = result.fetchall()
+
+        rows, pagination = build_pagination(
+            rows, page_size, page, total_items, count_mode,
+            cursor_key=lambda r: (r[1], r[0]),
+        )
         
         customers = [
             {
@@ -56,15 +73,10 @@ def get_customers(
         ]
         return {
             "customers": customers,
-            "pagination": {
-                "page": page,
-                "page_size": page_size,
-                "total_items": total_items,
-                "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_previous": page > 1
-            }
+            "pagination": pagination
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -91,6 +103,7 @@ def add_customer(
             })
             customer_id = result.fetchone()[0]
 
+        publish_change("customers")
         write_audit(
             action="INSERT",
             table_name="customers",
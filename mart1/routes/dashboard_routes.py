@@ -1,94 +1,109 @@
 """
 Dashboard and analytics routes
 """
+import os
+
 from fastapi import APIRouter, HTTPException, Query
 from sqlalchemy import text
 
-from db import engine
-from cache_layer import get_cached_or_fetch, CACHE_KEYS
+from cache_layer import get_cached_or_fetch_async, CACHE_KEYS
+from rollups import get_daily_sales, get_sales_summary
+from routes.async_utils import run_db
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# Entries are dropped by publish_change when these tables are written, so the
+# TTL only bounds how long date-relative windows (today, last N days) may lag.
+# Every checkout writes them, so an entry first ignores writes for the settle
+# window: under steady sales each view recomputes at most once per window
+DASHBOARD_TTL_SECONDS = 300
+DASHBOARD_SETTLE_SECONDS = _env_int("DASHBOARD_SETTLE_SECONDS", 30)
+STATS_TABLES = ("products", "sales")
+SALES_BY_DAY_TABLES = ("sales",)
+TOP_PRODUCTS_TABLES = ("products", "sales", "sale_items")
+
+
+# The low-stock count reads only the partial index's entries, i.e. the products
+# currently at or below their threshold, instead of filtering every product row
+DASHBOARD_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_products_low_stock ON products(product_id) "
+    "WHERE stock_quantity <= low_stock_threshold",
+]
+
+PRODUCT_COUNTS_QUERY = text("""
+    SELECT (SELECT COUNT(*) FROM products) AS total_products,
+           (SELECT COUNT(*) FROM products WHERE stock_quantity <= low_stock_threshold) AS low_stock_count
+""")
+
+
+def create_dashboard_indexes(engine):
+    """Creates the indexes the dashboard stats rely on if they don't exist"""
+    try:
+        with engine.begin() as conn:
+            for statement in DASHBOARD_INDEXES:
+                conn.execute(text(statement))
+    except Exception as e:
+        print(f"Could not create dashboard indexes: {e}")
+
+
 def _fetch_dashboard_stats(conn, days: int) -> dict:
-    if days == 0:
-        result = conn.execute(text("""
-            SELECT 
-                (SELECT COUNT(*) FROM products) as total_products,
-                (SELECT COUNT(*) FROM sales) as total_sales,
-                (SELECT COALESCE(SUM(total_amount), 0) FROM sales) as total_revenue,
-                (SELECT COUNT(*) FROM products WHERE stock_quantity <= low_stock_threshold) as low_stock_count,
-                (SELECT COALESCE(SUM(total_amount), 0) FROM sales WHERE DATE(sale_time) = CURRENT_DATE) as today_sales
-        """)).fetchone()
-    else:
-        result = conn.execute(text("""
-            SELECT 
-                (SELECT COUNT(*) FROM products) as total_products,
-                (SELECT COUNT(*) FROM sales WHERE sale_time >= CURRENT_DATE - INTERVAL '1 day' * :days) as total_sales,
-                (SELECT COALESCE(SUM(total_amount), 0) FROM sales WHERE sale_time >= CURRENT_DATE - INTERVAL '1 day' * :days) as total_revenue,
-                (SELECT COUNT(*) FROM products WHERE stock_quantity <= low_stock_threshold) as low_stock_count,
-                (SELECT COALESCE(SUM(total_amount), 0) FROM sales WHERE DATE(sale_time) = CURRENT_DATE) as today_sales
-        """), {"days": days}).fetchone()
+    products = conn.execute(PRODUCT_COUNTS_QUERY).fetchone()
+    # Sales figures come from the daily rollup plus the not yet rolled-up days
+    sales = get_sales_summary(conn, days)
 
     return {
-        "total_products": result[0],
-        "total_sales": result[1],
-        "total_revenue": float(result[2]),
-        "low_stock_count": result[3],
-        "today_sales": float(result[4]),
+        "total_products": products[0],
+        "total_sales": sales["sale_count"],
+        "total_revenue": sales["revenue"],
+        "low_stock_count": products[1],
+        "today_sales": sales["today_revenue"],
     }
 
 
 def _fetch_sales_by_day(conn, days: int) -> list:
-    if days == 0:
-        q = text("""
-            SELECT DATE(sale_time) as day, COALESCE(SUM(total_amount), 0) as total
-            FROM sales
-            GROUP BY DATE(sale_time)
-            ORDER BY day
-        """)
-        rows = conn.execute(q).fetchall()
-    else:
-        q = text("""
-            SELECT DATE(sale_time) as day, COALESCE(SUM(total_amount), 0) as total
-            FROM sales
-            WHERE sale_time >= CURRENT_DATE - INTERVAL '1 day' * :days
-            GROUP BY DATE(sale_time)
-            ORDER BY day
-        """)
-        rows = conn.execute(q, {"days": days}).fetchall()
-
-    return [{"day": str(r[0]), "total": float(r[1])} for r in rows]
+    rows = get_daily_sales(conn, days)
+    return [{"day": str(r[0]), "total": float(r[2])} for r in rows]
 
 
-def _fetch_top_products(conn, days: int, limit: int = 5) -> list:
-    if days == 0:
-        q = text("""
-            SELECT p.product_id, p.name, COALESCE(SUM(si.quantity * si.unit_price), 0) as revenue
-            FROM sale_items si
-            JOIN products p ON si.product_id = p.product_id
-            JOIN sales s ON si.sale_id = s.sale_id
-            GROUP BY p.product_id, p.name
-            ORDER BY revenue DESC
-            LIMIT :limit
-        """)
-        rows = conn.execute(q, {"limit": limit}).fetchall()
-    else:
-        q = text("""
-            SELECT p.product_id, p.name, COALESCE(SUM(si.quantity * si.unit_price), 0) as revenue
-            FROM sale_items si
-            JOIN products p ON si.product_id = p.product_id
-            JOIN sales s ON si.sale_id = s.sale_id
-            WHERE s.sale_time >= CURRENT_DATE - INTERVAL '1 day' * :days
-            GROUP BY p.product_id, p.name
-            ORDER BY revenue DESC
-            LIMIT :limit
-        """)
-        rows = conn.execute(q, {"limit": limit, "days": days}).fetchall()
+# :days = 0 means all time; one range condition keeps the sale_time index usable for either
+TOP_PRODUCTS_QUERY = text("""
+    SELECT p.product_id, p.name, COALESCE(SUM(si.quantity * si.unit_price), 0) as revenue
+    FROM sale_items si
+    JOIN products p ON si.product_id = p.product_id
+    JOIN sales s ON si.sale_id = s.sale_id
+    WHERE s.sale_time >= CASE WHEN CAST(:days AS int) = 0 THEN '-infinity'::date
+                              ELSE CURRENT_DATE - CAST(:days AS int) END
+    GROUP BY p.product_id, p.name
+    ORDER BY revenue DESC
+    LIMIT :limit
+""")
+
 
+def _fetch_top_products(conn, days: int, limit: int = 5) -> list:
+    rows = conn.execute(TOP_PRODUCTS_QUERY, {"limit": limit, "days": days}).fetchall()
     return [{"product_id": r[0], "name": r[1], "revenue": float(r[2])} for r in rows]
 
 
+def _fetch_overview(conn, days: int, limit: int) -> dict:
+    return {
+        "stats": _fetch_dashboard_stats(conn, days),
+        "sales_by_day": _fetch_sales_by_day(conn, days),
+        "top_products": _fetch_top_products(conn, days, limit),
+    }
+
+
+# The handlers are native async: cache hits never leave the event loop and
+# misses query through run_db, so waiting on the database holds no thread
+
 @router.get("/overview")
 async def get_dashboard_overview(
     days: int = Query(0, ge=0, le=365, description="Number of days to look back (0 for all time)"),
@@ -96,18 +111,12 @@ async def get_dashboard_overview(
 ):
     """Return stats, sales-by-day, and top products in a single request."""
     try:
-        def fetch_overview():
-            with engine.connect() as conn:
-                return {
-                    "stats": _fetch_dashboard_stats(conn, days),
-                    "sales_by_day": _fetch_sales_by_day(conn, days),
-                    "top_products": _fetch_top_products(conn, days, limit),
-                }
-
         cache_key = f"dashboard:overview:{days}:{limit}"
-        # Shorter cache for recent windows where users expect fresher numbers.
-        ttl_seconds = 30 if days in (7, 14) else 60
-        return get_cached_or_fetch(cache_key, fetch_overview, ttl_seconds=ttl_seconds)
+        # Serve the previous overview for up to a minute past expiry while a single refresh runs
+        return await get_cached_or_fetch_async(
+            cache_key, lambda: run_db(_fetch_overview, days, limit), ttl_seconds=DASHBOARD_TTL_SECONDS,
+            stale_seconds=60, depends_on=TOP_PRODUCTS_TABLES, settle_seconds=DASHBOARD_SETTLE_SECONDS,
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -116,14 +125,12 @@ async def get_dashboard_overview(
 async def get_dashboard_stats(days: int = Query(7, ge=0, le=365, description="Number of days to look back (0 for all time)")):
     """Get dashboard statistics"""
     try:
-        def fetch_stats():
-            with engine.connect() as conn:
-                return _fetch_dashboard_stats(conn, days)
-        
         # Cache key with days parameter to avoid cache conflicts
         cache_key = f"{CACHE_KEYS['DASHBOARD_STATS']}:{days}"
-        ttl_seconds = 30 if days in (7, 14) else 60
-        stats = get_cached_or_fetch(cache_key, fetch_stats, ttl_seconds=ttl_seconds)
+        stats = await get_cached_or_fetch_async(
+            cache_key, lambda: run_db(_fetch_dashboard_stats, days), ttl_seconds=DASHBOARD_TTL_SECONDS,
+            depends_on=STATS_TABLES, settle_seconds=DASHBOARD_SETTLE_SECONDS,
+        )
         return stats
         
     except Exception as e:
@@ -134,13 +141,11 @@ async def get_dashboard_stats(days: int = Query(7, ge=0, le=365, description="Nu
 async def get_sales_by_day(days: int = Query(7, ge=0, le=365, description="Number of days to look back (0 for all time)")):
     """Return sales totals grouped by date for the given range"""
     try:
-        def fetch_sales():
-            with engine.connect() as conn:
-                return _fetch_sales_by_day(conn, days)
-
         cache_key = CACHE_KEYS['SALES_BY_DATE'].format(days)
-        ttl_seconds = 30 if days in (7, 14) else 60
-        data = get_cached_or_fetch(cache_key, fetch_sales, ttl_seconds=ttl_seconds)
+        data = await get_cached_or_fetch_async(
+            cache_key, lambda: run_db(_fetch_sales_by_day, days), ttl_seconds=DASHBOARD_TTL_SECONDS,
+            depends_on=SALES_BY_DAY_TABLES, settle_seconds=DASHBOARD_SETTLE_SECONDS,
+        )
         return data
 
     except Exception as e:
@@ -154,14 +159,12 @@ async def get_top_products(
 ):
     """Return top selling products by revenue, optionally filtered by recent days"""
     try:
-        def fetch_top():
-            with engine.connect() as conn:
-                return _fetch_top_products(conn, days, limit)
-
         cache_key = CACHE_KEYS['TOP_PRODUCTS'].format(limit, days)
-        ttl_seconds = 30 if days in (7, 14) else 60
-        data = get_cached_or_fetch(cache_key, fetch_top, ttl_seconds=ttl_seconds)
+        data = await get_cached_or_fetch_async(
+            cache_key, lambda: run_db(_fetch_top_products, days, limit), ttl_seconds=DASHBOARD_TTL_SECONDS,
+            depends_on=TOP_PRODUCTS_TABLES, settle_seconds=DASHBOARD_SETTLE_SECONDS,
+        )
         return data
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
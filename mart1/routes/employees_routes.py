@@ -4,11 +4,12 @@ Employee management routes
 from fastapi import APIRouter, HTTPException, Query, Request, Header
 from sqlalchemy import text
 import math
-import bcrypt
 from typing import Optional
 
 from db import engine
+from cache_layer import publish_change
 from models import Employee
+from password_hashing import PasswordPoolBusy, get_password_hasher
 from routes.async_utils import async_route
 from routes.audit_helper import model_to_dict, resolve_actor, write_audit
 
@@ -68,7 +69,11 @@ def add_employee(
 ):
     """Add a new employee"""
     try:
-        hashed_password = bcrypt.hashpw(employee.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        try:
+            hashed_password = get_password_hasher().hash_password(employee.password).result()
+        except PasswordPoolBusy:
+            raise HTTPException(status_code=503, detail="Password hashing busy, try again shortly",
+                                headers={"Retry-After": "1"})
         with engine.begin() as conn:
             result = conn.execute(text("""
                 INSERT INTO employees (name, role, username, password)
@@ -82,6 +87,7 @@ def add_employee(
             })
             employee_id = result.fetchone()[0]
 
+        publish_change("employees")
         write_audit(
             action="INSERT",
             table_name="employees",
@@ -92,5 +98,7 @@ def add_employee(
         )
             
         return {"message": "Employee added successfully", "employee_id": employee_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
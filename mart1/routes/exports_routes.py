@@ -1,101 +1,370 @@
 """
 Data export routes
 """
+import csv
+import io
+import json
+import zlib
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy import text
 from typing import Optional
 
 from db import engine
 from routes.async_utils import async_route
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
 router = APIRouter(prefix="/api/export", tags=["export"])
 
+# (column, Arrow type, value used for NULL in the JSON export or None to keep NULL)
+SALES_EXPORT_SCHEMA = [
+    ("Invoice ID", "string", None),
+    ("Date", "string", None),
+    ("Time", "string", None),
+    ("Total", "float64", 0),
+    ("Quantity", "int64", 0),
+    ("Unit price", "float64", 0),
+    ("Product line", "string", None),
+    ("Payment", "string", None),
+    ("Customer type", "string", None),
+    ("Product name", "string", None),
+    ("Category", "string", None),
+    ("Gender", "string", None),
+    ("Discount (%)", "float64", 0),
+    ("Customer_Rating", "float64", None),
+    ("Feedback", "string", None),
+    ("Churn", "int64", 0),
+]
+SALES_EXPORT_COLUMNS = [name for name, _, _ in SALES_EXPORT_SCHEMA]
+
+PRODUCTS_EXPORT_SCHEMA = [
+    ("product_id", "int64", None),
+    ("name", "string", None),
+    ("price", "float64", 0),
+    ("stock_quantity", "int64", None),
+    ("low_stock_threshold", "int64", None),
+    ("category", "string", None),
+    ("supplier", "string", None),
+    ("barcode", "string", None),
+]
+
+CATEGORY_PERFORMANCE_SCHEMA = [
+    ("category", "string", None),
+    ("transaction_count", "int64", None),
+    ("total_quantity", "int64", None),
+    ("total_revenue", "float64", 0),
+    ("avg_transaction_value", "float64", 0),
+]
+
+INVENTORY_STATUS_SCHEMA = [
+    ("product_id", "int64", None),
+    ("name", "string", None),
+    ("stock_quantity", "int64", None),
+    ("low_stock_threshold", "int64", None),
+    ("status", "string", None),
+    ("category", "string", None),
+    ("supplier", "string", None),
+]
+
+COLUMNAR_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+STREAM_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# Rows fetched per round trip from the server-side cursor while streaming
+STREAM_BATCH_ROWS = 2000
+
+
+def _check_format(fmt: str, allowed):
+    if fmt not in allowed:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(allowed)}")
+    if fmt in COLUMNAR_FORMATS and not ARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail=f"format={fmt} requires pyarrow on the server")
+
+
+def _columnar_response(rows, schema, fmt: str, name: str, offset: int = 0, headers: Optional[dict] = None):
+    """
+    Encode result rows as an Arrow IPC stream or Parquet file.
+
+    Columns are built straight from the row tuples (starting at offset) and cast
+    to the schema's types, skipping the per-row dicts of the JSON export.
+    """
+    columns = list(zip(*rows)) if rows else [()] * (offset + len(schema))
+    arrays = []
+    for i, (_, type_alias, fill) in enumerate(schema):
+        array = pa.array(columns[offset + i]).cast(pa.type_for_alias(type_alias))
+        if fill is not None:
+            array = array.fill_null(fill)
+        arrays.append(array)
+    table = pa.Table.from_arrays(arrays, names=[column for column, _, _ in schema])
+
+    sink = pa.BufferOutputStream()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink)
+
+    media_type, extension = COLUMNAR_FORMATS[fmt]
+    response_headers = {
+        "Content-Disposition": f'attachment; filename="{name}.{extension}"',
+        "X-Row-Count": str(table.num_rows),
+    }
+    response_headers.update(headers or {})
+    return Response(content=sink.getvalue().to_pybytes(), media_type=media_type, headers=response_headers)
+
+
+def _sales_filter(days: Optional[int], after_id: Optional[int]):
+    """WHERE clause and params selecting the sales an export covers."""
+    params = {}
+    conditions = []
+    if days is not None and int(days) > 0:
+        conditions.append("s.sale_time >= CURRENT_DATE - CAST(:days AS INTEGER) * INTERVAL '1 day'")
+        params["days"] = int(days)
+    if after_id is not None:
+        conditions.append("s.sale_id > :after_id")
+        params["after_id"] = int(after_id)
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where_clause, params
+
+
+def _sales_page_query(days: Optional[int], after_id: int, limit: int):
+    """
+    Highest sale_id and number of sales in an incremental page.
+
+    Taken from sales alone: the export joins sale_items, so a sale without
+    items has no rows there but still moves the watermark and fills the page.
+    """
+    where_clause, params = _sales_filter(days, after_id)
+    params["limit"] = limit
+    query = f"""
+        SELECT MAX(page.sale_id), COUNT(*)
+        FROM (
+            SELECT s.sale_id
+            FROM sales s
+            {where_clause}
+            ORDER BY s.sale_id ASC
+            LIMIT :limit
+        ) page
+    """
+    return query, params
+
+
+def _sales_export_query(days: Optional[int], after_id: Optional[int], limit: Optional[int],
+                        ordered_by_id: bool):
+    """Build the sale line-item export query; limit=None exports every matching sale."""
+    # Filter sales first (uses sale_time index if present), then join details
+    where_clause, params = _sales_filter(days, after_id)
+
+    if ordered_by_id:
+        sales_order = "s.sale_id ASC"
+        items_order = "s.sale_id ASC, si.sale_item_id ASC"
+        items_limit = ""
+    else:
+        sales_order = "s.sale_time DESC"
+        items_order = "s.sale_time DESC"
+        items_limit = "LIMIT :limit"
+
+    sales_limit = ""
+    if limit is not None:
+        sales_limit = "LIMIT :limit"
+        params["limit"] = limit
+    else:
+        items_limit = ""
+
+    query = f"""
+        SELECT
+            s.sale_id,
+            CONCAT(s.sale_id, '-', si.sale_item_id) AS "Invoice ID",
+            TO_CHAR(s.sale_time, 'YYYY-MM-DD') AS "Date",
+            TO_CHAR(s.sale_time, 'HH24:MI') AS "Time",
+            COALESCE(si.quantity * si.unit_price, 0) AS "Total",
+            COALESCE(si.quantity, 0) AS "Quantity",
+            COALESCE(si.unit_price, 0) AS "Unit price",
+            COALESCE(cat.name, 'Uncategorized') AS "Product line",
+            COALESCE(s.payment_method, 'Unknown') AS "Payment",
+            CASE WHEN s.customer_id IS NOT NULL THEN 'Member' ELSE 'Normal' END AS "Customer type",
+            COALESCE(p.name, 'Unknown') AS "Product name",
+            COALESCE(cat.name, 'Uncategorized') AS "Category",
+            COALESCE(cust.gender, 'Unknown') AS "Gender",
+            COALESCE(s.discount_percentage, 0) AS "Discount (%)",
+            s.customer_rating AS "Customer_Rating",
+            s.feedback AS "Feedback",
+            COALESCE(cust.churn, 0) AS "Churn"
+        FROM (
+            SELECT sale_id, sale_time, payment_method, customer_id,
+                   discount_percentage, customer_rating, feedback
+            FROM sales s
+            {where_clause}
+            ORDER BY {sales_order}
+            {sales_limit}
+        ) s
+        INNER JOIN sale_items si ON si.sale_id = s.sale_id
+        LEFT JOIN products p ON p.product_id = si.product_id
+        LEFT JOIN categories cat ON cat.category_id = p.category_id
+        LEFT JOIN customers cust ON cust.customer_id = s.customer_id
+        ORDER BY {items_order}
+        {items_limit}
+    """
+    return query, params
+
+
+def _sales_export_row(r) -> dict:
+    return {
+        "Invoice ID": r["Invoice ID"],
+        "Date": r["Date"],
+        "Time": r["Time"],
+        "Total": float(r["Total"] or 0),
+        "Quantity": int(r["Quantity"] or 0),
+        "Unit price": float(r["Unit price"] or 0),
+        "Product line": r["Product line"],
+        "Payment": r["Payment"],
+        "Customer type": r["Customer type"],
+        "Product name": r["Product name"],
+        "Category": r["Category"],
+        "Gender": r["Gender"],
+        "Discount (%)": float(r["Discount (%)"] or 0),
+        "Customer_Rating": float(r["Customer_Rating"]) if r["Customer_Rating"] is not None else None,
+        "Feedback": r["Feedback"],
+        "Churn": int(r["Churn"] or 0),
+    }
+
+
+def _stream_sales_export(query: str, params: dict, fmt: str, compress: bool):
+    """
+    Yield the export in chunks straight from a server-side cursor.
+
+    stream_results makes psycopg2 use a named cursor, so only one batch of
+    rows is held in memory at a time however large the export is.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+
+    def emit(chunk: str) -> bytes:
+        data = chunk.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=SALES_EXPORT_COLUMNS) if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=STREAM_BATCH_ROWS).execute(
+            text(query), params
+        )
+        for batch in result.mappings().partitions():
+            for r in batch:
+                row = _sales_export_row(r)
+                if writer:
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(row))
+                    buffer.write("\n")
+            chunk = emit(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+            if chunk:
+                yield chunk
+
+    tail = emit(buffer.getvalue())
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
+
 
 @router.get("/sales")
 @async_route
-def export_sales_data(limit: int = 1000, days: Optional[int] = None):
+def export_sales_data(
+    limit: Optional[int] = None,
+    days: Optional[int] = None,
+    after_id: Optional[int] = None,
+    format: str = "json",
+    gzip: bool = False,
+):
     """
     Export sales line-items for analytics.
     Filters by date first, then joins — much faster on large tables.
+
+    With after_id the export pages forward through sales in sale_id order:
+    limit applies to sales (all of their items are returned) and the response
+    carries last_sale_id to pass as the next after_id. sale_ids are assigned
+    before commit, so a lower id can appear after a higher one was exported;
+    incremental clients should re-read a window below their watermark and
+    de-duplicate on Invoice ID.
+
+    format=csv or format=ndjson streams every matching line item in sale_id
+    order with no row cap (limit, if given, still caps the number of sales);
+    gzip=true compresses the stream into a .gz download. format=arrow or
+    format=parquet returns the same rows as the JSON export in a columnar
+    body, with last_sale_id/has_more in X-Last-Sale-Id/X-Has-More headers.
     """
     try:
+        _check_format(format, ("json", "csv", "ndjson", "arrow", "parquet"))
+        if format in STREAM_FORMATS:
+            stream_limit = max(1, int(limit)) if limit is not None else None
+            query, params = _sales_export_query(days, after_id, stream_limit, ordered_by_id=True)
+            media_type, extension = STREAM_FORMATS[format]
+            filename = f"sales_export.{extension}"
+            if gzip:
+                media_type = "application/gzip"
+                filename += ".gz"
+            return StreamingResponse(
+                _stream_sales_export(query, params, format, gzip),
+                media_type=media_type,
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+            )
         limit = max(1, min(int(limit or 1000), 5000))
-        params = {"limit": limit}
-
-        # Filter sales first (uses sale_time index if present), then join details
-        where_clause = ""
-        if days is not None and int(days) > 0:
-            where_clause = "WHERE s.sale_time >= CURRENT_DATE - CAST(:days AS INTEGER) * INTERVAL '1 day'"
-            params["days"] = int(days)
-
-        query = f"""
-            SELECT
-                CONCAT(s.sale_id, '-', si.sale_item_id) AS "Invoice ID",
-                TO_CHAR(s.sale_time, 'YYYY-MM-DD') AS "Date",
-                TO_CHAR(s.sale_time, 'HH24:MI') AS "Time",
-                COALESCE(si.quantity * si.unit_price, 0) AS "Total",
-                COALESCE(si.quantity, 0) AS "Quantity",
-                COALESCE(si.unit_price, 0) AS "Unit price",
-                COALESCE(cat.name, 'Uncategorized') AS "Product line",
-                COALESCE(s.payment_method, 'Unknown') AS "Payment",
-                CASE WHEN s.customer_id IS NOT NULL THEN 'Member' ELSE 'Normal' END AS "Customer type",
-                COALESCE(p.name, 'Unknown') AS "Product name",
-                COALESCE(cat.name, 'Uncategorized') AS "Category",
-                COALESCE(cust.gender, 'Unknown') AS "Gender",
-                COALESCE(s.discount_percentage, 0) AS "Discount (%)",
-                s.customer_rating AS "Customer_Rating",
-                s.feedback AS "Feedback",
-                COALESCE(cust.churn, 0) AS "Churn"
-            FROM (
-                SELECT sale_id, sale_time, payment_method, customer_id,
-                       discount_percentage, customer_rating, feedback
-                FROM sales s
-                {where_clause}
-                ORDER BY s.sale_time DESC
-                LIMIT :limit
-            ) s
-            INNER JOIN sale_items si ON si.sale_id = s.sale_id
-            LEFT JOIN products p ON p.product_id = si.product_id
-            LEFT JOIN categories cat ON cat.category_id = p.category_id
-            LEFT JOIN customers cust ON cust.customer_id = s.customer_id
-            ORDER BY s.sale_time DESC
-            LIMIT :limit
-        """
+        incremental = after_id is not None
+        query, params = _sales_export_query(days, after_id, limit, ordered_by_id=incremental)
 
+        page = {}
         with engine.connect() as conn:
             result = conn.execute(text(query), params)
-            rows = result.mappings().all()
-
-        sales_data = []
-        for r in rows:
-            sales_data.append({
-                "Invoice ID": r["Invoice ID"],
-                "Date": r["Date"],
-                "Time": r["Time"],
-                "Total": float(r["Total"] or 0),
-                "Quantity": int(r["Quantity"] or 0),
-                "Unit price": float(r["Unit price"] or 0),
-                "Product line": r["Product line"],
-                "Payment": r["Payment"],
-                "Customer type": r["Customer type"],
-                "Product name": r["Product name"],
-                "Category": r["Category"],
-                "Gender": r["Gender"],
-                "Discount (%)": float(r["Discount (%)"] or 0),
-                "Customer_Rating": float(r["Customer_Rating"]) if r["Customer_Rating"] is not None else None,
-                "Feedback": r["Feedback"],
-                "Churn": int(r["Churn"] or 0),
-            })
-
-        return {"data": sales_data, "count": len(sales_data)}
+            rows = result.fetchall()
+            if incremental:
+                page_query, page_params = _sales_page_query(days, after_id, limit)
+                last_sale_id, sale_count = conn.execute(text(page_query), page_params).fetchone()
+                page["last_sale_id"] = int(last_sale_id) if last_sale_id is not None else int(after_id)
+                # A full page of sales means there may be more after last_sale_id
+                page["has_more"] = sale_count >= limit
+
+        if format in COLUMNAR_FORMATS:
+            headers = {}
+            if incremental:
+                headers = {
+                    "X-Last-Sale-Id": str(page["last_sale_id"]),
+                    "X-Has-More": "true" if page["has_more"] else "false",
+                }
+            # Column 0 is sale_id, used only for paging
+            return _columnar_response(rows, SALES_EXPORT_SCHEMA, format, "sales_export", offset=1, headers=headers)
+
+        sales_data = [_sales_export_row(r._mapping) for r in rows]
+        response = {"data": sales_data, "count": len(sales_data)}
+        response.update(page)
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/products")
 @async_route
-def export_products_data():
+def export_products_data(format: str = "json"):
     try:
+        _check_format(format, ("json", "arrow", "parquet"))
         with engine.connect() as conn:
             result = conn.execute(text("""
                 SELECT 
@@ -114,6 +383,9 @@ def export_products_data():
             """))
             rows = result.fetchall()
 
+        if format in COLUMNAR_FORMATS:
+            return _columnar_response(rows, PRODUCTS_EXPORT_SCHEMA, format, "products_export")
+
         products = [
             {
                 "product_id": r[0],
@@ -128,14 +400,17 @@ def export_products_data():
             for r in rows
         ]
         return {"data": products, "count": len(products)}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/categories-performance")
 @async_route
-def export_category_performance(days: int = 30):
+def export_category_performance(days: int = 30, format: str = "json"):
     try:
+        _check_format(format, ("json", "arrow", "parquet"))
         with engine.connect() as conn:
             result = conn.execute(text("""
                 SELECT 
@@ -155,6 +430,9 @@ def export_category_performance(days: int = 30):
             """), {"days": days})
             rows = result.fetchall()
 
+        if format in COLUMNAR_FORMATS:
+            return _columnar_response(rows, CATEGORY_PERFORMANCE_SCHEMA, format, "categories_performance")
+
         categories = [
             {
                 "category": r[0],
@@ -166,14 +444,17 @@ def export_category_performance(days: int = 30):
             for r in rows
         ]
         return {"data": categories, "count": len(categories)}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/inventory-status")
 @async_route
-def export_inventory_status():
+def export_inventory_status(format: str = "json"):
     try:
+        _check_format(format, ("json", "arrow", "parquet"))
         with engine.connect() as conn:
             result = conn.execute(text("""
                 SELECT 
@@ -195,6 +476,9 @@ def export_inventory_status():
             """))
             rows = result.fetchall()
 
+        if format in COLUMNAR_FORMATS:
+            return _columnar_response(rows, INVENTORY_STATUS_SCHEMA, format, "inventory_status")
+
         inventory = [
             {
                 "product_id": r[0],
@@ -208,5 +492,7 @@ def export_inventory_status():
             for r in rows
         ]
         return {"data": inventory, "count": len(inventory)}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,93 @@
+"""Cached JWT verification and employee identity lookups shared by the auth and audit helpers."""
+
+import hashlib
+import os
+import time
+from typing import Optional
+
+from fastapi import Header, HTTPException
+from jose import JWTError, jwt
+from sqlalchemy import text
+
+from cache_layer import LRUCache, get_cached_or_fetch
+from db import engine
+
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-12345678")
+ALGORITHM = "HS256"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+TOKEN_CACHE_MAX_ENTRIES = _env_int("TOKEN_CACHE_MAX_ENTRIES", 10000)
+# Employees are only written through routes that publish_change("employees");
+# the TTL bounds how long a change made outside the API (CLI, SQL) goes unseen
+EMPLOYEE_CACHE_TTL_SECONDS = _env_int("EMPLOYEE_CACHE_TTL_SECONDS", 300)
+
+# Verified payloads by token hash, per process; each entry expires with its token
+token_cache = LRUCache(max_entries=TOKEN_CACHE_MAX_ENTRIES)
+
+EMPLOYEE_IDENTITY_QUERY = text("""
+    SELECT employee_id, name, username, role
+    FROM employees
+    WHERE employee_id = :employee_id
+""")
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verify a JWT and return its payload, skipping the signature check for a
+    token already verified by this process. Raises JWTError like jwt.decode.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    expires_at = payload.get("exp")
+    ttl_seconds = int(expires_at - time.time()) if isinstance(expires_at, (int, float)) else 300
+    if ttl_seconds > 0:
+        token_cache.set(key, payload, ttl_seconds=ttl_seconds)
+    return payload
+
+
+def _fetch_employee(employee_id: int) -> Optional[dict]:
+    with engine.connect() as conn:
+        row = conn.execute(EMPLOYEE_IDENTITY_QUERY, {"employee_id": employee_id}).fetchone()
+    if not row:
+        return None
+    return {"employee_id": row[0], "name": row[1], "username": row[2], "role": row[3]}
+
+
+def get_employee_identity(employee_id: int) -> Optional[dict]:
+    """Employee id, name, username and role, or None; cached until employees is written"""
+    return get_cached_or_fetch(
+        f"employee:{employee_id}",
+        lambda: _fetch_employee(employee_id),
+        ttl_seconds=EMPLOYEE_CACHE_TTL_SECONDS,
+        depends_on=("employees",),
+    )
+
+
+def require_admin(authorization: Optional[str] = Header(None)) -> dict:
+    """Route dependency: 401 without a valid bearer token, 403 unless it belongs to an admin"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="No token provided")
+    try:
+        payload = decode_token(token)
+        employee_id = int(payload["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    # The current role, so a demoted admin loses access before the token expires
+    employee = get_employee_identity(employee_id)
+    if not employee:
+        raise HTTPException(status_code=401, detail="User not found")
+    if employee["role"] != "ADMIN":
+        raise HTTPException(status_code=403, detail="Access denied. Admin role required.")
+    return employee
@@ -0,0 +1,63 @@
+"""
+Runtime metrics routes
+
+They expose SQL text, pool capacity and login pressure, so every route
+requires an admin's bearer token.
+"""
+from fastapi import APIRouter, Depends
+
+from cache_layer import cache
+from db import get_pool_stats, statement_metrics, DB_QUERY_CACHE_SIZE, DB_PREPARED_STATEMENT_CACHE_SIZE
+from password_hashing import get_login_rate_limiter, get_password_hasher
+from product_index import get_product_index
+from routes.async_utils import get_executor_stats
+from routes.identity import require_admin, token_cache
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/cache")
+def get_cache_metrics():
+    """Hit, miss and size counters of the dashboard cache"""
+    return cache.get_stats()
+
+
+@router.get("/token-cache")
+def get_token_cache_metrics():
+    """Hit, miss and size counters of the verified-token cache"""
+    return token_cache.get_stats()
+
+
+@router.get("/db-pool")
+def get_db_pool_metrics():
+    """Connection pool occupancy, checkout waits and timeouts, and the route worker queue"""
+    return {
+        "pool": get_pool_stats(),
+        "executor": get_executor_stats(),
+    }
+
+
+@router.get("/statements")
+def get_statement_metrics():
+    """Distinct SQL statement shapes executed by this process and the busiest ones"""
+    stats = statement_metrics.snapshot()
+    stats.update({
+        "query_cache_size": DB_QUERY_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE,
+    })
+    return stats
+
+
+@router.get("/password-hashing")
+def get_password_hashing_metrics():
+    """bcrypt pool queue depth, latency histogram and rejections, and login rate limiting"""
+    return {
+        "pool": get_password_hasher().get_stats(),
+        "rate_limiter": get_login_rate_limiter().get_stats(),
+    }
+
+
+@router.get("/product-index")
+def get_product_index_metrics():
+    """Size, hit and revalidation counters of the in-memory barcode index"""
+    return get_product_index().get_stats()
@@ -3,11 +3,14 @@ Notification routes
 """
 from fastapi import APIRouter, HTTPException, Query
 from sqlalchemy import text
-import math
+from datetime import datetime
+from typing import Optional
 
 from db import engine
+from cache_layer import publish_change
 from models import NotificationUpdate
 from routes.async_utils import async_route
+from routes.pagination import build_pagination, count_rows, decode_cursor, keyset_condition, resolve_count_mode
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
@@ -16,26 +19,45 @@ router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 @async_route
 def get_notifications(
     page: int = Query(1, ge=1, description="Page number (starts at 1)"),
-    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)")
+    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)"),
+    after: Optional[str] = Query(None, description="Cursor from pagination.next_cursor; replaces page"),
+    count: Optional[str] = Query(None, description="Total count: exact, estimate, cached or none")
 ):
+    """Get notifications, newest first, by page number or keyset cursor"""
     try:
-        with engine.connect() as conn:
-            count_result = conn.execute(text("SELECT COUNT(*) FROM notifications"))
-            total_items = count_result.fetchone()[0]
+        count_mode = resolve_count_mode(count, after is not None)
+        params = {"limit": page_size + 1}
+        where_clause = ""
+        offset_clause = ""
+        if after is not None:
+            cursor = decode_cursor(after, (datetime.fromisoformat, int))
+            condition, cursor_params = keyset_condition("n.created_at", "n.notification_id", cursor)
+            where_clause = f"WHERE {condition}"
+            params.update(cursor_params)
+            page = None
+        else:
+            offset_clause = "OFFSET :offset"
+            params["offset"] = (page - 1) * page_size
 
-            offset = (page - 1) * page_size
-            total_pages = math.ceil(total_items / page_size)
+        with engine.connect() as conn:
+            total_items = count_rows(conn, "notifications", count_mode)
 
-            result = conn.execute(text("""
+            result = conn.execute(text(f"""
                 SELECT n.notification_id, n.message, n.status, n.notification_type,
                        n.created_at, p.name as product_name
                 FROM notifications n
                 LEFT JOIN products p ON n.product_id = p.product_id
-                ORDER BY n.created_at DESC
-                LIMIT :limit OFFSET :offset
-            """), {"limit": page_size, "offset": offset})
+                {where_clause}
+                ORDER BY n.created_at DESC, n.notification_id DESC
+                LIMIT :limit {offset_clause}
+            """), params)
             rows = result.fetchall()
 
+        rows, pagination = build_pagination(
+            rows, page_size, page, total_items, count_mode,
+            cursor_key=lambda r: (r[4], r[0]),
+        )
+
         notifications = [
             {
                 "notification_id": r[0],
@@ -49,15 +71,10 @@ def get_notifications(
         ]
         return {
             "notifications": notifications,
-            "pagination": {
-                "page": page,
-                "page_size": page_size,
-                "total_items": total_items,
-                "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_previous": page > 1
-            }
+            "pagination": pagination
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -75,6 +92,7 @@ def update_notification(notification_id: int, notification: NotificationUpdate):
             """), {"status": notification.status, "nid": notification_id})
             if not result.fetchone():
                 raise HTTPException(status_code=404, detail="Notification not found")
+        publish_change("notifications")
         return {"message": "Notification updated successfully"}
     except HTTPException:
         raise
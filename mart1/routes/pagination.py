@@ -0,0 +1,174 @@
+"""Helpers for keyset (cursor) pagination and cheap row counts on list endpoints."""
+
+import base64
+import json
+import math
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from cache_layer import get_cached_or_fetch, get_cached_or_fetch_async
+from routes.async_utils import run_db
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+COUNT_MODES = ("exact", "estimate", "cached", "none")
+# API writes invalidate a cached count at once (publish_change); the TTL only
+# bounds how long a write made outside the API (CLI, SQL) leaves it stale
+COUNT_CACHE_TTL_SECONDS = _env_int("COUNT_CACHE_TTL_SECONDS", 300)
+
+# Index-backed orderings the list endpoints page through with cursors
+PAGINATION_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_sales_sale_time_id ON sales(sale_time DESC, sale_id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_created_id ON notifications(created_at DESC, notification_id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_purchase_orders_date_id ON purchase_orders(order_date DESC, order_id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_customers_name_id ON customers(name, customer_id)",
+]
+
+
+def create_pagination_indexes(engine):
+    """Creates the composite indexes used by cursor pagination if they don't exist"""
+    try:
+        with engine.begin() as conn:
+            for statement in PAGINATION_INDEXES:
+                conn.execute(text(statement))
+    except Exception as e:
+        print(f"Could not create pagination indexes: {e}")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor."""
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, parsers: Sequence[Callable[[Any], Any]]) -> List[Any]:
+    """Decode a cursor produced by encode_cursor; None values are kept as None."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError("wrong number of cursor fields")
+        return [None if v is None else parse(v) for parse, v in zip(parsers, values)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def keyset_condition(sort_column: str, id_column: str, values: Sequence[Any],
+                     descending: bool = True, nullable: bool = True) -> Tuple[str, Dict[str, Any]]:
+    """
+    WHERE condition selecting rows after the cursor for ORDER BY sort_column, id_column.
+
+    The leading range on sort_column keeps the condition sargable on an index
+    over (sort_column[, id_column]). PostgreSQL puts NULL sort keys first in
+    descending order and last in ascending order, so:
+
+    - descending: a NULL cursor key continues within the NULLs and then moves
+      on to every non-NULL row; a non-NULL key is past all the NULLs.
+    - ascending: a NULL cursor key means only NULLs with a later id remain;
+      a non-NULL key still has every NULL ahead of it.
+
+    Pass nullable=False for a NOT NULL sort column to leave the ascending NULL
+    branch out of the condition.
+    """
+    sort_value, last_id = values
+    op = "<" if descending else ">"
+    if sort_value is None:
+        if descending:
+            return (
+                f"(({sort_column} IS NULL AND {id_column} {op} :cursor_id) OR {sort_column} IS NOT NULL)",
+                {"cursor_id": last_id},
+            )
+        return f"({sort_column} IS NULL AND {id_column} {op} :cursor_id)", {"cursor_id": last_id}
+    condition = f"{sort_column} {op}= :cursor_key AND ({sort_column} {op} :cursor_key OR {id_column} {op} :cursor_id)"
+    if not descending and nullable:
+        condition = f"(({condition}) OR {sort_column} IS NULL)"
+    return condition, {"cursor_key": sort_value, "cursor_id": last_id}
+
+
+def count_rows(conn, table: str, mode: str) -> Optional[int]:
+    """
+    Row count for a table according to the requested count mode.
+
+    exact runs COUNT(*); estimate reads the planner's pg_class.reltuples (falling
+    back to COUNT(*) for never-analyzed tables); cached reuses an exact count until
+    the table is written or the TTL lapses; none skips counting.
+    """
+    if mode == "none":
+        return None
+    if mode == "estimate":
+        estimate = conn.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": table},
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    if mode == "cached":
+        return get_cached_or_fetch(
+            f"count:{table}",
+            lambda: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar(),
+            ttl_seconds=COUNT_CACHE_TTL_SECONDS,
+            depends_on=(table,),
+        )
+    return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+async def count_rows_async(table: str, mode: str) -> Optional[int]:
+    """count_rows for async handlers; the cached mode shares count_rows' cache entry"""
+    if mode == "cached":
+        return await get_cached_or_fetch_async(
+            f"count:{table}",
+            lambda: run_db(count_rows, table, "exact"),
+            ttl_seconds=COUNT_CACHE_TTL_SECONDS,
+            depends_on=(table,),
+        )
+    return await run_db(count_rows, table, mode)
+
+
+def resolve_count_mode(count: Optional[str], cursor_mode: bool) -> str:
+    """Validate the count query parameter; cursor requests default to an estimate."""
+    if count is None:
+        return "estimate" if cursor_mode else "exact"
+    if count not in COUNT_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"count must be one of: {', '.join(COUNT_MODES)}",
+        )
+    return count
+
+
+def build_pagination(rows: list, page_size: int, page: Optional[int], total_items: Optional[int],
+                     count_mode: str, cursor_key: Callable[[Any], Sequence[Any]]) -> Tuple[list, Dict[str, Any]]:
+    """
+    Trim the look-ahead row and build the pagination block.
+
+    rows must hold up to page_size + 1 rows; the extra row only signals that a
+    next page exists. next_cursor continues after the last returned row and
+    works whether the page was fetched by number or by cursor.
+    """
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(cursor_key(rows[-1])) if has_next and rows else None
+
+    pagination = {
+        "page_size": page_size,
+        "total_items": total_items,
+        "total_pages": math.ceil(total_items / page_size) if total_items is not None else None,
+        "count_mode": count_mode,
+        "has_next": has_next,
+        "next_cursor": next_cursor,
+    }
+    if page is not None:
+        pagination["page"] = page
+        pagination["has_previous"] = page > 1
+    return rows, pagination
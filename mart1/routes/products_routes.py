@@ -1,49 +1,171 @@
 """
 Product management routes
 """
+import asyncio
+import csv
+import io
+import json
+import math
 from fastapi import APIRouter, HTTPException, Query, Request, Header
 from sqlalchemy import text
-import math
 from typing import Optional
 
 from db import engine
-from models import Product, StockUpdate
-from routes.async_utils import async_route
+from models import BarcodeLookup, Product, StockUpdate
+from product_index import (
+    get_product_index, product_row_to_dict, publish_catalog_change, publish_product_changes,
+)
+from routes.async_utils import async_route, run_blocking, run_db
 from routes.audit_helper import model_to_dict, resolve_actor, write_audit
+from routes.pagination import build_pagination, count_rows_async, decode_cursor, resolve_count_mode
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
 
+PRODUCT_QUERY = text("""
+    SELECT p.product_id, p.name, p.barcode, p.price, p.stock_quantity, 
+           p.low_stock_threshold, p.category_id, c.name as category, 
+           p.supplier_id, s.name as supplier, p.cost_price
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.category_id
+    LEFT JOIN suppliers s ON p.supplier_id = s.supplier_id
+    WHERE p.product_id = :pid
+""")
+
+# Set by create_product_search_indexes once pg_trgm is installed; without it
+# search falls back to plain ILIKE matching (sequential scans, no fuzzy matches)
+TRGM_AVAILABLE = False
+
+SEARCH_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_products_barcode_pattern ON products(barcode varchar_pattern_ops)",
+]
+
+TRGM_SEARCH_INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_categories_name_trgm ON categories USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_suppliers_name_trgm ON suppliers USING gin (name gin_trgm_ops)",
+]
+
+# Queries shorter than this match by prefix only; a one or two character
+# substring or fuzzy match would select most of the catalog
+SEARCH_MIN_FUZZY_LENGTH = 3
+
+
+def _search_query(name_match: str, trigram: bool):
+    """
+    Ranked product search. Candidates are collected per matching index (name,
+    barcode prefix, matching category or supplier) and only they are ranked:
+    exact barcode, barcode prefix, exact name, name prefix, word prefix, then
+    trigram word similarity of the name and of its category and supplier.
+    """
+    similarity = """
+              + 10 * word_similarity(:q, p.name)
+              + 5 * GREATEST(word_similarity(:q, COALESCE(c.name, '')),
+                             word_similarity(:q, COALESCE(s.name, '')))""" if trigram else ""
+    return text(f"""
+        WITH candidates AS (
+            SELECT product_id FROM products WHERE {name_match.format(column="name")}
+            UNION
+            SELECT product_id FROM products WHERE barcode LIKE :prefix
+            UNION
+            SELECT product_id FROM products
+            WHERE category_id IN (SELECT category_id FROM categories WHERE {name_match.format(column="name")})
+            UNION
+            SELECT product_id FROM products
+            WHERE supplier_id IN (SELECT supplier_id FROM suppliers WHERE {name_match.format(column="name")})
+        )
+        SELECT p.product_id, p.name, p.barcode, p.price, p.stock_quantity,
+               p.low_stock_threshold, p.category_id, c.name as category,
+               p.supplier_id, s.name as supplier, p.cost_price,
+               (CASE WHEN p.barcode = :q THEN 100 WHEN p.barcode LIKE :prefix THEN 50 ELSE 0 END
+              + CASE WHEN LOWER(p.name) = LOWER(:q) THEN 40
+                     WHEN p.name ILIKE :prefix THEN 20
+                     WHEN p.name ILIKE :word_prefix THEN 10
+                     ELSE 0 END{similarity}
+               ) AS score
+        FROM candidates m
+        JOIN products p ON p.product_id = m.product_id
+        LEFT JOIN categories c ON p.category_id = c.category_id
+        LEFT JOIN suppliers s ON p.supplier_id = s.supplier_id
+        ORDER BY score DESC, p.name, p.product_id
+        LIMIT :limit OFFSET :offset
+    """)
+
+
+# (trigram, fuzzy) -> query; the ILIKE patterns use the trigram indexes when they exist
+SEARCH_QUERIES = {
+    (True, True): _search_query("({column} ILIKE :contains OR :q <% {column})", trigram=True),
+    (True, False): _search_query("{column} ILIKE :prefix", trigram=True),
+    (False, True): _search_query("{column} ILIKE :contains", trigram=False),
+    (False, False): _search_query("{column} ILIKE :prefix", trigram=False),
+}
+
+
+def create_product_search_indexes(engine):
+    """Creates the product search indexes, and pg_trgm with its indexes where permitted"""
+    global TRGM_AVAILABLE
+    try:
+        with engine.begin() as conn:
+            for statement in SEARCH_INDEXES:
+                conn.execute(text(statement))
+    except Exception as e:
+        print(f"Could not create product search indexes: {e}")
+    try:
+        with engine.begin() as conn:
+            for statement in TRGM_SEARCH_INDEXES:
+                conn.execute(text(statement))
+        TRGM_AVAILABLE = True
+    except Exception as e:
+        print(f"pg_trgm unavailable, product search will not match fuzzily: {e}")
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 @router.get("")
-@async_route
-def get_products(
+async def get_products(
     page: int = Query(1, ge=1, description="Page number (starts at 1)"),
-    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)")
+    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)"),
+    after: Optional[str] = Query(None, description="Cursor from pagination.next_cursor; replaces page"),
+    count: Optional[str] = Query(None, description="Total count: exact, estimate, cached or none")
 ):
-    """Get all products with pagination"""
+    """Get all products by page number or keyset cursor"""
     try:
-        with engine.connect() as conn:
-            # Get total count
-            count_result = conn.execute(text("SELECT COUNT(*) FROM products"))
-            total_items = count_result.fetchone()[0]
-            
-            # Calculate pagination
-            offset = (page - 1) * page_size
-            total_pages = math.ceil(total_items / page_size)
-            
-            # Get paginated results
-            result = conn.execute(text("""
+        count_mode = resolve_count_mode(count, after is not None)
+        params = {"limit": page_size + 1}
+        where_clause = ""
+        offset_clause = ""
+        if after is not None:
+            (cursor_id,) = decode_cursor(after, (int,))
+            where_clause = "WHERE p.product_id > :cursor_id"
+            params["cursor_id"] = cursor_id
+            page = None
+        else:
+            offset_clause = "OFFSET :offset"
+            params["offset"] = (page - 1) * page_size
+
+        def fetch_page(conn):
+            return conn.execute(text(f"""
                 SELECT p.product_id, p.name, p.barcode, p.price, p.stock_quantity, 
                        p.low_stock_threshold, p.category_id, c.name as category, 
                        p.supplier_id, s.name as supplier, p.cost_price
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.category_id
                 LEFT JOIN suppliers s ON p.supplier_id = s.supplier_id
+                {where_clause}
                 ORDER BY p.product_id
-                LIMIT :limit OFFSET :offset
-            """), {"limit": page_size, "offset": offset})
-            rows = result.fetchall()
+                LIMIT :limit {offset_clause}
+            """), params).fetchall()
+
+        # The count and the page run on separate connections at the same time
+        total_items, rows = await asyncio.gather(count_rows_async("products", count_mode), run_db(fetch_page))
         
+        rows, pagination = build_pagination(
+            rows, page_size, page, total_items, count_mode,
+            cursor_key=lambda r: (r[0],),
+        )
         products = [
             {
                 "product_id": r[0],
@@ -62,35 +184,109 @@ def get_products(
         ]
         return {
             "products": products,
+            "pagination": pagination
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100, description="Name, barcode, category or supplier text"),
+    page: int = Query(1, ge=1, description="Page number (starts at 1)"),
+    page_size: int = Query(20, ge=1, le=100, description="Number of results per page (max 100)"),
+):
+    """Search products by name, barcode prefix, category or supplier, best matches first"""
+    try:
+        q = q.strip()
+        if not q:
+            raise HTTPException(status_code=400, detail="Search text is required")
+        escaped = _like_escape(q)
+        params = {
+            "q": q,
+            "prefix": f"{escaped}%",
+            "contains": f"%{escaped}%",
+            "word_prefix": f"% {escaped}%",
+            "limit": page_size + 1,
+            "offset": (page - 1) * page_size,
+        }
+        query = SEARCH_QUERIES[(TRGM_AVAILABLE, len(q) >= SEARCH_MIN_FUZZY_LENGTH)]
+        rows = await run_db(lambda conn: conn.execute(query, params).fetchall())
+
+        has_next = len(rows) > page_size
+        results = []
+        for row in rows[:page_size]:
+            product = product_row_to_dict(row)
+            product["score"] = round(float(row[11]), 3)
+            results.append(product)
+        return {
+            "products": results,
             "pagination": {
                 "page": page,
                 "page_size": page_size,
-                "total_items": total_items,
-                "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_previous": page > 1
-            }
+                "total_items": None,
+                "total_pages": None,
+                "count_mode": "none",
+                "has_next": has_next,
+                "has_previous": page > 1,
+            },
+            "fuzzy": TRGM_AVAILABLE,
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _lookup_barcodes(codes: list) -> dict:
+    """{code: product or None}, from the barcode index where it is current"""
+    index = get_product_index()
+    found, stale = index.peek(codes)
+    if stale:
+        # Generations are read before the rows so a write in between revalidates again
+        generations = index.generations_for(stale)
+        rows = await run_db(lambda conn: index.fetch(conn, stale))
+        found.update(index.store(stale, rows, generations))
+    return found
+
+
+@router.get("/by-barcode/{code}")
+async def get_product_by_barcode(code: str):
+    """Get a single product by barcode (served from the in-memory index)"""
+    try:
+        product = (await _lookup_barcodes([code])).get(code)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/by-barcode")
+async def get_products_by_barcode(lookup: BarcodeLookup):
+    """Look up several barcodes at once, e.g. a till's scanned basket"""
+    try:
+        codes = list(dict.fromkeys(lookup.barcodes))
+        found = await _lookup_barcodes(codes)
+        return {
+            "products": [found[code] for code in codes if found.get(code)],
+            "not_found": [code for code in codes if not found.get(code)],
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/{product_id}")
-@async_route
-def get_product(product_id: int):
+async def get_product(product_id: int):
     """Get a single product by ID"""
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT p.product_id, p.name, p.barcode, p.price, p.stock_quantity, 
-                       p.low_stock_threshold, p.category_id, c.name as category, 
-                       p.supplier_id, s.name as supplier, p.cost_price
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.category_id
-                LEFT JOIN suppliers s ON p.supplier_id = s.supplier_id
-                WHERE p.product_id = :pid
-            """), {"pid": product_id})
-            row = result.fetchone()
+        row = await run_db(lambda conn: conn.execute(PRODUCT_QUERY, {"pid": product_id}).fetchone())
         
         if not row:
             raise HTTPException(status_code=404, detail="Product not found")
@@ -141,6 +337,7 @@ def add_product(
             })
             product_id = result.fetchone()[0]
 
+        publish_catalog_change("products")
         write_audit(
             action="INSERT",
             table_name="products",
@@ -155,6 +352,297 @@ def add_product(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+BULK_REQUIRED_COLUMNS = ("name", "barcode", "price", "stock_quantity", "category_id", "supplier_id")
+BULK_IMPORT_MAX_BYTES = 64 * 1024 * 1024
+BULK_IMPORT_MAX_ROWS = 200000
+# Rejected rows listed in the report; the rejected count always covers all of them
+BULK_IMPORT_MAX_ERRORS = 1000
+# Range of the integer columns (stock, threshold, category and supplier ids)
+BULK_INT_MIN, BULK_INT_MAX = -2**31, 2**31 - 1
+BULK_FORMATS = {
+    "csv": "csv",
+    "text/csv": "csv",
+    "ndjson": "ndjson",
+    "jsonl": "ndjson",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "ndjson",
+}
+
+# Which of the file's categories and suppliers exist, in one round trip
+BULK_REFERENCES_QUERY = text("""
+    SELECT 'category' AS kind, category_id AS id FROM categories WHERE category_id = ANY(CAST(:cids AS int[]))
+    UNION ALL
+    SELECT 'supplier' AS kind, supplier_id AS id FROM suppliers WHERE supplier_id = ANY(CAST(:sids AS int[]))
+""")
+
+BULK_EXISTING_QUERY = text("""
+    SELECT COUNT(*) FROM products WHERE barcode = ANY(CAST(:barcodes AS varchar[]))
+""")
+
+BULK_STAGE_TABLE_QUERY = text("""
+    CREATE TEMP TABLE product_import (
+        name VARCHAR(100), barcode VARCHAR(50), price NUMERIC(10,2), stock_quantity INT,
+        category_id INT, supplier_id INT, low_stock_threshold INT, cost_price NUMERIC(10,2)
+    ) ON COMMIT DROP
+""")
+
+BULK_COPY_SQL = """
+    COPY product_import (name, barcode, price, stock_quantity, category_id, supplier_id,
+                         low_stock_threshold, cost_price)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+# xmax is 0 only on rows this statement inserted, so one pass counts both outcomes.
+# Rows are upserted in barcode order so concurrent imports lock in the same order.
+BULK_UPSERT_QUERY = text("""
+    WITH upserted AS (
+        INSERT INTO products AS p (name, barcode, price, stock_quantity, category_id, supplier_id,
+                                   low_stock_threshold, cost_price)
+        SELECT name, barcode, price, stock_quantity, category_id, supplier_id, low_stock_threshold, cost_price
+        FROM product_import
+        ORDER BY barcode
+        ON CONFLICT (barcode) DO UPDATE
+        SET name = EXCLUDED.name,
+            price = EXCLUDED.price,
+            stock_quantity = EXCLUDED.stock_quantity,
+            category_id = EXCLUDED.category_id,
+            supplier_id = EXCLUDED.supplier_id,
+            low_stock_threshold = EXCLUDED.low_stock_threshold,
+            cost_price = EXCLUDED.cost_price
+        RETURNING (p.xmax = 0) AS inserted
+    )
+    SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+    FROM upserted
+""")
+
+
+def _parse_bulk_body(body: bytes, fmt: str):
+    """Yield (line number, record dict or None, parse error or None) for each data line"""
+    try:
+        content = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(content, newline=""))
+        missing = [c for c in BULK_REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"CSV header is missing columns: {', '.join(missing)}")
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line, raw in enumerate(content.splitlines(), start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            yield line, None, "Invalid JSON"
+            continue
+        if not isinstance(record, dict):
+            yield line, None, "Expected a JSON object"
+            continue
+        yield line, record, None
+
+
+def _bulk_field(record: dict, column: str, cast, required: bool = True):
+    value = record.get(column)
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"{column} is required")
+        return None
+    try:
+        if cast is int:
+            if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                raise ValueError
+            number = int(value)
+            # The columns are integer (int4); a larger value would fail the whole COPY
+            if not BULK_INT_MIN <= number <= BULK_INT_MAX:
+                raise ValueError
+            return number
+        if cast is float:
+            if isinstance(value, bool):
+                raise ValueError
+            number = float(value)
+            if not math.isfinite(number) or number < 0 or number >= 1e8:
+                raise ValueError
+            return round(number, 2)
+        # NDJSON can carry numbers, lists or objects; only text is taken as text
+        if not isinstance(value, str):
+            raise ValueError
+        return value
+    except (TypeError, ValueError, OverflowError):
+        kinds = {int: f"an integer between {BULK_INT_MIN} and {BULK_INT_MAX}",
+                 float: "a non-negative amount below 100000000"}
+        raise ValueError(f"{column} must be {kinds.get(cast, 'text')}")
+
+
+def _bulk_row(record: dict) -> tuple:
+    """Validated (name, barcode, price, stock, category, supplier, threshold, cost) or ValueError"""
+    name = _bulk_field(record, "name", str)
+    barcode = _bulk_field(record, "barcode", str)
+    price = _bulk_field(record, "price", float)
+    stock = _bulk_field(record, "stock_quantity", int)
+    category_id = _bulk_field(record, "category_id", int)
+    supplier_id = _bulk_field(record, "supplier_id", int)
+    threshold = _bulk_field(record, "low_stock_threshold", int, required=False)
+    cost_price = _bulk_field(record, "cost_price", float, required=False)
+    if len(name) > 100:
+        raise ValueError("name is longer than 100 characters")
+    if len(barcode) > 50:
+        raise ValueError("barcode is longer than 50 characters")
+    if stock < 0 or (threshold is not None and threshold < 0):
+        raise ValueError("stock_quantity and low_stock_threshold must not be negative")
+    return (
+        name,
+        barcode,
+        price,
+        stock,
+        category_id,
+        supplier_id,
+        threshold if threshold is not None else 10,
+        cost_price if cost_price is not None else round(price * 0.6, 2),
+    )
+
+
+def _import_products(body: bytes, fmt: str, dry_run: bool, authorization: Optional[str], request: Request) -> dict:
+    rows, errors = [], []
+    first_seen = {}
+    for line, record, error in _parse_bulk_body(body, fmt):
+        if len(rows) + len(errors) >= BULK_IMPORT_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"Import is limited to {BULK_IMPORT_MAX_ROWS} rows")
+        if error is None:
+            try:
+                row = _bulk_row(record)
+                if row[1] in first_seen:
+                    error = f"Duplicate barcode {row[1]} (first on line {first_seen[row[1]]})"
+                else:
+                    first_seen[row[1]] = line
+                    rows.append((line, row))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            errors.append({"line": line, "error": error})
+
+    if not rows and not errors:
+        raise HTTPException(status_code=400, detail="No rows to import")
+
+    inserted = updated = 0
+    with engine.begin() as conn:
+        known = {"category": set(), "supplier": set()}
+        for kind, id_ in conn.execute(BULK_REFERENCES_QUERY, {
+            "cids": sorted({row[4] for _, row in rows}),
+            "sids": sorted({row[5] for _, row in rows}),
+        }):
+            known[kind].add(id_)
+
+        valid = []
+        for line, row in rows:
+            if row[4] not in known["category"]:
+                errors.append({"line": line, "error": f"Category {row[4]} not found"})
+            elif row[5] not in known["supplier"]:
+                errors.append({"line": line, "error": f"Supplier {row[5]} not found"})
+            else:
+                valid.append(row)
+
+        if valid and dry_run:
+            existing = conn.execute(BULK_EXISTING_QUERY, {"barcodes": [row[1] for row in valid]}).scalar()
+            inserted, updated = len(valid) - existing, existing
+        elif valid:
+            conn.execute(BULK_STAGE_TABLE_QUERY)
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(valid)
+            buffer.seek(0)
+            # COPY through the psycopg2 cursor of this same transaction
+            cursor = conn.connection.cursor()
+            try:
+                cursor.copy_expert(BULK_COPY_SQL, buffer)
+            finally:
+                cursor.close()
+            inserted, updated = conn.execute(BULK_UPSERT_QUERY).fetchone()
+
+    errors.sort(key=lambda e: e["line"])
+    rejected = len(errors)
+
+    if valid and not dry_run:
+        publish_catalog_change("products")
+        # One summary audit row for the whole import
+        write_audit(
+            action="INSERT",
+            table_name="products",
+            new_values={
+                "bulk": True,
+                "format": fmt,
+                "rows": len(valid) + rejected,
+                "inserted": inserted,
+                "updated": updated,
+                "rejected": rejected,
+            },
+            actor=resolve_actor(authorization),
+            request=request,
+        )
+
+    verb = "would be" if dry_run else "were"
+    return {
+        "message": f"{inserted} {verb} inserted, {updated} {verb} updated, {rejected} rejected",
+        "dry_run": dry_run,
+        "format": fmt,
+        "rows": len(valid) + rejected,
+        "inserted": inserted,
+        "updated": updated,
+        "rejected": rejected,
+        "errors": errors[:BULK_IMPORT_MAX_ERRORS],
+        "errors_truncated": rejected > BULK_IMPORT_MAX_ERRORS,
+    }
+
+
+@router.post("/bulk")
+async def bulk_import_products(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format", description="csv or ndjson; defaults from Content-Type"),
+    dry_run: bool = Query(False, description="Validate and count inserts/updates without writing"),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Insert or update many products from a CSV or JSON-lines upload, matching on barcode.
+
+    Columns/keys are those of POST /api/products; barcode is required, and
+    low_stock_threshold and cost_price default as they do there. Every row is
+    validated (types, lengths, categories and suppliers exist, barcodes unique
+    within the file) and invalid rows are skipped and listed in the report.
+    Valid rows are COPYed into a temporary table and upserted with a single
+    statement in one transaction, with one summary audit row for the import.
+    """
+    try:
+        if fmt is None:
+            content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            fmt = BULK_FORMATS.get(content_type)
+        else:
+            fmt = BULK_FORMATS.get(fmt.lower())
+        if fmt is None:
+            raise HTTPException(
+                status_code=415,
+                detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson",
+            )
+        declared = request.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > BULK_IMPORT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Import file is too large")
+        body = await request.body()
+        if len(body) > BULK_IMPORT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Import file is too large")
+
+        # Parsing and the database work run off the event loop
+        return await run_blocking(_import_products, body, fmt, dry_run, authorization, request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.put("/{product_id}/stock")
 @async_route
 def update_stock(
@@ -182,6 +670,7 @@ def update_stock(
             if not updated:
                 raise HTTPException(status_code=404, detail="Product not found")
 
+        publish_product_changes([product_id], "products")
         write_audit(
             action="UPDATE",
             table_name="products",
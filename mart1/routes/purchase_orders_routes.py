@@ -3,42 +3,135 @@ Purchase order management routes
 """
 from fastapi import APIRouter, HTTPException, Query, Request, Header
 from sqlalchemy import text
-import math
+from datetime import date
 from typing import Optional
 
 from db import engine
+from cache_layer import publish_change
 from models import PurchaseOrder
+from product_index import publish_product_changes
 from routes.async_utils import async_route
 from routes.audit_helper import resolve_actor, write_audit
+from routes.pagination import build_pagination, count_rows, decode_cursor, keyset_condition, resolve_count_mode
 
 router = APIRouter(prefix="/api/purchase-orders", tags=["purchase-orders"])
 
 
+# Fetch the supplier and validate all ordered products in one query
+PO_VALIDATION_QUERY = text("""
+    SELECT 
+        s.supplier_id, 
+        s.category_id,
+        array_agg(DISTINCT p.product_id) as valid_product_ids,
+        array_agg(DISTINCT p.category_id) as product_categories
+    FROM suppliers s
+    LEFT JOIN products p ON p.product_id = ANY(CAST(:pids AS int[]))
+    WHERE s.supplier_id = :sid
+    GROUP BY s.supplier_id, s.category_id
+""")
+
+CATEGORY_NAMES_QUERY = text("""
+    SELECT c1.name, c2.name
+    FROM categories c1, categories c2
+    WHERE c1.category_id = :scid AND c2.category_id = :pcid
+""")
+
+# Insert the order and all of its items in one statement
+INSERT_PURCHASE_ORDER_QUERY = text("""
+    WITH new_order AS (
+        INSERT INTO purchase_orders (supplier_id, order_date, status)
+        VALUES (:supplier_id, CURRENT_TIMESTAMP, :status)
+        RETURNING order_id
+    ),
+    new_items AS (
+        INSERT INTO purchase_order_items (order_id, product_id, quantity, unit_price)
+        SELECT new_order.order_id, r.product_id, r.quantity, r.unit_price
+        FROM new_order,
+             unnest(CAST(:pids AS int[]), CAST(:qtys AS int[]), CAST(:prices AS numeric[]))
+                 AS r(product_id, quantity, unit_price)
+    )
+    SELECT order_id FROM new_order
+""")
+
+PURCHASE_ORDER_ITEMS_QUERY = text("""
+    SELECT poi.product_id, p.name, poi.quantity, poi.unit_price
+    FROM purchase_order_items poi
+    JOIN products p ON poi.product_id = p.product_id
+    WHERE poi.order_id = :oid
+""")
+
+# Add every item of the order to stock in one statement, locking the products
+# in product_id order like checkout does so the two cannot deadlock
+RECEIVE_STOCK_QUERY = text("""
+    WITH received AS (
+        SELECT product_id, SUM(quantity)::int AS quantity
+        FROM purchase_order_items
+        WHERE order_id = :oid
+        GROUP BY product_id
+    ),
+    locked AS (
+        SELECT p.product_id
+        FROM products p
+        JOIN received r ON r.product_id = p.product_id
+        ORDER BY p.product_id
+        FOR UPDATE OF p
+    )
+    UPDATE products p
+    SET stock_quantity = p.stock_quantity + r.quantity
+    FROM received r
+    JOIN locked l ON l.product_id = r.product_id
+    WHERE p.product_id = r.product_id
+    RETURNING p.product_id
+""")
+
+MARK_RECEIVED_QUERY = text("""
+    UPDATE purchase_orders 
+    SET status = 'RECEIVED'
+    WHERE order_id = :oid
+""")
+
+
 @router.get("")
 @async_route
 def get_purchase_orders(
     page: int = Query(1, ge=1, description="Page number (starts at 1)"),
-    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)")
+    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)"),
+    after: Optional[str] = Query(None, description="Cursor from pagination.next_cursor; replaces page"),
+    count: Optional[str] = Query(None, description="Total count: exact, estimate, cached or none")
 ):
-    """Get all purchase orders with pagination"""
+    """Get all purchase orders by page number or keyset cursor"""
     try:
+        count_mode = resolve_count_mode(count, after is not None)
+        params = {"limit": page_size + 1}
+        where_clause = ""
+        offset_clause = ""
+        if after is not None:
+            cursor = decode_cursor(after, (date.fromisoformat, int))
+            condition, cursor_params = keyset_condition("po.order_date", "po.order_id", cursor)
+            where_clause = f"WHERE {condition}"
+            params.update(cursor_params)
+            page = None
+        else:
+            offset_clause = "OFFSET :offset"
+            params["offset"] = (page - 1) * page_size
+
         with engine.connect() as conn:
-            # Get total count
-            count_result = conn.execute(text("SELECT COUNT(*) FROM purchase_orders"))
-            total_items = count_result.fetchone()[0]
-            
-            # Calculate pagination
-            offset = (page - 1) * page_size
-            total_pages = math.ceil(total_items / page_size)
-            
-            result = conn.execute(text("""
+            total_items = count_rows(conn, "purchase_orders", count_mode)
+
+            result = conn.execute(text(f"""
                 SELECT po.order_id, po.order_date, po.status, s.name as supplier_name
                 FROM purchase_orders po
                 JOIN suppliers s ON po.supplier_id = s.supplier_id
-                ORDER BY po.order_date DESC
-                LIMIT :limit OFFSET :offset
-            """), {"limit": page_size, "offset": offset})
+                {where_clause}
+                ORDER BY po.order_date DESC, po.order_id DESC
+                LIMIT :limit {offset_clause}
+            """), params)
             rows = result.fetchall()
+
+        rows, pagination = build_pagination(
+            rows, page_size, page, total_items, count_mode,
+            cursor_key=lambda r: (r[1], r[0]),
+        )
         
         orders = [
             {
@@ -51,15 +144,10 @@ def get_purchase_orders(
         ]
         return {
             "purchase_orders": orders,
-            "pagination": {
-                "page": page,
-                "page_size": page_size,
-                "total_items": total_items,
-                "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_previous": page > 1
-            }
+            "pagination": pagination
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -74,20 +162,8 @@ def create_purchase_order(
     """Create a new purchase order"""
     try:
         with engine.begin() as conn:
-            # OPTIMIZED: Fetch supplier AND validate all products at once (was N+1 queries)
             product_ids = [item.get('product_id') for item in order.items]
-            validation_query = f"""
-                SELECT 
-                    s.supplier_id, 
-                    s.category_id,
-                    array_agg(DISTINCT p.product_id) as valid_product_ids,
-                    array_agg(DISTINCT p.category_id) as product_categories
-                FROM suppliers s
-                LEFT JOIN products p ON p.product_id = ANY(ARRAY[{','.join(map(str, product_ids))}])
-                WHERE s.supplier_id = :sid
-                GROUP BY s.supplier_id, s.category_id
-            """
-            supplier_result = conn.execute(text(validation_query), {"sid": order.supplier_id})
+            supplier_result = conn.execute(PO_VALIDATION_QUERY, {"pids": product_ids, "sid": order.supplier_id})
             supplier_row = supplier_result.fetchone()
             
             if not supplier_row:
@@ -104,42 +180,25 @@ def create_purchase_order(
                 if product_categories and None not in product_categories:
                     for pid, pcat in zip(valid_product_ids, product_categories):
                         if pcat != supplier_category_id:
-                            cat_result = conn.execute(text("""
-                                SELECT c1.name, c2.name
-                                FROM categories c1, categories c2
-                                WHERE c1.category_id = :scid AND c2.category_id = :pcid
-                            """), {"scid": supplier_category_id, "pcid": pcat})
+                            cat_result = conn.execute(CATEGORY_NAMES_QUERY, {"scid": supplier_category_id, "pcid": pcat})
                             cat_names = cat_result.fetchone()
                             raise HTTPException(
                                 status_code=400,
                                 detail=f"Supplier category mismatch: This supplier is registered for '{cat_names[0]}' but product belongs to '{cat_names[1]}'. Suppliers can only supply products in their registered category."
                             )
             
-            # Create purchase order
-            result = conn.execute(text("""
-                INSERT INTO purchase_orders (supplier_id, order_date, status)
-                VALUES (:supplier_id, CURRENT_TIMESTAMP, :status)
-                RETURNING order_id
-            """), {
+            # Create the purchase order with all of its items
+            result = conn.execute(INSERT_PURCHASE_ORDER_QUERY, {
                 "supplier_id": order.supplier_id,
-                "status": order.status
+                "status": order.status,
+                "pids": product_ids,
+                "qtys": [item.get('quantity') for item in order.items],
+                "prices": [item.get('unit_price') for item in order.items],
             })
             order_id = result.fetchone()[0]
-            
-            # OPTIMIZED: Bulk insert all order items
-            total_amount = 0
-            for item in order.items:
-                conn.execute(text("""
-                    INSERT INTO purchase_order_items (order_id, product_id, quantity, unit_price)
-                    VALUES (:order_id, :product_id, :quantity, :unit_price)
-                """), {
-                    "order_id": order_id,
-                    "product_id": item.get('product_id'),
-                    "quantity": item.get('quantity'),
-                    "unit_price": item.get('unit_price')
-                })
-                total_amount += item.get('quantity') * item.get('unit_price')
+            total_amount = sum(item.get('quantity') * item.get('unit_price') for item in order.items)
 
+        publish_change("purchase_orders", "purchase_order_items")
         write_audit(
             action="INSERT",
             table_name="purchase_orders",
@@ -168,12 +227,7 @@ def get_purchase_order_details(order_id: int):
     """Get details of a specific purchase order"""
     try:
         with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT poi.product_id, p.name, poi.quantity, poi.unit_price
-                FROM purchase_order_items poi
-                JOIN products p ON poi.product_id = p.product_id
-                WHERE poi.order_id = :oid
-            """), {"oid": order_id})
+            result = conn.execute(PURCHASE_ORDER_ITEMS_QUERY, {"oid": order_id})
             rows = result.fetchall()
         
         items = [
@@ -200,29 +254,14 @@ def receive_purchase_order(
     """Receive a purchase order and update stock"""
     try:
         with engine.begin() as conn:
-            result = conn.execute(text("""
-                SELECT poi.product_id, poi.quantity
-                FROM purchase_order_items poi
-                WHERE poi.order_id = :oid
-            """), {"oid": order_id})
-            items = result.fetchall()
+            items = conn.execute(RECEIVE_STOCK_QUERY, {"oid": order_id}).fetchall()
             
             if not items:
                 raise HTTPException(status_code=404, detail="Purchase order not found")
             
-            for product_id, quantity in items:
-                conn.execute(text("""
-                    UPDATE products 
-                    SET stock_quantity = stock_quantity + :qty
-                    WHERE product_id = :pid
-                """), {"qty": quantity, "pid": product_id})
-            
-            conn.execute(text("""
-                UPDATE purchase_orders 
-                SET status = 'RECEIVED'
-                WHERE order_id = :oid
-            """), {"oid": order_id})
+            conn.execute(MARK_RECEIVED_QUERY, {"oid": order_id})
 
+        publish_product_changes([r[0] for r in items], "purchase_orders", "products")
         write_audit(
             action="UPDATE",
             table_name="purchase_orders",
@@ -5,6 +5,8 @@ from fastapi import APIRouter, HTTPException, Query
 from sqlalchemy import text
 
 from db import engine
+from rollups import get_daily_sales, get_monthly_revenue, get_sales_summary
+from report_views import REPORT_VIEWS, get_report_view_status, read_report_view, refresh_report_views
 from routes.async_utils import async_route
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
@@ -16,24 +18,7 @@ def get_sales_by_date(days: int = 7):
     try:
         with engine.connect() as conn:
             # If days is 0, get all time sales; otherwise get sales from the last N days
-            if days == 0:
-                query = """
-                    SELECT DATE(sale_time) as sale_date, COUNT(*) as count, SUM(total_amount) as total
-                    FROM sales
-                    GROUP BY DATE(sale_time)
-                    ORDER BY sale_date ASC
-                """
-                result = conn.execute(text(query))
-            else:
-                query = """
-                    SELECT DATE(sale_time) as sale_date, COUNT(*) as count, SUM(total_amount) as total
-                    FROM sales
-                    WHERE sale_time >= CURRENT_DATE - CAST(:days || ' days' AS INTERVAL)
-                    GROUP BY DATE(sale_time)
-                    ORDER BY sale_date ASC
-                """
-                result = conn.execute(text(query), {"days": days})
-            rows = result.fetchall()
+            rows = get_daily_sales(conn, days)
 
         data = [
             {"date": str(r[0]), "count": r[1], "total": float(r[2]) if r[2] else 0}
@@ -50,23 +35,7 @@ def get_dashboard_data(days: int = 7):
     try:
         with engine.connect() as conn:
             # If days is 0, get all time sales; otherwise get sales from the last N days
-            if days == 0:
-                sales_query = """
-                    SELECT DATE(sale_time) as date, COUNT(*) as count, SUM(total_amount) as total
-                    FROM sales
-                    GROUP BY DATE(sale_time)
-                    ORDER BY date ASC
-                """
-                sales_by_date = conn.execute(text(sales_query))
-            else:
-                sales_query = f"""
-                    SELECT DATE(sale_time) as date, COUNT(*) as count, SUM(total_amount) as total
-                    FROM sales
-                    WHERE sale_time >= CURRENT_DATE - CAST('{days}' AS INTEGER || ' days')::INTERVAL
-                    GROUP BY DATE(sale_time)
-                    ORDER BY date ASC
-                """
-                sales_by_date = conn.execute(text(sales_query))
+            sales_by_date = get_daily_sales(conn, days)
                 
             sales_data = [
                 {"date": str(r[0]), "count": r[1], "total": float(r[2]) if r[2] else 0}
@@ -171,31 +140,14 @@ def get_top_products(limit: int = 5):
 def get_all_time_analysis():
     try:
         with engine.connect() as conn:
-            all_time_revenue = conn.execute(text("""
-                SELECT COALESCE(SUM(total_amount), 0) as total_revenue
-                FROM sales
-            """)).scalar()
-
-            all_time_transactions = conn.execute(text("""
-                SELECT COUNT(*) as total_transactions
-                FROM sales
-            """)).scalar()
-
-            avg_transaction_value = conn.execute(text("""
-                SELECT COALESCE(AVG(total_amount), 0) as avg_value
-                FROM sales
-            """)).scalar()
-
-            monthly_revenue_result = conn.execute(text("""
-                SELECT TO_CHAR(sale_time, 'YYYY-MM') as month, COALESCE(SUM(total_amount), 0) as revenue
-                FROM sales
-                GROUP BY TO_CHAR(sale_time, 'YYYY-MM')
-                ORDER BY month DESC
-                LIMIT 12
-            """))
+            totals = get_sales_summary(conn, 0)
+            all_time_revenue = totals["revenue"]
+            all_time_transactions = totals["sale_count"]
+            avg_transaction_value = all_time_revenue / all_time_transactions if all_time_transactions else 0
+
             monthly_revenue = [
                 {"month": r[0], "revenue": float(r[1]) if r[1] else 0}
-                for r in monthly_revenue_result.fetchall()
+                for r in get_monthly_revenue(conn, 12)
             ]
 
         return {
@@ -205,4 +157,59 @@ def get_all_time_analysis():
             "monthly_revenue": monthly_revenue
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/summaries")
+@async_route
+def get_report_summaries():
+    """List the materialized report summaries and when each was last refreshed"""
+    try:
+        with engine.connect() as conn:
+            status = get_report_view_status(conn)
+        return {"summaries": {name: status.get(name) for name in REPORT_VIEWS}}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/summaries/refresh")
+@async_route
+def refresh_report_summaries(name: str = Query(None, description="Summary to refresh; all when omitted")):
+    """Refresh the report summaries now instead of waiting for the scheduled refresh"""
+    try:
+        if name is not None and name not in REPORT_VIEWS:
+            raise HTTPException(status_code=404, detail="Report summary not found")
+        results = refresh_report_views([name] if name else None)
+        with engine.connect() as conn:
+            status = get_report_view_status(conn, name)
+        return {"results": results, "summaries": status}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/summaries/{name}")
+@async_route
+def get_report_summary(
+    name: str,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """Rows of one report summary with the time it was last refreshed"""
+    try:
+        if name not in REPORT_VIEWS:
+            raise HTTPException(status_code=404, detail="Report summary not found")
+        with engine.connect() as conn:
+            rows = read_report_view(conn, name, limit, offset)
+            status = get_report_view_status(conn, name).get(name) or {}
+        return {
+            "name": name,
+            "data": rows,
+            "refreshed_at": str(status["refreshed_at"]) if status.get("refreshed_at") else None,
+            "age_seconds": status.get("age_seconds"),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,19 +1,85 @@
 """
 Sales management routes
 """
+import asyncio
 from fastapi import APIRouter, HTTPException, Query, Request, Header
 from sqlalchemy import text
-import math
+from datetime import datetime
 from typing import Optional
 
 from db import engine
-from models import Sale
-from routes.async_utils import async_route
+from product_index import publish_product_changes
+from rollups import apply_backdated_sales
+from models import Sale, SaleBatch
+from routes.async_utils import async_route, run_db
 from routes.audit_helper import resolve_actor, write_audit
+from routes.pagination import build_pagination, count_rows_async, decode_cursor, keyset_condition, resolve_count_mode
 
 router = APIRouter(prefix="/api/sales", tags=["sales"])
 
 
+# Validate the employee (and customer, if given) in one query
+SALE_ACTORS_QUERY = text("""
+    SELECT 
+        CASE WHEN c.customer_id IS NOT NULL OR :cid IS NULL THEN 1 ELSE 0 END as customer_valid,
+        e.username,
+        e.role
+    FROM employees e
+    LEFT JOIN customers c ON c.customer_id = :cid
+    WHERE e.employee_id = :eid
+""")
+
+# Lock the cart's products in product_id order (so concurrent checkouts cannot
+# deadlock) and decrement stock only where enough is left. Rows that come back
+# are the products that were decremented, with their current price.
+RESERVE_STOCK_QUERY = text("""
+    WITH requested AS (
+        SELECT product_id, SUM(quantity)::int AS quantity
+        FROM unnest(CAST(:pids AS int[]), CAST(:qtys AS int[])) AS r(product_id, quantity)
+        GROUP BY product_id
+    ),
+    locked AS (
+        SELECT p.product_id
+        FROM products p
+        JOIN requested r ON r.product_id = p.product_id
+        ORDER BY p.product_id
+        FOR UPDATE OF p
+    )
+    UPDATE products p
+    SET stock_quantity = p.stock_quantity - r.quantity
+    FROM requested r
+    JOIN locked l ON l.product_id = r.product_id
+    WHERE p.product_id = r.product_id
+      AND p.stock_quantity >= r.quantity
+    RETURNING p.product_id, p.price
+""")
+
+# Explains a failed reservation; runs in the same transaction before rollback
+STOCK_SHORTFALL_QUERY = text("""
+    SELECT product_id, name, stock_quantity
+    FROM products
+    WHERE product_id = ANY(CAST(:pids AS int[]))
+""")
+
+# Insert the sale and all of its items in one statement
+INSERT_SALE_QUERY = text("""
+    WITH new_sale AS (
+        INSERT INTO sales (total_amount, payment_method, customer_id, employee_id, 
+                           discount_percentage, customer_rating, feedback, sale_time)
+        VALUES (:total, :pm, :cid, :eid, :discount, :rating, :feedback, CURRENT_TIMESTAMP)
+        RETURNING sale_id
+    ),
+    new_items AS (
+        INSERT INTO sale_items (sale_id, product_id, quantity, unit_price)
+        SELECT new_sale.sale_id, r.product_id, r.quantity, r.unit_price
+        FROM new_sale,
+             unnest(CAST(:pids AS int[]), CAST(:qtys AS int[]), CAST(:prices AS numeric[]))
+                 AS r(product_id, quantity, unit_price)
+    )
+    SELECT sale_id FROM new_sale
+""")
+
+
 @router.post("")
 @async_route
 def create_sale(
@@ -21,58 +87,26 @@ def create_sale(
     request: Request,
     authorization: Optional[str] = Header(None),
 ):
-    """Create a new sale transaction"""
+    """
+    Create a new sale transaction.
+
+    Validation, the guarded stock decrement and the sale/item inserts run in
+    one transaction with three statements whatever the cart size; stock is
+    checked and decremented under row locks, so concurrent sales cannot
+    oversell.
+    """
     try:
-        total = 0.0
-        cart = []
-        
-        with engine.connect() as conn:
-            # OPTIMIZED: Fetch ALL products at once instead of 1 per item (N+1 elimination)
-            product_ids = [item.product_id for item in sale.items]
-            products_query = f"""
-                SELECT product_id, name, price, stock_quantity
-                FROM products
-                WHERE product_id = ANY(ARRAY[{','.join(map(str, product_ids))}])
-            """
-            products_result = conn.execute(text(products_query))
-            products_map = {r[0]: {'name': r[1], 'price': r[2], 'stock': r[3]} for r in products_result}
-            
-            # Validate stock for all items
-            for item in sale.items:
-                if item.product_id not in products_map:
-                    raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-                
-                product_data = products_map[item.product_id]
-                if product_data['stock'] < item.quantity:
-                    raise HTTPException(status_code=400, detail=f"Only {product_data['stock']} units in stock for {product_data['name']}")
-                
-                item_total = float(product_data['price']) * item.quantity
-                cart.append({
-                    'product_id': item.product_id,
-                    'quantity': item.quantity,
-                    'price': float(product_data['price']),
-                    'subtotal': item_total
-                })
-                total += item_total
-        
-        # Apply discount if provided
-        discount_amount = 0
-        if sale.discount_percentage and sale.discount_percentage > 0:
-            discount_amount = total * (sale.discount_percentage / 100)
-            total = total - discount_amount
-        
+        if not sale.items:
+            raise HTTPException(status_code=400, detail="Sale must contain at least one item")
+
+        product_ids = [item.product_id for item in sale.items]
+        quantities = [item.quantity for item in sale.items]
+        requested = {}
+        for item in sale.items:
+            requested[item.product_id] = requested.get(item.product_id, 0) + item.quantity
+
         with engine.begin() as conn:
-            # OPTIMIZED: Validate customer AND get employee info in ONE query (was 2 separate queries)
-            validation_query = """
-                SELECT 
-                    CASE WHEN c.customer_id IS NOT NULL OR :cid IS NULL THEN 1 ELSE 0 END as customer_valid,
-                    e.username,
-                    e.role
-                FROM employees e
-                LEFT JOIN customers c ON c.customer_id = :cid
-                WHERE e.employee_id = :eid
-            """
-            validation = conn.execute(text(validation_query), {"cid": sale.customer_id, "eid": sale.employee_id}).fetchone()
+            validation = conn.execute(SALE_ACTORS_QUERY, {"cid": sale.customer_id, "eid": sale.employee_id}).fetchone()
             
             if not validation:
                 raise HTTPException(status_code=404, detail="Employee not found")
@@ -82,50 +116,55 @@ def create_sale(
             
             emp_username = validation[1] if validation[1] else "unknown"
             emp_role = validation[2] if validation[2] else "unknown"
-            
-            result = conn.execute(text("""
-                INSERT INTO sales (total_amount, payment_method, customer_id, employee_id, 
-                                   discount_percentage, customer_rating, feedback, sale_time)
-                VALUES (:total, :pm, :cid, :eid, :discount, :rating, :feedback, CURRENT_TIMESTAMP)
-                RETURNING sale_id
-            """), {
+
+            reserved = conn.execute(RESERVE_STOCK_QUERY, {"pids": product_ids, "qtys": quantities}).fetchall()
+            prices = {r[0]: float(r[1]) for r in reserved}
+
+            if len(prices) < len(requested):
+                # Raising rolls back the decrements that did succeed
+                stock = {
+                    r[0]: {"name": r[1], "stock": r[2]}
+                    for r in conn.execute(STOCK_SHORTFALL_QUERY, {"pids": list(requested)})
+                }
+                for product_id in requested:
+                    if product_id in prices:
+                        continue
+                    if product_id not in stock:
+                        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+                    product_data = stock[product_id]
+                    raise HTTPException(status_code=400, detail=f"Only {product_data['stock']} units in stock for {product_data['name']}")
+
+            total = 0.0
+            cart = []
+            for item in sale.items:
+                item_total = prices[item.product_id] * item.quantity
+                cart.append({
+                    'product_id': item.product_id,
+                    'quantity': item.quantity,
+                    'price': prices[item.product_id],
+                    'subtotal': item_total
+                })
+                total += item_total
+
+            # Apply discount if provided
+            if sale.discount_percentage and sale.discount_percentage > 0:
+                discount_amount = total * (sale.discount_percentage / 100)
+                total = total - discount_amount
+
+            sale_id = conn.execute(INSERT_SALE_QUERY, {
                 "total": round(total, 2),
                 "pm": sale.payment_method,
                 "cid": sale.customer_id,
                 "eid": sale.employee_id,
                 "discount": sale.discount_percentage,
                 "rating": sale.customer_rating,
-                "feedback": sale.feedback
-            })
-            sale_id = result.fetchone()[0]
-            
-            # OPTIMIZED: Bulk insert all sale items (still using loop but in single transaction)
-            for item in cart:
-                conn.execute(text("""
-                    INSERT INTO sale_items (sale_id, product_id, quantity, unit_price)
-                    VALUES (:sale_id, :pid, :qty, :price)
-                """), {
-                    "sale_id": sale_id,
-                    "pid": item['product_id'],
-                    "qty": item['quantity'],
-                    "price": item['price']
-                })
-            
-            # OPTIMIZED: Bulk update stock using CASE instead of loop (N queries -> 1 query)
-            case_statement = " ".join([
-                f"WHEN {item['product_id']} THEN stock_quantity - {item['quantity']}"
-                for item in cart
-            ])
-            update_query = f"""
-                UPDATE products
-                SET stock_quantity = CASE product_id
-                    {case_statement}
-                    ELSE stock_quantity
-                END
-                WHERE product_id = ANY(ARRAY[{','.join(map(str, [item['product_id'] for item in cart]))}])
-            """
-            conn.execute(text(update_query))
+                "feedback": sale.feedback,
+                "pids": product_ids,
+                "qtys": quantities,
+                "prices": [item['price'] for item in cart],
+            }).scalar()
             
+        publish_product_changes(requested, "sales", "sale_items", "products")
         actor = resolve_actor(authorization, employee_id=sale.employee_id, username=emp_username, role=emp_role)
         write_audit(
             action="INSERT",
@@ -151,35 +190,253 @@ def create_sale(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("")
+PAYMENT_METHODS = {"CASH", "CARD", "UPI", "WALLET"}
+
+# Which of the batch's employees and customers exist, in one round trip
+BATCH_ACTORS_QUERY = text("""
+    SELECT 'employee' AS kind, employee_id AS id FROM employees WHERE employee_id = ANY(CAST(:eids AS int[]))
+    UNION ALL
+    SELECT 'customer' AS kind, customer_id AS id FROM customers WHERE customer_id = ANY(CAST(:cids AS int[]))
+""")
+
+# Lock every product the batch touches, in product_id order
+BATCH_PRODUCTS_QUERY = text("""
+    SELECT product_id, name, price, stock_quantity
+    FROM products
+    WHERE product_id = ANY(CAST(:pids AS int[]))
+    ORDER BY product_id
+    FOR UPDATE
+""")
+
+RESERVE_SALE_IDS_QUERY = text("""
+    SELECT nextval(pg_get_serial_sequence('sales', 'sale_id'))
+    FROM generate_series(1, :n)
+""")
+
+BATCH_INSERT_SALES_QUERY = text("""
+    INSERT INTO sales (sale_id, total_amount, payment_method, customer_id, employee_id,
+                       discount_percentage, customer_rating, feedback, sale_time)
+    SELECT r.sale_id, r.total, r.pm, r.cid, r.eid, r.discount, r.rating, r.feedback,
+           COALESCE(r.sale_time, CURRENT_TIMESTAMP)
+    FROM unnest(
+        CAST(:sale_ids AS int[]), CAST(:totals AS numeric[]), CAST(:pms AS text[]),
+        CAST(:cids AS int[]), CAST(:eids AS int[]), CAST(:discounts AS numeric[]),
+        CAST(:ratings AS numeric[]), CAST(:feedbacks AS text[]), CAST(:sale_times AS timestamp[])
+    ) AS r(sale_id, total, pm, cid, eid, discount, rating, feedback, sale_time)
+""")
+
+BATCH_INSERT_ITEMS_QUERY = text("""
+    INSERT INTO sale_items (sale_id, product_id, quantity, unit_price)
+    SELECT r.sale_id, r.product_id, r.quantity, r.unit_price
+    FROM unnest(
+        CAST(:sale_ids AS int[]), CAST(:pids AS int[]), CAST(:qtys AS int[]), CAST(:prices AS numeric[])
+    ) AS r(sale_id, product_id, quantity, unit_price)
+""")
+
+# One decrement per product for the whole batch
+BATCH_DECREMENT_STOCK_QUERY = text("""
+    UPDATE products p
+    SET stock_quantity = p.stock_quantity - d.quantity
+    FROM unnest(CAST(:pids AS int[]), CAST(:qtys AS int[])) AS d(product_id, quantity)
+    WHERE p.product_id = d.product_id
+""")
+
+
+@router.post("/batch")
 @async_route
-def get_sales(
+def create_sales_batch(
+    batch: SaleBatch,
+    request: Request,
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Ingest many sales at once (e.g. queued by a till while offline).
+
+    Employees, customers and products are validated with set-based queries,
+    the products are locked once, and stock is allocated to sales in upload
+    order. Valid sales are inserted with multi-row statements in a single
+    transaction and stock is decremented once per product; invalid sales are
+    skipped and reported in the per-sale results.
+    """
+    try:
+        sales = batch.sales
+        employee_ids = sorted({s.employee_id for s in sales})
+        customer_ids = sorted({s.customer_id for s in sales if s.customer_id is not None})
+        product_ids = sorted({item.product_id for s in sales for item in s.items})
+
+        results = [None] * len(sales)
+        accepted = []
+
+        with engine.begin() as conn:
+            known = {"employee": set(), "customer": set()}
+            for kind, id_ in conn.execute(BATCH_ACTORS_QUERY, {"eids": employee_ids, "cids": customer_ids}):
+                known[kind].add(id_)
+
+            products = {
+                r[0]: {"name": r[1], "price": float(r[2]), "stock": r[3]}
+                for r in conn.execute(BATCH_PRODUCTS_QUERY, {"pids": product_ids})
+            }
+            remaining = {pid: p["stock"] for pid, p in products.items()}
+
+            for index, sale in enumerate(sales):
+                error = None
+                requested = {}
+                for item in sale.items:
+                    requested[item.product_id] = requested.get(item.product_id, 0) + item.quantity
+
+                if not sale.items:
+                    error = "Sale must contain at least one item"
+                elif sale.employee_id not in known["employee"]:
+                    error = "Employee not found"
+                elif sale.customer_id is not None and sale.customer_id not in known["customer"]:
+                    error = "Customer not found"
+                elif sale.payment_method not in PAYMENT_METHODS:
+                    error = f"Invalid payment method {sale.payment_method}"
+                elif any(item.quantity <= 0 for item in sale.items):
+                    error = "Item quantities must be positive"
+                else:
+                    for product_id, quantity in requested.items():
+                        if product_id not in products:
+                            error = f"Product {product_id} not found"
+                            break
+                        if remaining[product_id] < quantity:
+                            error = f"Only {remaining[product_id]} units in stock for {products[product_id]['name']}"
+                            break
+
+                if error:
+                    results[index] = {"index": index, "client_ref": sale.client_ref, "status": "failed", "error": error}
+                    continue
+
+                for product_id, quantity in requested.items():
+                    remaining[product_id] -= quantity
+
+                total = sum(products[item.product_id]["price"] * item.quantity for item in sale.items)
+                if sale.discount_percentage and sale.discount_percentage > 0:
+                    total = total - total * (sale.discount_percentage / 100)
+                accepted.append((index, sale, total))
+
+            if accepted:
+                sale_ids = [r[0] for r in conn.execute(RESERVE_SALE_IDS_QUERY, {"n": len(accepted)})]
+
+                conn.execute(BATCH_INSERT_SALES_QUERY, {
+                    "sale_ids": sale_ids,
+                    "totals": [round(total, 2) for _, _, total in accepted],
+                    "pms": [sale.payment_method for _, sale, _ in accepted],
+                    "cids": [sale.customer_id for _, sale, _ in accepted],
+                    "eids": [sale.employee_id for _, sale, _ in accepted],
+                    "discounts": [sale.discount_percentage for _, sale, _ in accepted],
+                    "ratings": [sale.customer_rating for _, sale, _ in accepted],
+                    "feedbacks": [sale.feedback for _, sale, _ in accepted],
+                    "sale_times": [sale.sale_time for _, sale, _ in accepted],
+                })
+
+                item_rows = [
+                    (sale_id, item.product_id, item.quantity, products[item.product_id]["price"])
+                    for sale_id, (_, sale, _) in zip(sale_ids, accepted)
+                    for item in sale.items
+                ]
+                conn.execute(BATCH_INSERT_ITEMS_QUERY, {
+                    "sale_ids": [r[0] for r in item_rows],
+                    "pids": [r[1] for r in item_rows],
+                    "qtys": [r[2] for r in item_rows],
+                    "prices": [r[3] for r in item_rows],
+                })
+                # Uploads dated inside days the rollup already closed
+                apply_backdated_sales(conn, sale_ids)
+
+                decrements = {pid: products[pid]["stock"] - left for pid, left in remaining.items()
+                              if products[pid]["stock"] != left}
+                conn.execute(BATCH_DECREMENT_STOCK_QUERY, {
+                    "pids": list(decrements),
+                    "qtys": list(decrements.values()),
+                })
+
+                for sale_id, (index, sale, total) in zip(sale_ids, accepted):
+                    results[index] = {
+                        "index": index,
+                        "client_ref": sale.client_ref,
+                        "status": "created",
+                        "sale_id": sale_id,
+                        "total": total,
+                    }
+
+        created = len(accepted)
+        failed = len(sales) - created
+
+        publish_product_changes(
+            {item.product_id for _, sale, _ in accepted for item in sale.items},
+            "sales", "sale_items", "products",
+        )
+        # One summary audit row for the whole upload
+        actor = resolve_actor(authorization)
+        write_audit(
+            action="INSERT",
+            table_name="sales",
+            new_values={
+                "batch": True,
+                "created": created,
+                "failed": failed,
+                "sale_ids": [r["sale_id"] for r in results if r["status"] == "created"],
+            },
+            actor=actor,
+            request=request,
+        )
+
+        return {
+            "message": f"{created} of {len(sales)} sales created",
+            "created": created,
+            "failed": failed,
+            "results": results,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("")
+async def get_sales(
     page: int = Query(1, ge=1, description="Page number (starts at 1)"),
-    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)")
+    page_size: int = Query(50, ge=1, le=500, description="Number of items per page (max 500)"),
+    after: Optional[str] = Query(None, description="Cursor from pagination.next_cursor; replaces page"),
+    count: Optional[str] = Query(None, description="Total count: exact, estimate, cached or none")
 ):
-    """Get all sales with pagination"""
+    """Get all sales, newest first, by page number or keyset cursor"""
     try:
-        with engine.connect() as conn:
-            # Get total count
-            count_result = conn.execute(text("SELECT COUNT(*) FROM sales"))
-            total_items = count_result.fetchone()[0]
-            
-            # Calculate pagination
-            offset = (page - 1) * page_size
-            total_pages = math.ceil(total_items / page_size)
-            
-            result = conn.execute(text("""
+        count_mode = resolve_count_mode(count, after is not None)
+        params = {"limit": page_size + 1}
+        where_clause = ""
+        offset_clause = ""
+        if after is not None:
+            cursor = decode_cursor(after, (datetime.fromisoformat, int))
+            condition, cursor_params = keyset_condition("s.sale_time", "s.sale_id", cursor)
+            where_clause = f"WHERE {condition}"
+            params.update(cursor_params)
+            page = None
+        else:
+            offset_clause = "OFFSET :offset"
+            params["offset"] = (page - 1) * page_size
+
+        def fetch_page(conn):
+            return conn.execute(text(f"""
                 SELECT s.sale_id, s.sale_time, s.total_amount, s.payment_method, 
                        c.name as customer, e.name as employee,
                        s.discount_percentage, s.customer_rating, s.feedback
                 FROM sales s
                 LEFT JOIN customers c ON s.customer_id = c.customer_id
                 LEFT JOIN employees e ON s.employee_id = e.employee_id
-                ORDER BY s.sale_time DESC
-                LIMIT :limit OFFSET :offset
-            """), {"limit": page_size, "offset": offset})
-            rows = result.fetchall()
-        
+                {where_clause}
+                ORDER BY s.sale_time DESC, s.sale_id DESC
+                LIMIT :limit {offset_clause}
+            """), params).fetchall()
+
+        # The count and the page run on separate connections at the same time
+        total_items, rows = await asyncio.gather(count_rows_async("sales", count_mode), run_db(fetch_page))
+
+        rows, pagination = build_pagination(
+            rows, page_size, page, total_items, count_mode,
+            cursor_key=lambda r: (r[1], r[0]),
+        )
         sales = [
             {
                 "sale_id": r[0],
@@ -196,15 +453,10 @@ def get_sales(
         ]
         return {
             "sales": sales,
-            "pagination": {
-                "page": page,
-                "page_size": page_size,
-                "total_items": total_items,
-                "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_previous": page > 1
-            }
+            "pagination": pagination
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
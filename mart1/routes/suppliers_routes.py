@@ -7,6 +7,7 @@ import math
 from typing import Optional
 
 from db import engine
+from cache_layer import publish_change
 from models import Supplier
 from routes.async_utils import async_route
 from routes.audit_helper import model_to_dict, resolve_actor, write_audit
@@ -86,6 +87,7 @@ def add_supplier(
                 "category_id": supplier.category_id
             })
             supplier_id = result.fetchone()[0]
+        publish_change("suppliers")
         write_audit(
             action="INSERT",
             table_name="suppliers",
@@ -125,6 +127,7 @@ def update_supplier(
             })
             if not result.fetchone():
                 raise HTTPException(status_code=404, detail="Supplier not found")
+        publish_change("suppliers")
         write_audit(
             action="UPDATE",
             table_name="suppliers",
@@ -153,6 +156,7 @@ def delete_supplier(
             result = conn.execute(text("DELETE FROM suppliers WHERE supplier_id = :sid RETURNING supplier_id"), {"sid": supplier_id})
             if not result.fetchone():
                 raise HTTPException(status_code=404, detail="Supplier not found")
+        publish_change("suppliers")
         write_audit(
             action="DELETE",
             table_name="suppliers",
@@ -1,5 +1,8 @@
 -- Clean schema for migration
 
+-- Trigram matching for product search (GET /api/products/search)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Suppliers
 CREATE TABLE suppliers (
     supplier_id SERIAL PRIMARY KEY,
@@ -126,17 +129,79 @@ CREATE TABLE audit_logs (
     error_message TEXT
 );
 
+-- Rollup watermarks (days before rolled_through are fully aggregated)
+CREATE TABLE rollup_watermarks (
+    name VARCHAR(50) PRIMARY KEY,
+    rolled_through DATE,
+    refreshed_at TIMESTAMP
+);
+
+-- Daily Sales Rollup
+CREATE TABLE daily_sales_rollup (
+    sale_date DATE PRIMARY KEY,
+    sale_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    discount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    items BIGINT NOT NULL DEFAULT 0
+);
+
+-- Product Daily Sales Rollup
+CREATE TABLE product_daily_sales (
+    product_id INT NOT NULL,
+    sale_date DATE NOT NULL,
+    quantity BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    last_sale_time TIMESTAMP,
+    PRIMARY KEY (product_id, sale_date)
+);
+
+-- Product Sales Stats (closed_* maintained incrementally, the rest recomputed each refresh)
+CREATE TABLE product_sales_stats (
+    product_id INT PRIMARY KEY,
+    closed_units BIGINT NOT NULL DEFAULT 0,
+    closed_revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    closed_last_sale_time TIMESTAMP,
+    last_sale_time TIMESTAMP,
+    units_total BIGINT NOT NULL DEFAULT 0,
+    revenue_total DECIMAL(14,2) NOT NULL DEFAULT 0,
+    units_7d BIGINT NOT NULL DEFAULT 0,
+    units_30d BIGINT NOT NULL DEFAULT 0,
+    units_90d BIGINT NOT NULL DEFAULT 0,
+    revenue_7d DECIMAL(14,2) NOT NULL DEFAULT 0,
+    revenue_30d DECIMAL(14,2) NOT NULL DEFAULT 0,
+    revenue_90d DECIMAL(14,2) NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP
+);
+
+-- Report View Refreshes (the daily_sales_report, best_selling_products and
+-- low_stock_products materialized views are created by report_views.py)
+CREATE TABLE report_view_refreshes (
+    view_name VARCHAR(50) PRIMARY KEY,
+    refreshed_at TIMESTAMP NOT NULL,
+    duration_ms INT
+);
+
 -- Create indexes
 CREATE INDEX idx_sales_sale_time ON sales(sale_time DESC);
+CREATE INDEX idx_sales_sale_time_id ON sales(sale_time DESC, sale_id DESC);
 CREATE INDEX idx_sales_customer_id ON sales(customer_id);
 CREATE INDEX idx_sales_employee_id ON sales(employee_id);
 CREATE INDEX idx_products_category_id ON products(category_id);
 CREATE INDEX idx_products_supplier_id ON products(supplier_id);
 CREATE INDEX idx_products_stock ON products(stock_quantity);
+CREATE INDEX idx_products_low_stock ON products(product_id) WHERE stock_quantity <= low_stock_threshold;
+CREATE INDEX idx_products_barcode_pattern ON products(barcode varchar_pattern_ops);
+CREATE INDEX idx_products_name_trgm ON products USING gin (name gin_trgm_ops);
+CREATE INDEX idx_categories_name_trgm ON categories USING gin (name gin_trgm_ops);
+CREATE INDEX idx_suppliers_name_trgm ON suppliers USING gin (name gin_trgm_ops);
 CREATE INDEX idx_sale_items_product_id ON sale_items(product_id);
 CREATE INDEX idx_sale_items_sale_id ON sale_items(sale_id);
+CREATE INDEX idx_product_daily_sales_date ON product_daily_sales(sale_date);
 CREATE INDEX idx_customers_phone ON customers(phone);
 CREATE INDEX idx_customers_email ON customers(email);
+CREATE INDEX idx_customers_name_id ON customers(name, customer_id);
+CREATE INDEX idx_notifications_created_id ON notifications(created_at DESC, notification_id DESC);
+CREATE INDEX idx_purchase_orders_date_id ON purchase_orders(order_date DESC, order_id DESC);
 CREATE INDEX idx_employees_username ON employees(username);
 CREATE INDEX idx_employees_role ON employees(role);
 CREATE INDEX idx_audit_timestamp ON audit_logs(timestamp DESC);
@@ -0,0 +1,141 @@
+"""
+Tests for the bulk product import's parsing and per-row validation
+"""
+import json
+from contextlib import contextmanager
+
+import pytest
+from fastapi import HTTPException
+
+from routes import products_routes
+from routes.products_routes import BULK_EXISTING_QUERY, BULK_REFERENCES_QUERY, _bulk_row, _import_products
+
+HEADER = "name,barcode,price,stock_quantity,category_id,supplier_id,low_stock_threshold,cost_price\n"
+MISSING_SUPPLIER = 99
+
+
+class _Result:
+    def __init__(self, rows=(), scalar=None):
+        self._rows = list(rows)
+        self._scalar = scalar
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def scalar(self):
+        return self._scalar
+
+
+class _FakeConn:
+    """Every category exists, every supplier but MISSING_SUPPLIER, and no barcode yet"""
+
+    def execute(self, query, params=None):
+        if query is BULK_REFERENCES_QUERY:
+            return _Result([("category", c) for c in params["cids"]] +
+                           [("supplier", s) for s in params["sids"] if s != MISSING_SUPPLIER])
+        if query is BULK_EXISTING_QUERY:
+            return _Result(scalar=0)
+        raise AssertionError("a dry run only reads references and existing barcodes")
+
+
+class _FakeEngine:
+    @contextmanager
+    def begin(self):
+        yield _FakeConn()
+
+
+@pytest.fixture(autouse=True)
+def fake_engine(monkeypatch):
+    monkeypatch.setattr(products_routes, "engine", _FakeEngine())
+
+
+def _dry_run(body: str, fmt: str) -> dict:
+    return _import_products(body.encode("utf-8"), fmt, True, None, None)
+
+
+def _ndjson(*records) -> str:
+    return "\n".join(r if isinstance(r, str) else json.dumps(r) for r in records)
+
+
+def _record(**overrides) -> dict:
+    record = {"name": "Milk", "barcode": "100", "price": 2.5, "stock_quantity": 10,
+              "category_id": 1, "supplier_id": 1}
+    record.update(overrides)
+    return record
+
+
+def test_valid_row_defaults():
+    row = _bulk_row({"name": " Milk ", "barcode": "100", "price": "2.499", "stock_quantity": "3",
+                     "category_id": "1", "supplier_id": "2"})
+    assert row == ("Milk", "100", 2.5, 3, 1, 2, 10, 1.5)
+
+
+def test_csv_errors_report_their_lines():
+    body = HEADER + "\n".join([
+        "Milk,100,2.50,10,1,1,,",
+        "Bread,101,abc,5,1,1,,",               # line 3: bad price
+        "Eggs,102,3.00,-1,1,1,,",              # line 4: negative stock
+        "Milk again,100,2.00,1,1,1,,",         # line 5: duplicate barcode
+        "Jam,103,4.00,1,1,3000000000,,",       # line 6: id out of int4 range
+        f"Tea,104,1.00,1,1,{MISSING_SUPPLIER},,",  # line 7: unknown supplier
+        ",105,1.00,1,1,1,,",                   # line 8: no name
+    ])
+    report = _dry_run(body, "csv")
+
+    assert report["inserted"] == 1
+    assert report["rejected"] == 6
+    errors = {e["line"]: e["error"] for e in report["errors"]}
+    assert sorted(errors) == [3, 4, 5, 6, 7, 8]
+    assert errors[3] == "price must be a non-negative amount below 100000000"
+    assert "must not be negative" in errors[4]
+    assert errors[5] == "Duplicate barcode 100 (first on line 2)"
+    assert errors[6].startswith("supplier_id must be an integer between")
+    assert errors[7] == f"Supplier {MISSING_SUPPLIER} not found"
+    assert errors[8] == "name is required"
+
+
+def test_csv_quoted_newline_keeps_line_numbers():
+    body = HEADER + '"Milk\n2L",100,2.50,10,1,1,,\nBread,101,x,5,1,1,,\n'
+    report = _dry_run(body, "csv")
+    assert report["errors"] == [{"line": 4, "error": "price must be a non-negative amount below 100000000"}]
+
+
+def test_csv_missing_columns_rejects_upload():
+    with pytest.raises(HTTPException) as exc:
+        _dry_run("name,barcode\nMilk,100\n", "csv")
+    assert exc.value.status_code == 400
+    assert "price" in exc.value.detail
+
+
+def test_ndjson_errors_report_their_lines():
+    body = _ndjson(
+        _record(),
+        "{not json",                           # line 2
+        "[1, 2]",                              # line 3
+        "",                                    # blank lines are skipped but counted
+        _record(barcode={"code": "101"}),      # line 5: barcode is not text
+        _record(barcode="102", name=["Milk"]), # line 6: name is not text
+        _record(barcode="103", stock_quantity=1.5),  # line 7
+        _record(barcode="104", supplier_id=True),    # line 8
+        '{"name": "X", "barcode": "105", "price": 1e309, '
+        '"stock_quantity": 1, "category_id": 1, "supplier_id": 1}',  # line 9: parses as inf
+    )
+    report = _dry_run(body, "ndjson")
+
+    assert report["inserted"] == 1
+    errors = {e["line"]: e["error"] for e in report["errors"]}
+    assert errors == {
+        2: "Invalid JSON",
+        3: "Expected a JSON object",
+        5: "barcode must be text",
+        6: "name must be text",
+        7: f"stock_quantity must be an integer between {products_routes.BULK_INT_MIN} and {products_routes.BULK_INT_MAX}",
+        8: f"supplier_id must be an integer between {products_routes.BULK_INT_MIN} and {products_routes.BULK_INT_MAX}",
+        9: "price must be a non-negative amount below 100000000",
+    }
+
+
+def test_empty_upload_rejected():
+    with pytest.raises(HTTPException) as exc:
+        _dry_run("\n\n", "ndjson")
+    assert exc.value.status_code == 400
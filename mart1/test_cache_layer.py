@@ -0,0 +1,158 @@
+"""
+Tests for the dashboard cache backends: LRU eviction, TTL expiry,
+single-flight misses and stale-while-revalidate
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from cache_layer import LRUCache, SQLiteCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return LRUCache(max_entries=100)
+    return SQLiteCache(path=str(tmp_path / "cache.sqlite3"), max_entries=100)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a is now the most recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_entry_expires_after_ttl(cache):
+    cache.set("k", {"v": 1}, ttl_seconds=0.05)
+    assert cache.get("k") == {"v": 1}
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+
+def test_lru_counts_expirations():
+    cache = LRUCache(max_entries=10)
+    cache.set("k", 1, ttl_seconds=0.05)
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    assert cache.expirations == 1
+
+
+def test_concurrent_misses_fetch_once(cache):
+    calls = []
+    start = threading.Barrier(8)
+    results = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"total": 42}
+
+    def worker():
+        start.wait()
+        results.append(cache.get_or_fetch("stats", fetch, ttl_seconds=60))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+
+    assert len(calls) == 1
+    assert results == [{"total": 42}] * 8
+
+
+def test_concurrent_async_misses_fetch_once(cache):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"total": 7}
+
+    async def main():
+        return await asyncio.gather(*[
+            cache.get_or_fetch_async("stats", fetch, ttl_seconds=60) for _ in range(8)
+        ])
+
+    assert asyncio.run(main()) == [{"total": 7}] * 8
+    assert len(calls) == 1
+
+
+def test_stale_value_served_while_refreshing(cache):
+    cache.set("stats", {"v": "old"}, ttl_seconds=0.05, stale_seconds=60)
+    time.sleep(0.1)
+
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"v": "new"}
+
+    # Past its TTL but inside the stale window: returned at once, refresh runs behind it
+    started = time.monotonic()
+    assert cache.get_or_fetch("stats", fetch, ttl_seconds=60, stale_seconds=60) == {"v": "old"}
+    assert cache.get_or_fetch("stats", fetch, ttl_seconds=60, stale_seconds=60) == {"v": "old"}
+    assert time.monotonic() - started < 1
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while cache.get("stats") != {"v": "new"} and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert cache.get("stats") == {"v": "new"}
+    assert len(calls) == 1
+
+
+def test_miss_during_refresh_does_not_get_none(cache):
+    cache.set("stats", {"v": "old"}, ttl_seconds=0.05, stale_seconds=0.3)
+    time.sleep(0.1)
+    release = threading.Event()
+
+    def slow_fetch():
+        release.wait(5)
+        return {"v": "refreshed"}
+
+    assert cache.get_or_fetch("stats", slow_fetch, ttl_seconds=60, stale_seconds=0.3) == {"v": "old"}
+    # Past the stale window too: the miss gets a value (its own fetch, or with the
+    # sqlite lease held, the refresh's once it lands) and never the refresh's None
+    time.sleep(0.3)
+    threading.Timer(0.2, release.set).start()
+    value = cache.get_or_fetch("stats", lambda: {"v": "fetched"}, ttl_seconds=60)
+    assert value in ({"v": "fetched"}, {"v": "refreshed"})
+
+
+def test_publish_change_invalidates_dependents(cache):
+    cache.set("stats", 1, ttl_seconds=60, depends_on=["sales"])
+    cache.set("other", 2, ttl_seconds=60, depends_on=["suppliers"])
+    cache.publish_change("sales")
+    assert cache.get("stats") is None
+    assert cache.get("other") == 2
+
+
+def test_settle_window_defers_invalidation(cache):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    def get():
+        return cache.get_or_fetch("stats", fetch, ttl_seconds=60, depends_on=["sales"], settle_seconds=0.2)
+
+    assert get() == 1
+    cache.publish_change("sales")
+    # Inside the settle window the write is not seen yet
+    assert get() == 1
+    time.sleep(0.25)
+    assert get() == 2
+    assert len(calls) == 2
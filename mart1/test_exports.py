@@ -0,0 +1,84 @@
+"""
+Tests for incremental sales export paging
+"""
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+
+from routes import exports_routes
+
+# sale_id -> number of line items; 2 and 3 were rung up with no items
+SALES = {1: 2, 2: 0, 3: 0, 4: 1, 5: 1}
+
+
+class _Row(tuple):
+    @property
+    def _mapping(self):
+        return {
+            "Invoice ID": self[1], "Date": "2026-01-01", "Time": "10:00", "Total": 1, "Quantity": 1,
+            "Unit price": 1, "Product line": "Food", "Payment": "Cash", "Customer type": "Normal",
+            "Product name": "Milk", "Category": "Food", "Gender": "Unknown", "Discount (%)": 0,
+            "Customer_Rating": None, "Feedback": None, "Churn": 0,
+        }
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0]
+
+
+class _FakeConn:
+    """Applies after_id and the sales LIMIT the way the export's SQL does"""
+
+    def execute(self, query, params):
+        page = sorted(sid for sid in SALES if sid > params["after_id"])[:params["limit"]]
+        if "MAX(page.sale_id)" in str(query):
+            return _Result([(max(page) if page else None, len(page))])
+        # INNER JOIN sale_items: itemless sales produce no rows
+        return _Result([_Row((sid, f"{sid}-{n}")) for sid in page for n in range(SALES[sid])])
+
+
+class _FakeEngine:
+    @contextmanager
+    def connect(self):
+        yield _FakeConn()
+
+
+@pytest.fixture(autouse=True)
+def fake_engine(monkeypatch):
+    monkeypatch.setattr(exports_routes, "engine", _FakeEngine())
+
+
+def _page(after_id, limit):
+    return asyncio.run(exports_routes.export_sales_data(limit=limit, after_id=after_id))
+
+
+def test_itemless_sale_does_not_end_paging_early():
+    page = _page(after_id=0, limit=2)
+    assert [row["Invoice ID"] for row in page["data"]] == ["1-0", "1-1"]
+    assert page["last_sale_id"] == 2
+    assert page["has_more"] is True
+
+
+def test_page_of_itemless_sales_moves_the_watermark():
+    page = _page(after_id=1, limit=2)
+    assert page["data"] == []
+    assert page["last_sale_id"] == 3
+    assert page["has_more"] is True
+
+
+def test_last_page():
+    page = _page(after_id=3, limit=5)
+    assert [row["Invoice ID"] for row in page["data"]] == ["4-0", "5-0"]
+    assert page["last_sale_id"] == 5
+    assert page["has_more"] is False
+
+    page = _page(after_id=5, limit=5)
+    assert page == {"data": [], "count": 0, "last_sale_id": 5, "has_more": False}
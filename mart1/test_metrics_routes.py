@@ -0,0 +1,45 @@
+"""
+Tests that the runtime metrics routes are admin-only
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import identity, metrics_routes
+from routes.auth_routes import create_access_token
+
+EMPLOYEES = {
+    1: {"employee_id": 1, "name": "Admin", "username": "admin", "role": "ADMIN"},
+    2: {"employee_id": 2, "name": "Till", "username": "till", "role": "CASHIER"},
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(identity, "get_employee_identity", EMPLOYEES.get)
+    app = FastAPI()
+    app.include_router(metrics_routes.router)
+    return TestClient(app)
+
+
+def _auth(employee_id: int, role: str) -> dict:
+    token = create_access_token({"sub": str(employee_id), "role": role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("path", ["/api/metrics/cache", "/api/metrics/statements", "/api/metrics/token-cache"])
+def test_metrics_need_a_token(client, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer not-a-jwt"}).status_code == 401
+
+
+def test_metrics_need_an_admin(client):
+    assert client.get("/api/metrics/statements", headers=_auth(2, "CASHIER")).status_code == 403
+    # The role comes from the employee record, not the token's claim
+    assert client.get("/api/metrics/statements", headers=_auth(2, "ADMIN")).status_code == 403
+
+
+def test_admin_reads_metrics(client):
+    response = client.get("/api/metrics/cache", headers=_auth(1, "ADMIN"))
+    assert response.status_code == 200
+    assert "hits" in response.json()
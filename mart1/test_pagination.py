@@ -0,0 +1,62 @@
+"""
+Tests for keyset pagination conditions, with PostgreSQL's NULL ordering
+"""
+import sqlite3
+
+import pytest
+
+from routes.pagination import keyset_condition
+
+# sort key (None for NULL) by id; NULLs sit between and around repeated keys
+ROWS = [(1, None), (2, "b"), (3, "a"), (4, None), (5, "b"), (6, "c"), (7, None), (8, "a")]
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, k TEXT)")
+    conn.executemany("INSERT INTO items VALUES (?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+
+def _walk(conn, descending: bool, page_size: int) -> list:
+    # PostgreSQL's defaults: NULLS FIRST for DESC, NULLS LAST for ASC
+    order = "k DESC NULLS FIRST, id DESC" if descending else "k ASC NULLS LAST, id ASC"
+    seen, cursor = [], None
+    while True:
+        where, params = "", {}
+        if cursor is not None:
+            condition, params = keyset_condition("k", "id", cursor, descending=descending)
+            where = f"WHERE {condition}"
+        page = conn.execute(f"SELECT id, k FROM items {where} ORDER BY {order} LIMIT {page_size}", params).fetchall()
+        if not page:
+            return seen
+        seen.extend(row_id for row_id, _ in page)
+        cursor = (page[-1][1], page[-1][0])
+
+
+def _full_order(conn, descending: bool) -> list:
+    order = "k DESC NULLS FIRST, id DESC" if descending else "k ASC NULLS LAST, id ASC"
+    return [r[0] for r in conn.execute(f"SELECT id FROM items ORDER BY {order}")]
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3])
+def test_descending_pages_cover_every_row_once(db, page_size):
+    assert _walk(db, True, page_size) == _full_order(db, True)
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3])
+def test_ascending_pages_cover_every_row_once(db, page_size):
+    assert _walk(db, False, page_size) == _full_order(db, False)
+
+
+def test_ascending_null_cursor_only_continues_within_nulls():
+    condition, params = keyset_condition("k", "id", (None, 4), descending=False)
+    assert condition == "(k IS NULL AND id > :cursor_id)"
+    assert params == {"cursor_id": 4}
+
+
+def test_not_null_column_leaves_out_the_null_branch():
+    condition, _ = keyset_condition("name", "customer_id", ("b", 2), descending=False, nullable=False)
+    assert "IS NULL" not in condition
@@ -0,0 +1,117 @@
+"""
+Tests for the bcrypt process pool and the per-username login rate limit
+"""
+import time
+
+import bcrypt
+import pytest
+
+from password_hashing import LoginRateLimiter, PasswordHasher, PasswordPoolBusy
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, queue_size=1)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_rate_limit_blocks_attempts_over_limit():
+    limiter = LoginRateLimiter(limit=2, window_seconds=60)
+    assert limiter.allow("alice")
+    assert limiter.allow("ALICE")  # usernames are compared case-insensitively
+    assert not limiter.allow("alice")
+    assert limiter.allow("bob")
+    assert limiter.get_stats()["rate_limited"] == 1
+
+
+def test_rate_limit_window_slides():
+    limiter = LoginRateLimiter(limit=1, window_seconds=0.2)
+    assert limiter.allow("alice")
+    assert not limiter.allow("alice")
+    time.sleep(0.25)
+    assert limiter.allow("alice")
+
+
+def test_rate_limit_reset_after_success():
+    limiter = LoginRateLimiter(limit=1, window_seconds=60)
+    assert limiter.allow("alice")
+    assert not limiter.allow("alice")
+    limiter.reset("Alice")
+    assert limiter.allow("alice")
+
+
+def test_rate_limit_disabled():
+    limiter = LoginRateLimiter(limit=0, window_seconds=60)
+    assert all(limiter.allow("alice") for _ in range(20))
+
+
+def test_rate_limit_forgets_least_recent_username():
+    limiter = LoginRateLimiter(limit=1, window_seconds=60, max_usernames=2)
+    limiter.allow("a")
+    limiter.allow("b")
+    limiter.allow("c")
+    assert limiter.get_stats()["tracked_usernames"] == 2
+    assert limiter.allow("a")
+
+
+def test_check_password(hasher):
+    stored = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode("utf-8")
+    assert hasher.check_password("secret", stored).result(timeout=30)
+    assert not hasher.check_password("wrong", stored).result(timeout=30)
+    # Legacy plain-text passwords still compare
+    assert hasher.check_password("plain", "plain").result(timeout=30)
+
+
+def test_busy_when_queue_full(hasher):
+    stored = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=14)).decode("utf-8")
+    pending = hasher.check_password("secret", stored)
+    with pytest.raises(PasswordPoolBusy):
+        hasher.check_password("secret", stored)
+    assert hasher.get_stats()["rejected_busy"] == 1
+
+    # A slot frees up once the running check completes
+    assert pending.result(timeout=60)
+    deadline = time.monotonic() + 5
+    while hasher.get_stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert hasher.check_password("plain", "plain").result(timeout=30)
+    assert hasher.get_stats()["completed"] == 2
+
+
+class _BusyHasher:
+    def check_password(self, password, stored_password):
+        raise PasswordPoolBusy("Too many password checks in progress")
+
+
+@pytest.fixture
+def login_client(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from routes import auth_routes
+
+    async def fake_run_db(func):
+        return (1, "Alice", "admin", "secret")
+
+    limiter = LoginRateLimiter(limit=2, window_seconds=60)
+    monkeypatch.setattr(auth_routes, "run_db", fake_run_db)
+    monkeypatch.setattr(auth_routes, "get_password_hasher", lambda: _BusyHasher())
+    monkeypatch.setattr(auth_routes, "get_login_rate_limiter", lambda: limiter)
+
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+    return TestClient(app)
+
+
+def test_login_returns_503_when_pool_busy(login_client):
+    response = login_client.post("/api/auth/login", json={"username": "alice", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_login_returns_429_over_rate_limit(login_client):
+    for _ in range(2):
+        login_client.post("/api/auth/login", json={"username": "alice", "password": "secret"})
+    response = login_client.post("/api/auth/login", json={"username": "alice", "password": "secret"})
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
@@ -0,0 +1,44 @@
+"""
+Tests for the barcode index's per-product change generations
+"""
+import pytest
+
+import product_index
+from cache_layer import LRUCache
+from product_index import ProductIndex, product_change_key, publish_product_changes
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    cache = LRUCache(max_entries=100)
+    monkeypatch.setattr(product_index, "publish_change", cache.publish_change)
+    monkeypatch.setattr(product_index, "table_generations", cache.table_generations)
+    monkeypatch.setattr(product_index, "BARCODE_INDEX_CHANGE_BUCKETS", 4)
+    monkeypatch.setattr(product_index, "_product_index", ProductIndex())
+    return cache
+
+
+def _entry(product_id):
+    generations = ProductIndex.read_generations([product_id])
+    return ProductIndex._entry_generation(generations, product_id)
+
+
+def test_change_keys_are_bounded(cache):
+    publish_product_changes(range(1000), "sales")
+    assert {product_change_key(pid) for pid in range(1000)} == {f"product:{n}" for n in range(4)}
+    assert len(cache._table_generations) == 5
+
+
+def test_sale_revalidates_only_its_bucket():
+    before = {pid: _entry(pid) for pid in (1, 2, 5)}
+    publish_product_changes([1], "sales")
+    assert _entry(1) != before[1]
+    assert _entry(5) != before[5]   # shares product 1's bucket
+    assert _entry(2) == before[2]
+
+
+def test_read_generations_with_shared_keys():
+    publish_product_changes([3])
+    generations = ProductIndex.read_generations([3, 7, 11])
+    assert list(generations).count(product_change_key(3)) == 1
+    assert _entry(7) == ProductIndex._entry_generation(generations, 11)
@@ -11,6 +11,9 @@ import plotly
 
 # Import mart1 integration
 from mart1_integration import get_mart1_integration
+from mart1_snapshot import get_mart1_snapshot
+from dataset_store import get_dataset_store, load_dataset
+from chart_cube import get_chart_cube
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,6 +30,45 @@ if os.path.exists(config_path):
 # Initialize mart1 integration (use None to read from env var if config has null)
 mart1_base_url = config.get('mart1_api', {}).get('base_url')
 mart1_integration = get_mart1_integration(mart1_base_url)
+mart1_snapshot = get_mart1_snapshot(
+    mart1_integration,
+    snapshot_dir=config.get('analytics', {}).get('snapshot_dir'),
+    page_size=config.get('analytics', {}).get('sync_page_size', 5000),
+    overlap_ids=config.get('analytics', {}).get('sync_overlap_ids', 10000)
+)
+
+def _pull_mart1_data(days, full=False):
+    """
+    Bring mart1 sales into a local file the analytics endpoints can read.
+    'incremental' sync mode appends only new sales to the local snapshot;
+    'export' mode re-downloads up to max_records rows into a new temp file.
+    Returns (file_path, DataFrame newest first, new_row_count) or (None, None, 0).
+    """
+    analytics = config.get('analytics', {})
+    if analytics.get('sync_mode', 'incremental') == 'incremental':
+        result = mart1_snapshot.sync(days=days, full=full)
+        if result is None:
+            return None, None, 0
+        # Shared, read-only frame; reversed so samples show the newest sales like the export did
+        frame = get_dataset_store().get_entry(result['path']).frame
+        return result['path'], frame.iloc[::-1], result['added']
+
+    df = mart1_integration.get_sales_data(
+        limit=analytics.get('max_records', 10000),
+        days=days
+    )
+    if df is None or df.empty:
+        return None, None, 0
+
+    # Save to temporary file for consistency with existing code
+    import tempfile
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
+    temp_file_path = temp_file.name
+    df.to_csv(temp_file_path, index=False)
+    temp_file.close()
+    # Hand the frame we already have to the store so charts skip the CSV parse
+    get_dataset_store().put(temp_file_path, df)
+    return temp_file_path, df, len(df)
 
 @api_bp.route('/load-data', methods=['GET'])
 def load_data():
@@ -45,11 +87,8 @@ def load_data():
             file_path = session['uploaded_file']
             encoding = request.args.get('encoding', 'utf-8')
             
-            df = pd.read_csv(file_path, encoding=encoding)
-            
-            # Clean the data
-            df = df.drop_duplicates()
-            df = df.ffill()
+            # Parsed and cleaned once per upload, then served from the dataset store
+            df = load_dataset(file_path, encoding=encoding, parse_dates=False)
             
             columns = df.columns.tolist()
             column_types = {col: str(df[col].dtype) for col in columns}
@@ -76,19 +115,9 @@ def load_data():
             
             # Fetch sales data from mart1
             days = config.get('analytics', {}).get('default_days', 30)
-            df = mart1_integration.get_sales_data(
-                limit=config.get('analytics', {}).get('max_records', 10000),
-                days=days
-            )
+            temp_file_path, df, _ = _pull_mart1_data(days)
             
             if df is not None and not df.empty:
-                # Save to temporary file for consistency with existing code
-                import tempfile
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
-                temp_file_path = temp_file.name
-                df.to_csv(temp_file_path, index=False)
-                temp_file.close()
-                
                 session['uploaded_file'] = temp_file_path
                 session['data_source'] = 'mart1'
                 logging.info(f"Loaded {len(df)} records from mart1 API")
@@ -116,11 +145,8 @@ def load_data():
             file_path = session['uploaded_file']
             encoding = request.args.get('encoding', 'utf-8')
             
-            df = pd.read_csv(file_path, encoding=encoding)
-            
-            # Clean the data
-            df = df.drop_duplicates()
-            df = df.ffill()
+            # Parsed and cleaned once per upload, then served from the dataset store
+            df = load_dataset(file_path, encoding=encoding, parse_dates=False)
             
             columns = df.columns.tolist()
             column_types = {col: str(df[col].dtype) for col in columns}
@@ -232,17 +258,8 @@ def filter_data():
         
         encoding = request.json.get('encoding', 'utf-8')
         
-        # Load the data
-        df = pd.read_csv(file_path, encoding=encoding)
-        
-        # Clean the data
-        df = df.drop_duplicates()
-        # Use ffill() instead of deprecated fillna(method='ffill')
-        df = df.ffill()
-        
-        # Convert date columns if present
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+        # Load the cleaned data (Date already parsed)
+        df = load_dataset(file_path, encoding=encoding)
         
         # Apply filters
         filters = request.json.get('filters', {})
@@ -310,175 +327,11 @@ def generate_chart():
         chart_type = request.json.get('chart_type')
         filters = request.json.get('filters', {})
         
-        # Load and filter the data
-        df = pd.read_csv(file_path, encoding=encoding)
-        df = df.drop_duplicates()
-        # Use ffill() instead of deprecated fillna(method='ffill')
-        df = df.ffill()
-        
-        # Convert Date column if present
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        
-        # Apply filters
-        filtered_df = df.copy()
-        
-        # Product category filter
-        if 'category' in filters and filters['category'] != 'All' and 'Product line' in df.columns:
-            filtered_df = filtered_df[filtered_df['Product line'] == filters['category']]
-        
-        # Customer type filter
-        if 'customer_type' in filters and filters['customer_type'] != 'All' and 'Customer type' in df.columns:
-            filtered_df = filtered_df[filtered_df['Customer type'] == filters['customer_type']]
-        
-        # Gender filter
-        if 'gender' in filters and filters['gender'] != 'All' and 'Gender' in df.columns:
-            filtered_df = filtered_df[filtered_df['Gender'] == filters['gender']]
-        
-        # Date range filter
-        if 'date_range' in filters and 'Date' in df.columns:
-            start_date = pd.to_datetime(filters['date_range'][0])
-            end_date = pd.to_datetime(filters['date_range'][1])
-            filtered_df = filtered_df[(filtered_df['Date'] >= start_date) & (filtered_df['Date'] <= end_date)]
-        
-        # Generate chart based on chart_type
-        if chart_type == 'category_sales':
-            # Check if required columns exist
-            if 'Product line' not in filtered_df.columns or 'Total' not in filtered_df.columns:
-                return jsonify({'error': 'Required columns missing: Product line, Total'}), 400
-            
-            category_sales = filtered_df.groupby('Product line')['Total'].sum().reset_index()
-            chart_data = {
-                'x': category_sales['Product line'].tolist(),
-                'y': category_sales['Total'].tolist(),
-                'type': 'bar',
-                'title': 'Sales by Product Category'
-            }
-        
-        elif chart_type == 'payment_method':
-            # Check if required columns exist
-            if 'Payment' not in filtered_df.columns or 'Total' not in filtered_df.columns:
-                return jsonify({'error': 'Required columns missing: Payment, Total'}), 400
-            
-            payment_sales = filtered_df.groupby('Payment')['Total'].sum().reset_index()
-            chart_data = {
-                'x': payment_sales['Payment'].tolist(),
-                'y': payment_sales['Total'].tolist(),
-                'type': 'bar',
-                'title': 'Sales by Payment Method'
-            }
-        
-        elif chart_type == 'gender_distribution':
-            # Check if required columns exist
-            if 'Gender' not in filtered_df.columns or 'Total' not in filtered_df.columns:
-                return jsonify({'error': 'Required columns missing: Gender, Total'}), 400
-            
-            gender_sales = filtered_df.groupby('Gender')['Total'].sum().reset_index()
-            chart_data = {
-                'labels': gender_sales['Gender'].tolist(),
-                'values': gender_sales['Total'].tolist(),
-                'type': 'pie',
-                'title': 'Sales by Gender'
-            }
-        
-        elif chart_type == 'customer_type':
-            # Check if required columns exist
-            if 'Customer type' not in filtered_df.columns or 'Total' not in filtered_df.columns:
-                return jsonify({'error': 'Required columns missing: Customer type, Total'}), 400
-            
-            customer_sales = filtered_df.groupby('Customer type')['Total'].sum().reset_index()
-            chart_data = {
-                'labels': customer_sales['Customer type'].tolist(),
-                'values': customer_sales['Total'].tolist(),
-                'type': 'pie',
-                'title': 'Sales by Customer Type'
-            }
-        
-        elif chart_type == 'time_series':
-            # Check if required columns exist
-            if 'Date' not in filtered_df.columns or 'Total' not in filtered_df.columns:
-                return jsonify({'error': 'Required columns missing: Date, Total'}), 400
-            
-            # Group by date and sum the total sales
-            daily_sales = filtered_df.groupby(filtered_df['Date'].dt.date)['Total'].sum().reset_index()
-            daily_sales['Date'] = daily_sales['Date'].astype(str)
-            
-            chart_data = {
-                'x': daily_sales['Date'].tolist(),
-                'y': daily_sales['Total'].tolist(),
-                'type': 'line',
-                'title': 'Daily Sales Trend'
-            }
-        
-        elif chart_type == 'sales_heatmap':
-            # Check if required columns exist
-            if 'Date' not in filtered_df.columns or 'Total' not in filtered_df.columns:
-                return jsonify({'error': 'Required columns missing: Date, Total'}), 400
-            
-            # Add day of week
-            filtered_df['Day'] = filtered_df['Date'].dt.day_name()
-            
-            # Add hour if not present
-            if 'Hour' not in filtered_df.columns:
-                if 'Time' in filtered_df.columns:
-                    filtered_df['Hour'] = pd.to_datetime(filtered_df['Time']).dt.hour
-                else:
-                    filtered_df['Hour'] = filtered_df['Date'].dt.hour
-            
-            # Group by day and hour
-            heatmap_data = filtered_df.groupby(['Day', 'Hour'])['Total'].sum().reset_index()
-            
-            # Convert to list of lists for heatmap
-            days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            hours = list(range(24))
-            
-            # Create a 2D grid for the heatmap
-            z = [[0 for _ in range(len(hours))] for _ in range(len(days))]
-            
-            # Fill in the grid with sales data
-            for _, row in heatmap_data.iterrows():
-                day_idx = days.index(row['Day']) if row['Day'] in days else -1
-                hour_idx = int(row['Hour']) if 0 <= int(row['Hour']) < 24 else -1
-                
-                if day_idx >= 0 and hour_idx >= 0:
-                    z[day_idx][hour_idx] = row['Total']
-            
-            chart_data = {
-                'z': z,
-                'x': hours,
-                'y': days,
-                'type': 'heatmap',
-                'title': 'Sales Heatmap by Day and Hour'
-            }
-        
-        elif chart_type == 'product_analysis':
-            # Check if required columns exist
-            if 'Product line' not in filtered_df.columns or 'Unit price' not in filtered_df.columns or 'Quantity' not in filtered_df.columns:
-                return jsonify({'error': 'Required columns missing: Product line, Unit price, Quantity'}), 400
-            
-            # Calculate average unit price by product
-            avg_price = filtered_df.groupby('Product line')['Unit price'].mean().reset_index()
-            
-            # Calculate quantity sold by product
-            qty_sold = filtered_df.groupby('Product line')['Quantity'].sum().reset_index()
-            
-            chart_data = {
-                'price': {
-                    'x': avg_price['Product line'].tolist(),
-                    'y': avg_price['Unit price'].tolist(),
-                    'type': 'bar',
-                    'title': 'Average Unit Price by Product Category'
-                },
-                'quantity': {
-                    'x': qty_sold['Product line'].tolist(),
-                    'y': qty_sold['Quantity'].tolist(),
-                    'type': 'bar',
-                    'title': 'Quantity Sold by Product Category'
-                }
-            }
-        
-        else:
-            return jsonify({'error': f'Invalid chart type: {chart_type}'}), 400
+        # Answer from the pre-aggregated cube instead of scanning raw rows
+        cube = get_chart_cube(file_path, encoding=encoding)
+        chart_data, error = cube.slice(filters).chart(chart_type)
+        if error:
+            return jsonify({'error': error}), 400
         
         return jsonify({
             'success': True,
@@ -489,6 +342,44 @@ def generate_chart():
         logging.error(f"Error generating chart: {e}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/generate-charts', methods=['POST'])
+def generate_charts():
+    """
+    Generate several charts for one filter set in a single request.
+    The filter is applied once and every chart is built from the same slice.
+    """
+    if 'uploaded_file' not in session:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    try:
+        file_path = session['uploaded_file']
+        encoding = request.json.get('encoding', 'utf-8')
+        chart_types = request.json.get('chart_types') or []
+        filters = request.json.get('filters', {})
+
+        if not isinstance(chart_types, list) or not chart_types:
+            return jsonify({'error': 'chart_types must be a non-empty list'}), 400
+
+        cube_slice = get_chart_cube(file_path, encoding=encoding).slice(filters)
+        charts = {}
+        errors = {}
+        for chart_type in dict.fromkeys(chart_types):
+            chart_data, error = cube_slice.chart(chart_type)
+            if error:
+                errors[chart_type] = error
+            else:
+                charts[chart_type] = chart_data
+
+        return jsonify({
+            'success': True,
+            'charts': charts,
+            'errors': errors
+        })
+
+    except Exception as e:
+        logging.error(f"Error generating charts: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/customer-segmentation', methods=['POST'])
 def perform_customer_segmentation():
     """
@@ -517,11 +408,8 @@ def perform_customer_segmentation():
         # Get filters from request
         filters = request.json.get('filters', {})
         
-        # Load and prepare the data
-        df = pd.read_csv(file_path, encoding=encoding)
-        df = df.drop_duplicates()
-        # Use ffill() instead of deprecated fillna(method='ffill')
-        df = df.ffill()
+        # Load the cleaned data
+        df = load_dataset(file_path, encoding=encoding)
         
         # Apply filters
         logging.info(f"Applying filters to segmentation data: {filters}")
@@ -627,8 +515,8 @@ def forecast_sales():
         # Get filters from request
         filters = request.json.get('filters', {})
         
-        # Load and prepare the data
-        df = pd.read_csv(file_path, encoding=encoding)
+        # Load the cleaned data
+        df = load_dataset(file_path, encoding=encoding)
         
         # Check if required columns exist
         if 'Date' not in df.columns or 'Total' not in df.columns:
@@ -753,12 +641,8 @@ def predict_churn():
         # Get filters from request
         filters = request.json.get('filters', {})
         
-        # Load and prepare the data
-        df = pd.read_csv(file_path, encoding=encoding)
-        df = df.drop_duplicates()
-        
-        # Use ffill() instead of deprecated fillna(method='ffill')
-        df = df.ffill()
+        # Load the cleaned data
+        df = load_dataset(file_path, encoding=encoding)
         
         # Apply filters
         logging.info(f"Applying filters to churn prediction data: {filters}")
@@ -788,10 +672,6 @@ def predict_churn():
         if df.empty:
             return jsonify({'error': 'No data left after applying filters'}), 400
             
-        # Convert date columns
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            
         # Prepare data for churn prediction
         X, y = prepare_churn_data(df)
         
@@ -849,11 +729,8 @@ def generate_insights():
         # Get filters from request
         filters = request.args.get('filters', {}) if request.method == 'GET' else request.json.get('filters', {})
         
-        # Load the data
-        df = pd.read_csv(file_path, encoding=encoding)
-        df = df.drop_duplicates()
-        # Use ffill() instead of deprecated fillna(method='ffill')
-        df = df.ffill()
+        # Load the cleaned data
+        df = load_dataset(file_path, encoding=encoding)
         
         # Apply filters
         logging.info(f"Applying filters to insights data: {filters}")
@@ -883,10 +760,6 @@ def generate_insights():
         if df.empty:
             return jsonify({'error': 'No data left after applying filters'}), 400
         
-        # Convert date columns if present
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        
         # Generate insights
         suggestions = generate_advanced_suggestions(df)
         
@@ -944,27 +817,20 @@ def refresh_mart1_data():
                 'error': 'Mart1 API is not available'
             }), 503
         
-        # Fetch fresh data
+        # Fetch fresh data; only sales newer than the snapshot are pulled unless full is set
         days = request.json.get('days', 30) if request.json else 30
-        df = mart1_integration.get_sales_data(
-            limit=config.get('analytics', {}).get('max_records', 10000),
-            days=days
-        )
+        full = bool(request.json.get('full', False)) if request.json else False
+        temp_file_path, df, added = _pull_mart1_data(days, full=full)
         
         if df is not None and not df.empty:
-            import tempfile
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
-            temp_file_path = temp_file.name
-            df.to_csv(temp_file_path, index=False)
-            temp_file.close()
-            
             session['uploaded_file'] = temp_file_path
             session['data_source'] = 'mart1'
             
             return jsonify({
                 'success': True,
                 'message': 'Data refreshed from mart1',
-                'record_count': len(df)
+                'record_count': len(df),
+                'new_records': added
             })
         else:
             return jsonify({
@@ -68,6 +68,7 @@ with app.app_context():
     db.create_all()
 
 from api import api_bp
+from dataset_store import load_dataset
 
 # Register blueprints
 app.register_blueprint(api_bp, url_prefix='/api')
@@ -110,7 +111,8 @@ def upload():
             # Attempt to read and validate the file
             try:
                 encoding = request.form.get('encoding', 'utf-8')
-                df = pd.read_csv(file_path, encoding=encoding)
+                # Parse once here; the analytics endpoints reuse the cached copy
+                df = load_dataset(file_path, encoding=encoding, parse_dates=False)
                 
                 # Check for required columns
                 required_columns = ['Invoice ID', 'Date', 'Total', 'Quantity']
@@ -0,0 +1,327 @@
+"""
+Chart Cube
+Pre-aggregates a dataset over the dashboard filter dimensions so chart requests
+slice and sum small aggregate tables instead of scanning raw rows
+"""
+import copy
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+import pandas as pd
+
+from dataset_store import get_dataset_store
+
+logger = logging.getLogger(__name__)
+
+# Dashboard filter keys and the dataset columns they apply to
+FILTER_COLUMNS = {
+    'category': 'Product line',
+    'customer_type': 'Customer type',
+    'gender': 'Gender',
+}
+
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Placeholder key used when a dataset has none of the filter dimensions
+_ALL_KEY = '__all__'
+
+
+class ChartCube:
+    """
+    Aggregates of Total/Quantity/Unit price keyed by every filter dimension
+    (category, customer type, gender, date) plus the extra dimension a chart
+    needs (payment method, hour of day).
+
+    Cells are far fewer than rows, so filtering and grouping the cube costs
+    the same whether the dataset has a thousand rows or a million.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.columns = set(df.columns)
+        self.dims = [col for col in FILTER_COLUMNS.values() if col in df.columns]
+        if 'Date' in df.columns:
+            self.dims.append('Date')
+
+        self.base = self._aggregate(df)
+        self.payment = None
+        self.hourly = None
+        if 'Payment' in self.columns and 'Total' in self.columns:
+            self.payment = self._aggregate(df, extra='Payment')
+        if 'Date' in self.columns and 'Total' in self.columns:
+            self.hourly = self._aggregate(df.assign(Hour=self._hours(df)), extra='Hour')
+
+    @staticmethod
+    def _hours(df: pd.DataFrame) -> pd.Series:
+        if 'Hour' in df.columns:
+            return df['Hour']
+        if 'Time' in df.columns:
+            times = df['Time'].astype(str)
+            # Try the common fixed formats first; per-element parsing is very slow
+            hours = pd.to_datetime(times, format='%H:%M', errors='coerce')
+            for fmt in ('%H:%M:%S', None):
+                missing = hours.isna()
+                if not missing.any():
+                    break
+                hours[missing] = pd.to_datetime(times[missing], format=fmt, errors='coerce')
+            return hours.dt.hour
+        return df['Date'].dt.hour
+
+    def _measures(self, extra: Optional[str]) -> Dict[str, Tuple[str, str]]:
+        if extra is not None:
+            return {'Total': ('Total', 'sum')}
+        measures = {}
+        for col in ('Total', 'Quantity', 'Unit price'):
+            if col in self.columns:
+                measures[col] = (col, 'sum')
+        if 'Unit price' in self.columns:
+            measures['Unit price count'] = ('Unit price', 'count')
+        return measures
+
+    def _aggregate(self, df: pd.DataFrame, extra: Optional[str] = None) -> pd.DataFrame:
+        keys = self.dims + ([extra] if extra else [])
+        if not keys:
+            df = df.assign(**{_ALL_KEY: 0})
+            keys = [_ALL_KEY]
+        measures = self._measures(extra)
+        if not measures:
+            return self._encode(df[keys].drop_duplicates().reset_index(drop=True))
+        return self._encode(df.groupby(keys, dropna=False, sort=False).agg(**measures).reset_index())
+
+    @staticmethod
+    def _encode(table: pd.DataFrame) -> pd.DataFrame:
+        # Categorical keys make the per-request equality filters cheap
+        for col in list(FILTER_COLUMNS.values()) + ['Payment']:
+            if col in table.columns:
+                table[col] = table[col].astype('category')
+        return table
+
+    @classmethod
+    def _merge(cls, current: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+        measures = [col for col in current.columns if col in ('Total', 'Quantity', 'Unit price', 'Unit price count')]
+        keys = [col for col in current.columns if col not in measures]
+        combined = pd.concat([current, delta], ignore_index=True)
+        for col in keys:
+            if isinstance(combined[col].dtype, pd.CategoricalDtype):
+                combined[col] = combined[col].astype(object)
+        if not measures:
+            return cls._encode(combined.drop_duplicates().reset_index(drop=True))
+        return cls._encode(combined.groupby(keys, dropna=False, sort=False)[measures].sum().reset_index())
+
+    def with_rows(self, new_rows: pd.DataFrame) -> 'ChartCube':
+        """
+        A cube that also covers newly appended rows (with parsed Date).
+
+        This cube is left as it is: requests still slicing it keep seeing the
+        dataset version it was built from.
+        """
+        if new_rows.empty:
+            return self
+        cube = copy.copy(self)
+        cube.base = self._merge(self.base, self._aggregate(new_rows))
+        if self.payment is not None:
+            cube.payment = self._merge(self.payment, self._aggregate(new_rows, extra='Payment'))
+        if self.hourly is not None:
+            hourly = self._aggregate(new_rows.assign(Hour=self._hours(new_rows)), extra='Hour')
+            cube.hourly = self._merge(self.hourly, hourly)
+        return cube
+
+    def _mask(self, table: pd.DataFrame, filters: Dict[str, Any]) -> pd.DataFrame:
+        mask = pd.Series(True, index=table.index)
+        for key, col in FILTER_COLUMNS.items():
+            value = filters.get(key)
+            if value and value != 'All' and col in table.columns:
+                mask &= table[col] == value
+
+        date_range = filters.get('date_range')
+        if date_range and len(date_range) == 2 and date_range[0] and date_range[1] and 'Date' in table.columns:
+            start_date = pd.to_datetime(date_range[0])
+            end_date = pd.to_datetime(date_range[1])
+            mask &= (table['Date'] >= start_date) & (table['Date'] <= end_date)
+        return table[mask]
+
+    def slice(self, filters: Optional[Dict[str, Any]] = None) -> 'CubeSlice':
+        """Restrict the cube to one filter set"""
+        return CubeSlice(self, filters or {})
+
+
+class CubeSlice:
+    """
+    The cube restricted to one filter set; builds Plotly-ready chart payloads.
+
+    Each aggregate table is filtered on first use and reused by every chart
+    built from the same slice.
+    """
+
+    def __init__(self, cube: ChartCube, filters: Dict[str, Any]):
+        self.cube = cube
+        self.filters = filters
+        self.columns = cube.columns
+        self._tables: Dict[str, pd.DataFrame] = {}
+
+    def _table(self, name: str) -> pd.DataFrame:
+        if name not in self._tables:
+            self._tables[name] = self.cube._mask(getattr(self.cube, name), self.filters)
+        return self._tables[name]
+
+    @property
+    def base(self) -> pd.DataFrame:
+        return self._table('base')
+
+    @property
+    def payment(self) -> pd.DataFrame:
+        return self._table('payment')
+
+    @property
+    def hourly(self) -> pd.DataFrame:
+        return self._table('hourly')
+
+    def _missing(self, required: List[str]) -> Optional[str]:
+        if all(col in self.columns for col in required):
+            return None
+        return f"Required columns missing: {', '.join(required)}"
+
+    def chart(self, chart_type: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Build the chart payload for one chart type.
+
+        Returns:
+            (chart_data, None) on success or (None, error_message)
+        """
+        builder = CHART_BUILDERS.get(chart_type)
+        if builder is None:
+            return None, f'Invalid chart type: {chart_type}'
+        return builder(self)
+
+    def _sum_by(self, table: pd.DataFrame, col: str, measure: str = 'Total') -> pd.DataFrame:
+        return table.groupby(col, observed=True)[measure].sum().reset_index()
+
+    def category_sales(self):
+        error = self._missing(['Product line', 'Total'])
+        if error:
+            return None, error
+        category_sales = self._sum_by(self.base, 'Product line')
+        return {
+            'x': category_sales['Product line'].tolist(),
+            'y': category_sales['Total'].tolist(),
+            'type': 'bar',
+            'title': 'Sales by Product Category'
+        }, None
+
+    def payment_method(self):
+        error = self._missing(['Payment', 'Total'])
+        if error:
+            return None, error
+        payment_sales = self._sum_by(self.payment, 'Payment')
+        return {
+            'x': payment_sales['Payment'].tolist(),
+            'y': payment_sales['Total'].tolist(),
+            'type': 'bar',
+            'title': 'Sales by Payment Method'
+        }, None
+
+    def gender_distribution(self):
+        error = self._missing(['Gender', 'Total'])
+        if error:
+            return None, error
+        gender_sales = self._sum_by(self.base, 'Gender')
+        return {
+            'labels': gender_sales['Gender'].tolist(),
+            'values': gender_sales['Total'].tolist(),
+            'type': 'pie',
+            'title': 'Sales by Gender'
+        }, None
+
+    def customer_type(self):
+        error = self._missing(['Customer type', 'Total'])
+        if error:
+            return None, error
+        customer_sales = self._sum_by(self.base, 'Customer type')
+        return {
+            'labels': customer_sales['Customer type'].tolist(),
+            'values': customer_sales['Total'].tolist(),
+            'type': 'pie',
+            'title': 'Sales by Customer Type'
+        }, None
+
+    def time_series(self):
+        error = self._missing(['Date', 'Total'])
+        if error:
+            return None, error
+        daily_sales = self.base.groupby(self.base['Date'].dt.date)['Total'].sum().reset_index()
+        daily_sales['Date'] = daily_sales['Date'].astype(str)
+        return {
+            'x': daily_sales['Date'].tolist(),
+            'y': daily_sales['Total'].tolist(),
+            'type': 'line',
+            'title': 'Daily Sales Trend'
+        }, None
+
+    def sales_heatmap(self):
+        error = self._missing(['Date', 'Total'])
+        if error:
+            return None, error
+        # Weekday numbers are much cheaper than day names on large slices
+        hourly = self.hourly.assign(Day=self.hourly['Date'].dt.dayofweek)
+        heatmap_data = hourly.groupby(['Day', 'Hour'], observed=True)['Total'].sum()
+
+        hours = list(range(24))
+        z = [[0 for _ in range(len(hours))] for _ in range(len(DAYS_OF_WEEK))]
+        for (day, hour), total in heatmap_data.items():
+            if 0 <= day < len(DAYS_OF_WEEK) and 0 <= int(hour) < 24:
+                z[int(day)][int(hour)] = total
+
+        return {
+            'z': z,
+            'x': hours,
+            'y': DAYS_OF_WEEK,
+            'type': 'heatmap',
+            'title': 'Sales Heatmap by Day and Hour'
+        }, None
+
+    def product_analysis(self):
+        error = self._missing(['Product line', 'Unit price', 'Quantity'])
+        if error:
+            return None, error
+        by_product = self.base.groupby('Product line', observed=True)[['Unit price', 'Unit price count', 'Quantity']].sum()
+        avg_price = (by_product['Unit price'] / by_product['Unit price count']).reset_index(name='Unit price')
+        qty_sold = by_product['Quantity'].reset_index()
+        return {
+            'price': {
+                'x': avg_price['Product line'].tolist(),
+                'y': avg_price['Unit price'].tolist(),
+                'type': 'bar',
+                'title': 'Average Unit Price by Product Category'
+            },
+            'quantity': {
+                'x': qty_sold['Product line'].tolist(),
+                'y': qty_sold['Quantity'].tolist(),
+                'type': 'bar',
+                'title': 'Quantity Sold by Product Category'
+            }
+        }, None
+
+
+CHART_BUILDERS = {
+    'category_sales': CubeSlice.category_sales,
+    'payment_method': CubeSlice.payment_method,
+    'gender_distribution': CubeSlice.gender_distribution,
+    'customer_type': CubeSlice.customer_type,
+    'time_series': CubeSlice.time_series,
+    'sales_heatmap': CubeSlice.sales_heatmap,
+    'product_analysis': CubeSlice.product_analysis,
+}
+
+
+def get_chart_cube(file_path: str, encoding: str = 'utf-8') -> ChartCube:
+    """Return the cube for a dataset, building it once per dataset version"""
+    entry = get_dataset_store().get_entry(file_path, encoding)
+    with entry.lock:
+        cube = entry.extras.get('chart_cube')
+        if cube is None:
+            df = entry.frame
+            if entry.dates is not None:
+                df = df.assign(Date=entry.dates)
+            cube = ChartCube(df)
+            entry.extras['chart_cube'] = cube
+            logger.info(f"Built chart cube for {file_path}: {len(cube.base)} cells from {len(df)} rows")
+    return cube
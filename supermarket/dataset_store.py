@@ -0,0 +1,301 @@
+"""
+Dataset Store
+Parses and cleans each analytics dataset once and shares it across API requests
+"""
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 - only needed so pandas can write Parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Parsed copy of the 'Date' column, persisted alongside the cleaned data
+PARSED_DATE_COLUMN = '__parsed_date'
+
+
+def _hash_rows(df: pd.DataFrame) -> pd.Series:
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+def _like(rows: pd.DataFrame, frame: pd.DataFrame) -> pd.DataFrame:
+    """rows with frame's columns and, where they convert, its dtypes, so equal rows hash equally"""
+    rows = rows.reindex(columns=frame.columns)
+    for col in frame.columns:
+        if rows[col].dtype != frame[col].dtype:
+            try:
+                rows[col] = rows[col].astype(frame[col].dtype)
+            except (TypeError, ValueError):
+                pass
+    return rows
+
+
+class DatasetEntry:
+    """A cleaned dataset plus structures derived from it"""
+
+    def __init__(self, frame: pd.DataFrame, dates: Optional[pd.Series], signature: Tuple):
+        self.frame = frame
+        self.dates = dates
+        self.signature = signature
+        # Derived, per-dataset structures (e.g. pre-aggregated chart data)
+        self.extras: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        # Hashes of the frame's rows, built on the first extend() (see row_hashes)
+        self._row_hashes = None
+
+    def row_hashes(self) -> set:
+        """Hash of every row of the frame, for de-duplicating appended rows against it"""
+        with self.lock:
+            if self._row_hashes is None:
+                self._row_hashes = set(_hash_rows(self.frame).tolist())
+            return self._row_hashes
+
+    def to_frame(self, parse_dates: bool = True) -> pd.DataFrame:
+        """Return a private copy of the cleaned data that callers may modify freely"""
+        df = self.frame.copy()
+        if parse_dates and self.dates is not None:
+            df['Date'] = self.dates.copy()
+        return df
+
+
+class DatasetStore:
+    """
+    Per-process cache of cleaned analytics datasets keyed by source file.
+
+    Each source (uploaded CSV or mart1 snapshot) is parsed, de-duplicated and
+    forward-filled once. A typed Parquet copy is written to a shared cache
+    directory so other worker processes can skip the CSV parse as well.
+    """
+
+    def __init__(self, max_datasets: int = None, cache_dir: str = None):
+        if max_datasets is None:
+            try:
+                max_datasets = int(os.environ.get('DATASET_STORE_SIZE', '4'))
+            except ValueError:
+                max_datasets = 4
+        if cache_dir is None:
+            cache_dir = os.environ.get(
+                'DATASET_CACHE_DIR',
+                os.path.join(tempfile.gettempdir(), 'supermarket_datasets')
+            )
+        self.max_datasets = max(1, max_datasets)
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[Tuple[str, str], DatasetEntry]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(file_path: str, encoding: str) -> Tuple:
+        stat = os.stat(file_path)
+        return (stat.st_mtime_ns, stat.st_size, encoding)
+
+    @staticmethod
+    def _cache_prefix(file_path: str) -> str:
+        # Uploads in different folders often share a name (data.csv), so key on the full path
+        digest = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:12]
+        return f"{os.path.basename(file_path)}-{digest}."
+
+    def _cache_path(self, file_path: str, signature: Tuple) -> str:
+        mtime_ns, size, encoding = signature
+        return os.path.join(self.cache_dir, f"{self._cache_prefix(file_path)}{mtime_ns}-{size}-{encoding}.parquet")
+
+    def get_entry(self, file_path: str, encoding: str = 'utf-8') -> DatasetEntry:
+        """Return the cached entry for a file, loading it at most once per change"""
+        key = (os.path.abspath(file_path), encoding)
+        signature = self.signature(file_path, encoding)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                return entry
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Only one request parses a given file; concurrent callers wait for it
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.signature == signature:
+                    self._entries.move_to_end(key)
+                    return entry
+
+            entry = self._load(file_path, encoding, signature)
+
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_datasets:
+                    self._entries.popitem(last=False)
+                self._loading.pop(key, None)
+            return entry
+
+    def put(self, file_path: str, df: pd.DataFrame, encoding: str = 'utf-8') -> DatasetEntry:
+        """Register an already-parsed frame for a file we just wrote (e.g. a mart1 pull)"""
+        key = (os.path.abspath(file_path), encoding)
+        signature = self.signature(file_path, encoding)
+        entry = self._build_entry(df, signature)
+        self._persist(file_path, entry)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_datasets:
+                self._entries.popitem(last=False)
+        return entry
+
+    def extend(self, file_path: str, new_rows: pd.DataFrame, previous_signature: Optional[Tuple],
+               encoding: str = 'utf-8') -> Optional[DatasetEntry]:
+        """
+        Register rows just appended to a file without re-reading the file.
+
+        previous_signature is the file's signature before the append; if the
+        cached entry is not that version the entry is dropped and the next
+        read re-parses the whole file instead.
+
+        The new rows are de-duplicated against the whole dataset, as a full
+        parse would. A full parse compares rows before forward-filling them,
+        but only the filled frame is kept for the rows parsed up front, so a
+        repeat of one of those rows that has missing values is kept here.
+        Files whose rows carry a unique key (the mart1 snapshot's Invoice ID)
+        never hold such repeats.
+        """
+        key = (os.path.abspath(file_path), encoding)
+        signature = self.signature(file_path, encoding)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or previous_signature is None or entry.signature != previous_signature:
+                self._entries.pop(key, None)
+                return None
+
+        # Clean the new rows the way a full parse would, continuing the forward fill
+        seen = entry.row_hashes()
+        added = new_rows.drop_duplicates()
+        if not entry.frame.empty:
+            added = _like(added, entry.frame)
+        hashes = _hash_rows(added)
+        fresh = ~hashes.isin(seen).to_numpy()
+        added, hashes = added[fresh], hashes[fresh]
+        if not entry.frame.empty:
+            added = pd.concat([entry.frame.tail(1), added], ignore_index=True).ffill().iloc[1:]
+        added = added.reset_index(drop=True)
+
+        frame = pd.concat([entry.frame, added], ignore_index=True)
+        dates = None
+        if 'Date' in frame.columns:
+            new_dates = pd.to_datetime(added['Date'], errors='coerce') if 'Date' in added.columns \
+                else pd.Series(pd.NaT, index=added.index)
+            old_dates = entry.dates if entry.dates is not None else pd.Series(pd.NaT, index=entry.frame.index)
+            dates = pd.concat([old_dates, new_dates], ignore_index=True)
+        extended = DatasetEntry(frame, dates, signature)
+        extended._row_hashes = seen | set(hashes.tolist())
+
+        # Derived structures get new versions covering the new rows; the old
+        # entry keeps its own, so readers still holding it see a consistent view
+        with entry.lock:
+            extras = dict(entry.extras)
+        for name, value in extras.items():
+            if callable(getattr(value, 'with_rows', None)):
+                extended.extras[name] = value.with_rows(
+                    added.assign(Date=new_dates) if dates is not None else added
+                )
+
+        self._persist(file_path, extended)
+        with self._lock:
+            self._entries[key] = extended
+            self._entries.move_to_end(key)
+        return extended
+
+    def invalidate(self, file_path: str):
+        """Drop every cached version of a file"""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, file_path: str, encoding: str, signature: Tuple) -> DatasetEntry:
+        cache_path = self._cache_path(file_path, signature)
+        if PARQUET_AVAILABLE and os.path.exists(cache_path):
+            try:
+                df = pd.read_parquet(cache_path)
+                dates = df.pop(PARSED_DATE_COLUMN) if PARSED_DATE_COLUMN in df.columns else None
+                logger.info(f"Loaded {len(df)} rows for {file_path} from columnar cache")
+                return DatasetEntry(df, dates, signature)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable dataset cache {cache_path}: {e}")
+
+        df = pd.read_csv(file_path, encoding=encoding)
+        entry = self._build_entry(df, signature)
+        self._persist(file_path, entry)
+        logger.info(f"Parsed and cleaned {len(entry.frame)} rows from {file_path}")
+        return entry
+
+    @staticmethod
+    def _build_entry(df: pd.DataFrame, signature: Tuple) -> DatasetEntry:
+        # Same cleaning every endpoint used to repeat on each request
+        df = df.drop_duplicates()
+        df = df.ffill()
+        df = df.reset_index(drop=True)
+
+        dates = None
+        if 'Date' in df.columns:
+            dates = pd.to_datetime(df['Date'], errors='coerce')
+        return DatasetEntry(df, dates, signature)
+
+    def _persist(self, file_path: str, entry: DatasetEntry):
+        if not PARQUET_AVAILABLE:
+            return
+        cache_path = self._cache_path(file_path, entry.signature)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Remove copies of older versions of the same file
+            prefix = self._cache_prefix(file_path)
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(prefix) and name.endswith('.parquet'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+            out = entry.frame.copy()
+            if entry.dates is not None:
+                out[PARSED_DATE_COLUMN] = entry.dates
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            out.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"Could not write columnar cache for {file_path}: {e}")
+
+
+# Global instance
+_dataset_store = None
+
+def get_dataset_store() -> DatasetStore:
+    global _dataset_store
+    if _dataset_store is None:
+        _dataset_store = DatasetStore()
+    return _dataset_store
+
+
+def load_dataset(file_path: str, encoding: str = 'utf-8', parse_dates: bool = True) -> pd.DataFrame:
+    """
+    Return a cleaned copy of the dataset at file_path.
+
+    Args:
+        file_path: Uploaded CSV or mart1 snapshot path from the session
+        encoding: File encoding used for the initial parse
+        parse_dates: Replace 'Date' with its parsed datetime values
+
+    Returns:
+        DataFrame the caller owns and may modify
+    """
+    return get_dataset_store().get_entry(file_path, encoding).to_frame(parse_dates=parse_dates)
@@ -5,11 +5,19 @@ Fetches real-time data from the mart1 billing system API
 import requests
 import pandas as pd
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import os
 
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
 class Mart1Integration:
     """Service to connect supermarket analytics with mart1 billing system"""
     
@@ -26,6 +34,8 @@ class Mart1Integration:
         self.timeout = timeout
         self._health_timeout = min(5, self.timeout)
         self._session = requests.Session()
+        # Ask exports for Arrow until the server shows it can't produce it
+        self._use_arrow = ARROW_AVAILABLE
         
     def is_available(self) -> bool:
         """Fast health check — do not pull heavy reports here"""
@@ -39,6 +49,38 @@ class Mart1Integration:
             logger.warning(f"Mart1 API not available: {e}")
             return False
     
+    def _fetch_frame(self, path: str, params: Optional[Dict[str, Any]] = None
+                     ) -> Tuple[pd.DataFrame, requests.Response, Optional[Dict[str, Any]]]:
+        """
+        GET an export endpoint and decode its rows into a DataFrame.
+
+        Requests the Arrow IPC format when pyarrow is installed, which skips
+        JSON encoding/decoding and row-dict construction; older mart1 servers
+        answer with JSON and are decoded the old way.
+
+        Returns:
+            (DataFrame, response, JSON body or None for Arrow responses)
+        """
+        url = f"{self.base_url}{path}"
+        params = dict(params or {})
+        if self._use_arrow:
+            response = self._session.get(url, params={**params, "format": "arrow"}, timeout=self.timeout)
+            if response.status_code in (400, 501):
+                logger.info("Mart1 export does not support Arrow, falling back to JSON")
+                self._use_arrow = False
+            else:
+                response.raise_for_status()
+                if response.headers.get('Content-Type', '').startswith(ARROW_MEDIA_TYPE):
+                    with pa.ipc.open_stream(response.content) as reader:
+                        return reader.read_pandas(), response, None
+                data = response.json()
+                return pd.DataFrame(data.get("data") or []), response, data
+
+        response = self._session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        return pd.DataFrame(data.get("data") or []), response, data
+
     def get_sales_data(self, limit: int = 1000, days: Optional[int] = None) -> Optional[pd.DataFrame]:
         """
         Fetch sales data from mart1
@@ -57,16 +99,8 @@ class Mart1Integration:
             if days:
                 params["days"] = days
                 
-            response = self._session.get(
-                f"{self.base_url}/api/export/sales",
-                params=params,
-                timeout=self.timeout,
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get("data"):
-                df = pd.DataFrame(data["data"])
+            df, _, _ = self._fetch_frame("/api/export/sales", params)
+            if not df.empty:
                 logger.info(f"Fetched {len(df)} sales records from mart1")
                 return df
             else:
@@ -77,6 +111,46 @@ class Mart1Integration:
             logger.error(f"Error fetching sales data from mart1: {e}")
             return None
     
+    def get_sales_page(self, after_id: int = 0, limit: int = 5000,
+                       days: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fetch one page of sales newer than a sale_id watermark
+
+        Args:
+            after_id: Only return sales with a larger sale_id
+            limit: Maximum number of sales (not line items) in the page
+            days: Only fetch sales from last N days (optional)
+
+        Returns:
+            Dict with 'data' (DataFrame, possibly empty), 'last_sale_id' and
+            'has_more', or None if the fetch fails
+        """
+        try:
+            params = {"after_id": int(after_id), "limit": max(1, min(int(limit or 5000), 5000))}
+            if days:
+                params["days"] = days
+
+            df, response, data = self._fetch_frame("/api/export/sales", params)
+            if data is None:
+                last_sale_id = response.headers.get("X-Last-Sale-Id")
+                has_more = response.headers.get("X-Has-More") == "true"
+            else:
+                last_sale_id = data.get("last_sale_id")
+                has_more = bool(data.get("has_more"))
+            if last_sale_id is None:
+                logger.error("Mart1 export does not support incremental sync (no last_sale_id)")
+                return None
+            logger.info(f"Fetched {len(df)} sales records after sale_id {after_id} from mart1")
+            return {
+                "data": df,
+                "last_sale_id": int(last_sale_id),
+                "has_more": has_more,
+            }
+
+        except Exception as e:
+            logger.error(f"Error fetching sales page from mart1: {e}")
+            return None
+
     def get_products_data(self) -> Optional[pd.DataFrame]:
         """
         Fetch product inventory data from mart1
@@ -85,15 +159,8 @@ class Mart1Integration:
             DataFrame with product data or None if fetch fails
         """
         try:
-            response = self._session.get(
-                f"{self.base_url}/api/export/products",
-                timeout=self.timeout
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get("data"):
-                df = pd.DataFrame(data["data"])
+            df, _, _ = self._fetch_frame("/api/export/products")
+            if not df.empty:
                 logger.info(f"Fetched {len(df)} products from mart1")
                 return df
             else:
@@ -115,16 +182,8 @@ class Mart1Integration:
             DataFrame with category performance data or None if fetch fails
         """
         try:
-            response = self._session.get(
-                f"{self.base_url}/api/export/categories-performance",
-                params={"days": days},
-                timeout=self.timeout
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get("data"):
-                df = pd.DataFrame(data["data"])
+            df, _, _ = self._fetch_frame("/api/export/categories-performance", {"days": days})
+            if not df.empty:
                 logger.info(f"Fetched category performance data from mart1")
                 return df
             else:
@@ -143,15 +202,8 @@ class Mart1Integration:
             DataFrame with inventory status or None if fetch fails
         """
         try:
-            response = self._session.get(
-                f"{self.base_url}/api/export/inventory-status",
-                timeout=self.timeout
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get("data"):
-                df = pd.DataFrame(data["data"])
+            df, _, _ = self._fetch_frame("/api/export/inventory-status")
+            if not df.empty:
                 logger.info(f"Fetched inventory status from mart1")
                 return df
             else:
@@ -0,0 +1,256 @@
+"""
+Mart1 Snapshot
+Keeps a local, append-only copy of mart1 sales per history window and syncs
+only the sales added since the last pull
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Optional, Dict, Any
+
+import pandas as pd
+
+from dataset_store import get_dataset_store
+from mart1_integration import Mart1Integration
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class Mart1Snapshot:
+    """
+    Local CSV copy of the mart1 sales export plus a sale_id watermark.
+
+    A sync asks mart1 only for sales after the watermark, paging until it has
+    caught up, and appends them to the file. The dataset store and chart cube
+    are extended in place, so a refresh costs time proportional to the new
+    sales rather than to the whole history.
+
+    sale_ids are assigned when a sale's transaction starts, so a sale can
+    commit after a higher sale_id was already synced (a batch upload reserves
+    thousands of ids up front). Each sync therefore re-reads the last
+    overlap_ids ids below the watermark and drops line items the snapshot
+    already holds; the state keeps the Invoice IDs of that overlap range.
+
+    Each history window (days) has its own file, so sessions asking for
+    different windows never reset each other's snapshot, and rows that fall
+    out of the window are pruned as it moves.
+    """
+
+    def __init__(self, integration: Mart1Integration, snapshot_dir: str = None, page_size: int = 5000,
+                 overlap_ids: int = 10000):
+        if snapshot_dir is None:
+            snapshot_dir = os.environ.get(
+                'MART1_SNAPSHOT_DIR',
+                os.path.join(tempfile.gettempdir(), 'supermarket_mart1')
+            )
+        self.integration = integration
+        self.page_size = max(1, min(int(page_size or 5000), 5000))
+        self.overlap_ids = max(0, int(overlap_ids or 0))
+        self.snapshot_dir = snapshot_dir
+        # One set of snapshots per mart1 instance
+        self.source = hashlib.sha1(integration.base_url.encode('utf-8')).hexdigest()[:12]
+        self._lock = threading.Lock()
+
+    def path_for(self, days: Optional[int]) -> str:
+        window = f"{int(days)}d" if days else 'all'
+        return os.path.join(self.snapshot_dir, f"mart1_sales_{self.source}_{window}.csv")
+
+    @contextmanager
+    def _locked(self, path: str):
+        # Worker processes share the snapshot files, so serialise syncs across them too
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f"{path}.lock", 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_state(path: str) -> Optional[Dict[str, Any]]:
+        state_path = f"{path}.state.json"
+        if not (os.path.exists(state_path) and os.path.exists(path)):
+            return None
+        try:
+            with open(state_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable snapshot state {state_path}: {e}")
+            return None
+
+    @staticmethod
+    def _write_state(path: str, state: Dict[str, Any]):
+        state_path = f"{path}.state.json"
+        tmp_path = f"{state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    @staticmethod
+    def _new_state(days: Optional[int]) -> Dict[str, Any]:
+        return {'last_sale_id': 0, 'days': days, 'columns': None, 'oldest_date': None, 'recent_invoices': []}
+
+    @staticmethod
+    def _invoice_sale_id(invoice_id: str) -> int:
+        # Invoice IDs are "<sale_id>-<sale_item_id>"
+        return int(str(invoice_id).split('-', 1)[0])
+
+    def _dedupe(self, df: pd.DataFrame, state: Dict[str, Any], seen: set) -> pd.DataFrame:
+        """Drop line items already in the snapshot (re-read from the overlap range)"""
+        if 'Invoice ID' not in df.columns:
+            return df
+        invoices = df['Invoice ID'].astype(str)
+        df = df[~invoices.isin(seen)]
+        new_invoices = invoices[df.index].tolist()
+        seen.update(new_invoices)
+        state['recent_invoices'].extend(new_invoices)
+        return df
+
+    def _forget_old_invoices(self, state: Dict[str, Any], seen: set):
+        """Keep only the Invoice IDs a future overlap re-read can return again"""
+        floor = state['last_sale_id'] - self.overlap_ids
+        state['recent_invoices'] = [i for i in state['recent_invoices'] if self._invoice_sale_id(i) > floor]
+        seen.intersection_update(state['recent_invoices'])
+
+    @staticmethod
+    def _append(path: str, df: pd.DataFrame, state: Dict[str, Any]) -> pd.DataFrame:
+        columns = state.get('columns')
+        if columns is None:
+            columns = df.columns.tolist()
+            state['columns'] = columns
+            df.to_csv(path, index=False)
+        else:
+            # Keep the file's column order even if the export adds or reorders columns
+            df = df.reindex(columns=columns)
+            df.to_csv(path, mode='a', header=False, index=False)
+        if 'Date' in df.columns and not df.empty:
+            oldest = str(df['Date'].min())
+            if state.get('oldest_date') is None or oldest < state['oldest_date']:
+                state['oldest_date'] = oldest
+        return df
+
+    def _prune(self, path: str, days: Optional[int], state: Dict[str, Any]) -> bool:
+        """Rewrite the file without rows older than the window; True if anything was dropped"""
+        if not days or state.get('oldest_date') is None:
+            return False
+        cutoff = (date.today() - timedelta(days=int(days))).isoformat()
+        if state['oldest_date'] >= cutoff:
+            return False
+        df = pd.read_csv(path)
+        kept = df[df['Date'].astype(str) >= cutoff]
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        kept.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        state['oldest_date'] = str(kept['Date'].min()) if not kept.empty else None
+        get_dataset_store().put(path, kept)
+        logger.info(f"Pruned {len(df) - len(kept)} mart1 sales rows older than {cutoff}")
+        return True
+
+    def _pull(self, path: str, days: Optional[int], state: Dict[str, Any], save_progress: bool):
+        """Page through mart1 from the watermark; returns (appended frames, complete)"""
+        seen = set(state['recent_invoices'])
+        after_id = max(0, state['last_sale_id'] - self.overlap_ids)
+        appended = []
+        while True:
+            page = self.integration.get_sales_page(after_id=after_id, limit=self.page_size, days=days)
+            if page is None:
+                return appended, False
+            df = self._dedupe(page['data'], state, seen)
+            if not df.empty:
+                appended.append(self._append(path, df, state))
+            after_id = page['last_sale_id']
+            state['last_sale_id'] = max(state['last_sale_id'], after_id)
+            self._forget_old_invoices(state, seen)
+            if save_progress:
+                # Save progress per page so a failed sync resumes where it stopped
+                self._write_state(path, state)
+            if not page['has_more']:
+                return appended, True
+
+    def sync(self, days: Optional[int] = None, full: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Bring the snapshot of a history window up to date with mart1.
+
+        Args:
+            days: History window of the snapshot (each window is a separate file)
+            full: Pull the window again; the current file stays readable until
+                the new copy is complete and replaces it
+
+        Returns:
+            Dict with 'path', 'added' and 'last_sale_id', or None if the
+            snapshot is empty and mart1 could not be reached
+        """
+        path = self.path_for(days)
+        with self._locked(path):
+            store = get_dataset_store()
+            state = self._read_state(path)
+            rebuild = full or state is None or state.get('days') != days
+
+            if rebuild:
+                # Build a fresh copy next to the live file and swap it in when done
+                target = f"{path}.rebuild" if os.path.exists(path) else path
+                state = self._new_state(days)
+                appended, complete = self._pull(target, days, state, save_progress=target == path)
+                if complete and target != path:
+                    if os.path.exists(target):
+                        os.replace(target, path)
+                    else:
+                        # The window no longer holds any sales
+                        for stale in (path, f"{path}.state.json"):
+                            if os.path.exists(stale):
+                                os.remove(stale)
+                        store.invalidate(path)
+                elif target != path:
+                    if os.path.exists(target):
+                        os.remove(target)
+                    if not complete:
+                        logger.warning("Full mart1 pull failed; keeping the existing snapshot")
+                        state = self._read_state(path) or state
+                        return {'path': path, 'added': 0, 'last_sale_id': state['last_sale_id'], 'complete': False}
+                if not os.path.exists(path):
+                    return None
+                self._write_state(path, state)
+                frame = pd.concat(appended, ignore_index=True) if appended else pd.read_csv(path)
+                store.put(path, frame)
+                added = len(frame)
+            else:
+                previous_signature = store.signature(path, 'utf-8')
+                appended, complete = self._pull(path, days, state, save_progress=True)
+                added = sum(len(df) for df in appended)
+                if appended:
+                    store.extend(path, pd.concat(appended, ignore_index=True), previous_signature)
+
+            if self._prune(path, days, state):
+                self._write_state(path, state)
+
+            logger.info(f"Synced {added} new mart1 sales rows (watermark sale_id {state['last_sale_id']})")
+            return {
+                'path': path,
+                'added': added,
+                'last_sale_id': state['last_sale_id'],
+                'complete': complete,
+            }
+
+
+# Global instance
+_mart1_snapshot = None
+
+def get_mart1_snapshot(integration: Mart1Integration, snapshot_dir: str = None,
+                       page_size: int = 5000, overlap_ids: int = 10000) -> Mart1Snapshot:
+    global _mart1_snapshot
+    if _mart1_snapshot is None:
+        _mart1_snapshot = Mart1Snapshot(integration, snapshot_dir, page_size, overlap_ids)
+    return _mart1_snapshot
@@ -1027,14 +1027,14 @@ function fetchTimeAnalysis() {
     // Get current filter values
     const filters = getAnalysisFilterValues();
     
-    // Call API for hourly distribution
-    fetch((window.API_BASE || '/api') + '/generate-chart', {
+    // Fetch heatmap and daily trend together; the filter is applied once server-side
+    fetch((window.API_BASE || '/api') + '/generate-charts', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify({
-            chart_type: 'sales_heatmap',
+            chart_types: ['sales_heatmap', 'time_series'],
             filters: filters.filters,
             encoding: filters.encoding
         })
@@ -1042,33 +1042,21 @@ function fetchTimeAnalysis() {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            // First handle the heatmap data
-            displayTimeHeatmap(data.chart_data);
+            const errors = data.errors || {};
+            if (data.charts.sales_heatmap) {
+                displayTimeHeatmap(data.charts.sales_heatmap);
+            } else {
+                handleAnalysisError(errors.sales_heatmap || 'Failed to perform time analysis');
+            }
             
-            // Now fetch hourly distribution
-            return fetch((window.API_BASE || '/api') + '/generate-chart', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    chart_type: 'time_series',
-                    filters: filters.filters,
-                    encoding: filters.encoding
-                })
-            });
+            if (data.charts.time_series) {
+                // Display hourly and day of week distributions
+                displayHourlyDistribution(data.charts.time_series);
+            } else {
+                handleAnalysisError(errors.time_series || 'Failed to fetch hourly distribution data');
+            }
         } else {
             handleAnalysisError(data.error || 'Failed to perform time analysis');
-            throw new Error('Failed to fetch heatmap data');
-        }
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            // Display hourly and day of week distributions
-            displayHourlyDistribution(data.chart_data);
-        } else {
-            handleAnalysisError(data.error || 'Failed to fetch hourly distribution data');
         }
         document.getElementById('analysisLoadingOverlay').style.display = 'none';
     })
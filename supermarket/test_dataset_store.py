@@ -0,0 +1,101 @@
+"""
+Tests for extending a cached dataset in place of re-parsing it
+"""
+import os
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from chart_cube import ChartCube
+from dataset_store import PARQUET_AVAILABLE, DatasetStore
+
+BASE = pd.DataFrame({
+    'Invoice ID': ['1-1', '1-2', '2-1'],
+    'Date': ['2026-01-01', '2026-01-01', '2026-01-02'],
+    'Time': ['10:00', '10:00', '11:30'],
+    'Product line': ['Food', 'Drinks', 'Food'],
+    'Payment': ['Cash', 'Cash', 'Card'],
+    'Total': [10.0, 5.0, 7.5],
+    'Quantity': [1, 1, 3],
+})
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / 'sales.csv')
+    BASE.to_csv(path, index=False)
+    store = DatasetStore(cache_dir=str(tmp_path / 'cache'))
+    return path, store, store.get_entry(path)
+
+
+def _append(path: str, store: DatasetStore, rows: pd.DataFrame):
+    previous = store.signature(path, 'utf-8')
+    rows.to_csv(path, mode='a', header=False, index=False)
+    return store.extend(path, rows, previous)
+
+
+def _fresh(path: str, tmp_path) -> pd.DataFrame:
+    return DatasetStore(cache_dir=str(tmp_path / 'fresh')).get_entry(path).frame
+
+
+def test_extend_matches_a_fresh_parse(dataset, tmp_path):
+    path, store, _ = dataset
+    rows = pd.DataFrame({
+        'Invoice ID': ['3-1', '1-2', '3-1'],   # a repeat of an old row and one within the batch
+        'Date': ['2026-01-03', '2026-01-01', '2026-01-03'],
+        'Time': ['09:15', '10:00', '09:15'],
+        'Product line': ['Drinks', 'Drinks', 'Drinks'],
+        'Payment': ['Card', 'Cash', 'Card'],
+        'Total': [2.0, 5.0, 2.0],
+        'Quantity': [2, 1, 2],
+    })
+    extended = _append(path, store, rows)
+
+    assert extended.frame['Invoice ID'].tolist() == ['1-1', '1-2', '2-1', '3-1']
+    pdt.assert_frame_equal(extended.frame, _fresh(path, tmp_path), check_dtype=False)
+
+
+def test_repeat_with_missing_values(tmp_path):
+    path = str(tmp_path / 'sales.csv')
+    BASE.assign(Payment=['Cash', 'Cash', None]).to_csv(path, index=False)
+    store = DatasetStore(cache_dir=str(tmp_path / 'cache'))
+    store.get_entry(path)
+    row = BASE.iloc[[2]].assign(Payment=None)
+
+    # Documented difference: a row parsed up front is only known forward-filled,
+    # so a raw repeat of it is kept where a fresh parse drops it
+    extended = _append(path, store, row)
+    assert len(extended.frame) == len(_fresh(path, tmp_path)) + 1
+
+    # Appended rows are remembered raw, so repeating one of those is dropped
+    new_row = row.assign(**{'Invoice ID': '6-1'})
+    _append(path, store, new_row)
+    extended = _append(path, store, new_row)
+    assert extended.frame['Invoice ID'].tolist().count('6-1') == 1
+
+
+def test_extend_leaves_the_previous_cube_alone(dataset):
+    path, store, entry = dataset
+    entry.extras['chart_cube'] = cube = ChartCube(entry.frame.assign(Date=entry.dates))
+    base_before = cube.base.copy()
+
+    rows = BASE.iloc[[0]].assign(**{'Invoice ID': '4-1', 'Date': '2026-01-04'})
+    extended = _append(path, store, rows)
+
+    pdt.assert_frame_equal(cube.base, base_before)
+    new_cube = extended.extras['chart_cube']
+    assert new_cube is not cube
+    assert new_cube.base['Total'].sum() == pytest.approx(BASE['Total'].sum() + 10.0)
+
+
+@pytest.mark.skipif(not PARQUET_AVAILABLE, reason="pyarrow is not installed")
+def test_extend_persists_the_columnar_cache(dataset):
+    path, store, _ = dataset
+    rows = BASE.iloc[[1]].assign(**{'Invoice ID': '5-1'})
+    extended = _append(path, store, rows)
+
+    assert os.path.exists(store._cache_path(path, extended.signature))
+    # Another process starting now loads the extended frame without parsing the CSV
+    reloaded = DatasetStore(cache_dir=store.cache_dir).get_entry(path)
+    pdt.assert_frame_equal(reloaded.frame, extended.frame)